@@ -10,10 +10,13 @@ from app.pages.Past_Conversations import PreviousConversationPage
 from app.utils.streamlit_utils import SessionState
 
 
-def initialize_session():
+def initialize_session() -> SessionState:
+    """
+    The SessionState of this browser session, created on its first run. Later reruns only pick up the
+    fields that were replaced in st.session_state; local changes are written back once, at the end of the run.
+    """
     if "session_state" not in st.session_state:
         st.session_state["session_state"] = SessionState(session=st.session_state)
-        st.session_state["session_state"].sync_to_session()
     else:
         st.session_state["session_state"].sync_from_session()
     return st.session_state["session_state"]
@@ -34,6 +37,8 @@ def main():
     selection = "New Conversation"
     page: BasePage = pages[selection]
     page.display()
+    session.sync_to_session()
+    session.log_sync_stats()
 
 
 if __name__ == "__main__":
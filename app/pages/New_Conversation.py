@@ -5,38 +5,65 @@ from loguru import logger
 
 from app.pages.base import BasePage
 from app.pages.utils import ConversationMixins
-from app.services.ingress.channel import OCRDocument
-from app.services.retrievers.retriever import Retriever
+from app.services.ingress.ingestion import ingestion_service
+from app.services.ingress.uploads import upload_manifest
+from app.services.retrievers.retriever import orchestrator_registry
 from app.services.structures.conversation import Conversation, ConversationList, Message
+from app.services.structures.conversation_store import conversation_store
 
-tmp_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "tmp"))
-os.makedirs(tmp_dir, exist_ok=True)
+INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", 1.0))
 
 
 class NewConversationPage(BasePage, ConversationMixins):
     _title = "New Conversation"
 
-    def save_file(self, file):
-        path = os.path.join(tmp_dir, file.name)
-        logger.debug(f"Saving file to: {path}")
-        with open(path, "wb") as f:
-            f.write(file.getvalue())
-        return path
-
     def __init__(self, title, session, **kwargs):
         super().__init__(title, session, **kwargs)
         self.file_uploaded = False
         self.file = None
         self.model = None
-        self.retriever = None
         logger.info(f"Session: {session}")
-        if session.vector_store is not None:
-            self.retriever = Retriever.from_vector_store(session.vector_store)
-        last_conversation = list(self.session.pages.keys())
-        if last_conversation:
-            self.conversations = ConversationList(**self.session.pages[last_conversation[-1]])
-        else:
+        # The conversation belongs to this browser session: its id lives in the session state, never
+        # looked up from the store's most recent row, which may belong to another user.
+        conversation_id = session.conversation_id
+        self.conversations = conversation_store.get_conversation(conversation_id) if conversation_id else None
+        if self.conversations is None:
             self.conversations: ConversationList = ConversationList()
+            conversation_store.create_conversation(self.conversations)
+            session.conversation_id = self.conversations.id
+        self.orchestrator = orchestrator_registry.get(self.conversations.id)
+
+    @st.fragment(run_every=INGEST_POLL_SECONDS)
+    def poll_ingestion_progress(self):
+        """
+        Refreshes the ingestion progress on its own, without rerunning the page, while jobs are running.
+        When a job finishes the whole page is rerun, so that the newly indexed file shows up in the
+        conversation; once no job is left, the page no longer renders this fragment and polling stops.
+        """
+        self.display_ingestion_progress()
+        key = f"ingesting_{self.conversations.id}"
+        active = {job.id for job in ingestion_service.active(self.conversations.id)}
+        finished = st.session_state.get(key, active) - active
+        st.session_state[key] = active
+        if finished or not active:
+            st.rerun()
+
+    def display_ingestion_progress(self):
+        for job in ingestion_service.jobs(self.conversations.id):
+            name = upload_manifest.name(job.path)
+            if job.status == "failed":
+                st.error(f"{name}: ingestion failed ({job.error})")
+            elif job.status == "done":
+                pages = f"{job.pages_done} pages, " if job.pages_done else ""
+                st.caption(f"{name}: {pages}{job.chunks_embedded} chunks indexed")
+            else:
+                pages = (
+                    f"{job.pages_done}/{job.pages_total or '?'} pages OCRed, "
+                    if job.status == "ocr" or job.pages_done
+                    else ""
+                )
+                chunks = f"{job.chunks_embedded}/{job.chunks_total} chunks embedded"
+                st.progress(job.progress, text=f"{name}: {job.status} - {pages}{chunks}")
 
     def _display(self, **kwargs):
         rerun = True
@@ -46,22 +73,19 @@ class NewConversationPage(BasePage, ConversationMixins):
         if uploaded_file := st.file_uploader("Choose a file", accept_multiple_files=True):
             logger.info(f"Uploaded file: {uploaded_file} | {type(uploaded_file)}")
             for file in uploaded_file:
-                file_path = self.save_file(file)
-                if file_path in self.conversations.context_files:
-                    st.warning(f"File {file_path} already uploaded.")
+                if (file_path := upload_manifest.store(file)) is None:
+                    continue
+                if file_path in self.conversations.context_files or ingestion_service.is_ingesting(
+                    self.conversations.id, file_path
+                ):
+                    st.warning(f"File {file.name} already uploaded.")
                     continue
-                self.conversations.context_files.append(file_path)
-                self.session.pages[self.conversations.id] = self.conversations.model_dump()
-                ocr_document = OCRDocument(file_path)
-                documents = ocr_document.generate_document()
-                # chunks = ocr_document.get_splitted_docs(documents)
-                if self.retriever is None:
-                    self.retriever = Retriever.from_documents(documents)
-                    self.session.vector_store = self.retriever.vector_store
-                else:
-                    self.retriever.add_documents(documents)
-                    self.session.vector_store = self.retriever.vector_store
+                ingestion_service.submit(self.orchestrator, file_path)
 
+        if ingestion_service.active(self.conversations.id):
+            self.poll_ingestion_progress()
+        else:
+            self.display_ingestion_progress()
         self.display_conversation_list()
         user_input = st.chat_input("Input your question!")
         logger.info(f"User input: {user_input} | {type(user_input)}")
@@ -70,12 +94,10 @@ class NewConversationPage(BasePage, ConversationMixins):
                 query=Message(sender="user", message=user_input),
                 response=Message(sender="assistant", message="I am a bot!"),
             )
-            response = self.retriever.get_response(user_input)
-            conversation.response.message = response.get(
-                "answer", "No context for the given query found in the document."
+            answer, context = self._stream_conversation(
+                conversation.query, self.orchestrator.stream_response(user_input)
             )
-            conversation.context = "\n".join([doc.page_content for doc in response["context"]])
+            conversation.response.message = answer or "No context for the given query found in the document."
+            conversation_store.append_turn(self.conversations.id, conversation, context)
             self.conversations.add_conversation(conversation)
-            self.session.pages[self.conversations.id] = self.conversations.model_dump()
-            self._display_conversation(conversation)
         return rerun
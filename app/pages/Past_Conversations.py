@@ -1,8 +1,15 @@
+import math
+import os
+
 import streamlit as st
 
 from app.pages.base import BasePage
 from app.pages.utils import ConversationMixins
+from app.services.retrievers.retriever import orchestrator_registry
 from app.services.structures.conversation import ConversationList
+from app.services.structures.conversation_store import conversation_store
+
+CONVERSATION_LIST_PAGE = int(os.getenv("CONVERSATION_LIST_PAGE", 50))
 
 
 class PreviousConversationPage(BasePage, ConversationMixins):
@@ -13,10 +20,36 @@ class PreviousConversationPage(BasePage, ConversationMixins):
         self.file_uploaded = False
         self.file = None
         self.model = None
+        self.orchestrator = None
         self.conversations: ConversationList = ConversationList()
 
+    def open_conversation(self, conversation_id: str):
+        self.conversations = conversation_store.get_conversation(conversation_id)
+        self.orchestrator = orchestrator_registry.get(conversation_id)
+
+    @staticmethod
+    def _conversation_label(header: dict) -> str:
+        return f"{header['title']} - {header['created_at']} ({header['n_turns']} turns)"
+
     def _display(self, **kwargs):
         rerun = True
         st.header("Previous Conversation")
         st.write(f"This is the existing conversation page. Continue chatting with your document.")
+        search = st.text_input("Search conversations")
+        total = conversation_store.count_conversations(search)
+        if not total:
+            st.info("No previous conversations yet.")
+            return rerun
+        n_pages = math.ceil(total / CONVERSATION_LIST_PAGE)
+        page = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1) if n_pages > 1 else 1
+        headers = conversation_store.list_conversations(
+            limit=CONVERSATION_LIST_PAGE, offset=(page - 1) * CONVERSATION_LIST_PAGE, search=search
+        )
+        labels = {header["id"]: self._conversation_label(header) for header in headers}
+        conversation_id = st.selectbox("Conversation", list(labels), format_func=labels.get)
+        self.open_conversation(conversation_id)
+        vector_store = self.orchestrator.retriever.vector_store
+        if vector_store is not None:
+            st.caption(f"{vector_store.index.ntotal} chunks indexed")
+        self.display_conversation_list()
         return rerun
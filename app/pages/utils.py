@@ -1,14 +1,45 @@
+import os
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
 import streamlit as st
+from loguru import logger
+
+from app.services.structures.conversation import Conversation, Message
+from app.services.structures.conversation_store import conversation_store
 
-from app.services.structures.conversation import Conversation
+HISTORY_WINDOW = int(os.getenv("HISTORY_WINDOW", 20))
+SHOW_RENDER_STATS = os.getenv("SHOW_RENDER_STATS", "false").lower() == "true"
 
 
 class ConversationMixins:
+    history_render_ms: float = 0.0
+
+    def _history_key(self) -> str:
+        return f"history_window_{self.conversations.id}"
+
+    def _load_earlier(self):
+        st.session_state[self._history_key()] = (
+            st.session_state.get(self._history_key(), HISTORY_WINDOW) + HISTORY_WINDOW
+        )
+
     def display_conversation_list(self):
-        for conversation in self.conversations:
+        """
+        Render only the most recent turns, HISTORY_WINDOW at a time. Earlier turns are fetched from the
+        conversation store when the user asks for them.
+        """
+        start = time.perf_counter()
+        window = st.session_state.get(self._history_key(), HISTORY_WINDOW)
+        visible, hidden = conversation_store.load_window(self.conversations, window)
+        if hidden:
+            st.button(f"Load earlier messages ({hidden} more)", on_click=self._load_earlier)
+        for conversation in visible:
             self._display_conversation(conversation)
+        self.history_render_ms = (time.perf_counter() - start) * 1000
+        logger.debug(f"Rendered {len(visible)} of {len(visible) + hidden} turns in {self.history_render_ms:.1f} ms")
+        if SHOW_RENDER_STATS:
+            st.caption(f"History: {len(visible)} turns rendered in {self.history_render_ms:.1f} ms")
 
-    # @st.cache_data
     def _display_conversation(self, conversation: Conversation):
         query = conversation.query
         response = conversation.response
@@ -16,3 +47,23 @@ class ConversationMixins:
             st.text(query.message)
         with st.chat_message("assistant"):
             st.markdown(response.message)
+
+    def _stream_conversation(self, query: Message, stream: Iterator[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+        """
+        Render the query and stream the answer tokens into the assistant message as they arrive.
+        Returns the full answer and the retrieved context documents.
+        """
+        context = []
+
+        def answer_tokens():
+            for chunk in stream:
+                if "context" in chunk:
+                    context.extend(chunk["context"])
+                if "answer" in chunk:
+                    yield chunk["answer"]
+
+        with st.chat_message("user"):
+            st.text(query.message)
+        with st.chat_message("assistant"):
+            answer = st.write_stream(answer_tokens())
+        return answer, context
@@ -1,21 +1,35 @@
+import csv
+import io
+import os
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 import pandas as pd
 from langchain.schema import Document as LangchainDocument
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from loguru import logger
 
+from ..ocr.cache import OCRCache
 from ..ocr.ocr import OCRParser
+from ..preprocess.document_splitter import PageSplitter
 from ..structures.ocr import DocOCR
+from ..utils.utils import count_tokens
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+CSV_ROWS_PER_DOCUMENT = int(os.getenv("CSV_ROWS_PER_DOCUMENT", 50))
+CSV_TOKENS_PER_DOCUMENT = int(os.getenv("CSV_TOKENS_PER_DOCUMENT", 1000))
+CSV_READ_CHUNK_ROWS = int(os.getenv("CSV_READ_CHUNK_ROWS", 10_000))
+CSV_READ_BLOCK_BYTES = int(os.getenv("CSV_READ_BLOCK_BYTES", 1 << 20))
 
 
 class DocumentMixins:
     @staticmethod
     def get_splitted_docs(documents: List[LangchainDocument]):
         logger.info("Splitting the documents into chunks ...")
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50, length_function=len)
-        chunks = text_splitter.split_documents(documents)
+        chunks = list(PageSplitter().split(documents))
         logger.info(f"Splitted into {len(chunks)} chunks.")
         return chunks
 
@@ -42,7 +56,7 @@ class BaseDocument(ABC):
         if not contents:
             logger.debug(f"Empty contents. Skipping document generation!!!")
             return []
-        return [LangchainDocument(page_contents=self.get_contents())]
+        return [LangchainDocument(page_content=contents)]
 
 
 class OCRDocument(BaseDocument, DocumentMixins):
@@ -51,9 +65,25 @@ class OCRDocument(BaseDocument, DocumentMixins):
         self.doc_ocr = self._load_ocr(path, **kwargs)
 
     def _load_ocr(self, path: str, **kwargs):
-        ocr_provider = kwargs.get("ocr_provider", "tesseract")
+        ocr_provider = kwargs.pop("ocr_provider", "tesseract")
+        use_cache = kwargs.pop("use_cache", True)
+        on_page = kwargs.pop("on_page", None)
+        if use_cache:
+            cache = OCRCache()
+            key = cache.make_key(path, ocr_provider, **kwargs)
+            if (df_lst := cache.get(key)) is not None:
+                if on_page is not None:
+                    on_page(len(df_lst), len(df_lst))
+                return DocOCR.from_df(df_lst)
         parser = OCRParser(ocr_provider)
-        df_lst = parser.parse(path)
+        df_lst = parser.parse(path, on_page=on_page, **kwargs)
+        if use_cache and df_lst:
+            if parser.failed_pages:
+                # Cached, the failed pages would be served as blank for good; the next load retries them.
+                failed = [pageno + 1 for pageno in parser.failed_pages]
+                logger.warning(f"Not caching the OCR of {path}: pages {failed} failed")
+            else:
+                cache.put(key, df_lst)
         doc_ocr: DocOCR = DocOCR.from_df(df_lst)
         return doc_ocr
 
@@ -90,24 +120,138 @@ class OCRDocument(BaseDocument, DocumentMixins):
 
 
 class CSVDocument(BaseDocument):
+    """
+    CSV file read as a stream of record batches, so that exports of any size are ingested with flat memory.
+
+    Every column is read as text (`dtype`, str by default) because the values are only rendered into
+    documents: this keeps the types stable from one batch to the next and avoids the object columns and
+    dtype guessing of a full `pd.read_csv`. `data` still loads the whole frame, for small files only.
+    """
+
     def __init__(self, path: str, **kwargs):
         self.path = path
-        self.data = self._load_csv(path, **kwargs)
+        self.rows_per_document = kwargs.pop("rows_per_document", CSV_ROWS_PER_DOCUMENT)
+        self.tokens_per_document = kwargs.pop("tokens_per_document", CSV_TOKENS_PER_DOCUMENT)
+        self.read_kwargs = kwargs
+        self._data = None
+        self._n_rows: Optional[int] = None
 
-    def _load_csv(self, path: str, **kwargs):
-        return pd.read_csv(path)
+    @classmethod
+    def load_document(cls, path: str, **kwargs) -> "CSVDocument":
+        return cls(path, **kwargs)
 
-    def get_contents(self, **kwargs) -> str:
-        return self.data.to_string()
+    def _load_csv(self, path: str, **kwargs) -> pd.DataFrame:
+        return pd.read_csv(path, **kwargs)
+
+    @property
+    def data(self) -> pd.DataFrame:
+        if self._data is None:
+            self._data = self._load_csv(self.path, **self.read_kwargs)
+        return self._data
+
+    def _iter_arrow(self) -> Iterator[pd.DataFrame]:
+        from pyarrow import csv as pa_csv
+
+        read_options = pa_csv.ReadOptions(block_size=CSV_READ_BLOCK_BYTES)
+        # Only the first block is parsed here, to learn the column names.
+        with pa_csv.open_csv(self.path, read_options=read_options) as reader:
+            columns = reader.schema.names
+        convert_options = pa_csv.ConvertOptions(
+            column_types={column: pa.string() for column in columns}, strings_can_be_null=False
+        )
+        with pa_csv.open_csv(self.path, read_options=read_options, convert_options=convert_options) as reader:
+            for batch in reader:
+                yield batch.to_pandas()
+
+    def _iter_pandas(self) -> Iterator[pd.DataFrame]:
+        kwargs = {"dtype": str, "keep_default_na": False, **self.read_kwargs}
+        yield from pd.read_csv(self.path, chunksize=CSV_READ_CHUNK_ROWS, **kwargs)
+
+    def iter_batches(self) -> Iterator[pd.DataFrame]:
+        """
+        The rows of the file in batches of whatever size the reader produces, columns as strings.
+        pyarrow's streaming reader is used when it is installed and no pandas read options were given.
+        """
+        if pa is not None and not self.read_kwargs:
+            return self._iter_arrow()
+        return self._iter_pandas()
 
-    def __repr__(self):
-        return f"CSVDocument({self.path})"
+    @staticmethod
+    def _row_tokens(rows: pd.DataFrame) -> List[int]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        tokens = []
+        for row in rows.to_numpy().tolist():
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerow(row)
+            tokens.append(count_tokens(buffer.getvalue()))
+        return tokens
+
+    def iter_row_groups(self) -> Iterator[Tuple[int, pd.DataFrame]]:
+        """
+        The rows regrouped into frames of at most `rows_per_document` rows and `tokens_per_document` tokens,
+        header line included, with the index of their first row. A row over the token cap alone makes a frame.
+        """
+        pending: Optional[pd.DataFrame] = None
+        pending_tokens: List[int] = []
+        header_tokens = row_start = 0
+        for batch in self.iter_batches():
+            if pending is None:
+                header_tokens = count_tokens(self._render(batch.iloc[:0]))
+                rows, tokens = batch, self._row_tokens(batch)
+            else:
+                rows = pd.concat([pending, batch], ignore_index=True)
+                tokens = pending_tokens + self._row_tokens(batch)
+            start, used = 0, header_tokens
+            for i, size in enumerate(tokens):
+                if i > start and (i - start >= self.rows_per_document or used + size > self.tokens_per_document):
+                    yield row_start, rows.iloc[start:i]
+                    row_start += i - start
+                    start, used = i, header_tokens
+                used += size
+            pending, pending_tokens = rows.iloc[start:].reset_index(drop=True), tokens[start:]
+        if pending is not None and len(pending):
+            yield row_start, pending
+        self._n_rows = row_start + (len(pending) if pending is not None else 0)
 
-    def __str__(self):
-        return self.get_contents()[:20]
+    @staticmethod
+    def _render(rows: pd.DataFrame) -> str:
+        # The values are already strings, so the csv module is much cheaper here than DataFrame.to_csv.
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(rows.columns)
+        writer.writerows(rows.to_numpy().tolist())
+        return buffer.getvalue().rstrip("\n")
+
+    def get_contents(self, **kwargs) -> str:
+        """
+        The file as CSV text, rendered batch by batch: only the text is held, never the whole frame.
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        for i, batch in enumerate(self.iter_batches()):
+            if i == 0:
+                writer.writerow(batch.columns)
+            writer.writerows(batch.to_numpy().tolist())
+        return buffer.getvalue().rstrip("\n")
+
+    def generate_document(self, **kwargs) -> Iterator[LangchainDocument]:
+        """
+        One document per row group: the header line followed by the rows as CSV. The row range is kept in
+        the metadata (`row_start` inclusive, `row_end` exclusive, counted from the first data row).
+        """
+        for chunk, (row_start, rows) in enumerate(self.iter_row_groups()):
+            metadata = {"source": self.path, "chunk": chunk, "row_start": row_start, "row_end": row_start + len(rows)}
+            yield LangchainDocument(page_content=self._render(rows), metadata=metadata)
 
     def __len__(self):
-        return len(self.data)
+        """
+        Number of data rows, counted batch by batch on first use, or during a full `generate_document` pass.
+        """
+        if self._n_rows is None:
+            self._n_rows = sum(len(batch) for batch in self.iter_batches())
+        return self._n_rows
 
     def __getitem__(self, index):
         return self.data.iloc[index]
@@ -119,4 +263,4 @@ class CSVDocument(BaseDocument):
         return f"CSVDocument({self.path})"
 
     def __str__(self):
-        return self.get_contents()[:20]
+        return f"CSVDocument({self.path})"
@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional
+from uuid import uuid4
+
+from langchain.schema import Document as LangchainDocument
+from loguru import logger
+
+from ..preprocess.document_splitter import DocumentSplitterStrategy
+from ..structures.conversation_store import conversation_store
+from ..utils.utils import log_traceback
+from .channel import CSVDocument, OCRDocument
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", 256))
+
+
+@dataclass
+class IngestionJob:
+    conversation_id: str
+    path: str
+    id: str = field(default_factory=lambda: str(uuid4()))
+    status: str = "queued"
+    pages_done: int = 0
+    pages_total: Optional[int] = None
+    chunks_embedded: int = 0
+    chunks_total: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    @property
+    def progress(self) -> float:
+        """
+        Rough overall progress in [0, 1]: OCR counts for the first half, embedding for the second.
+        """
+        if self.status == "done":
+            return 1.0
+        if self.pages_total:
+            ocr = self.pages_done / self.pages_total
+        else:
+            ocr = 1.0 if self.status == "embedding" else 0.0
+        embedding = self.chunks_embedded / self.chunks_total if self.chunks_total else 0.0
+        return 0.5 * ocr + 0.5 * embedding if self.status == "embedding" else 0.5 * ocr
+
+
+class IngestionService:
+    """
+    Runs OCR (or CSV reading), splitting and embedding of uploaded files on a pool of worker threads, outside the
+    Streamlit script, so that several files are ingested at once and the chat stays usable.
+
+    `submit` returns a job id straight away; the job's status and per-stage progress are updated by
+    the worker as it goes. Documents become searchable as soon as their own file is embedded.
+    """
+
+    def __init__(self, max_workers: int = INGEST_WORKERS, history: int = INGEST_JOB_HISTORY):
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, orchestrator, path: str, **kwargs) -> str:
+        job = IngestionJob(conversation_id=orchestrator.conversation_id, path=path)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, orchestrator, **kwargs)
+        logger.info(f"Queued ingestion job {job.id} for {path}")
+        return job.id
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self._jobs.get(job_id)
+
+    def jobs(self, conversation_id: Optional[str] = None) -> List[IngestionJob]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job for job in jobs if conversation_id is None or job.conversation_id == conversation_id]
+
+    def active(self, conversation_id: Optional[str] = None) -> List[IngestionJob]:
+        return [job for job in self.jobs(conversation_id) if not job.finished]
+
+    def is_ingesting(self, conversation_id: str, path: str) -> bool:
+        return any(job.path == path for job in self.active(conversation_id))
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[: max(0, len(self._jobs) - self.history)]:
+            del self._jobs[job_id]
+
+    @staticmethod
+    def _documents(job: IngestionJob, **kwargs) -> Iterable[LangchainDocument]:
+        """
+        The chunks of the job's file. CSV row groups are already sized and are streamed straight from the
+        file; other files are OCRed first and then split.
+        """
+        if job.path.lower().endswith(".csv"):
+            return CSVDocument(job.path, **kwargs).generate_document()
+        job.status = "ocr"
+
+        def on_page(done: int, total: Optional[int]):
+            job.pages_done, job.pages_total = done, total
+
+        document = OCRDocument(job.path, on_page=on_page, **kwargs)
+        job.pages_total = job.pages_total or job.pages_done
+        return DocumentSplitterStrategy().split(document)
+
+    def _run(self, job: IngestionJob, orchestrator, **kwargs):
+        try:
+            documents = self._documents(job, **kwargs)
+            job.status = "embedding"
+
+            def on_progress(done: int, total: int):
+                job.chunks_embedded, job.chunks_total = done, total
+
+            orchestrator.add_documents(documents, on_progress=on_progress)
+            # Only files that made it into the index are listed as the conversation's context.
+            if job.conversation_id is not None:
+                conversation_store.add_context_file(job.conversation_id, job.path)
+            job.status = "done"
+            logger.info(f"Ingestion job {job.id} done: {job.pages_done} pages, {job.chunks_embedded} chunks")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"Ingestion job {job.id} for {job.path} failed: {e}")
+            log_traceback()
+        finally:
+            job.finished_at = time.time()
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+ingestion_service = IngestionService()
@@ -0,0 +1,148 @@
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import BinaryIO, Dict, Iterator, Optional
+
+from loguru import logger
+
+UPLOAD_DIR = os.getenv(
+    "UPLOAD_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "tmp", "uploads"))
+)
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", 1 << 20))
+UPLOAD_SEEN_SIZE = int(os.getenv("UPLOAD_SEEN_SIZE", 4096))
+MANIFEST_FILE = "manifest.json"
+
+
+class UploadManifest:
+    """
+    Content-addressed store for uploaded files.
+
+    Files are stored once under `<sha256>-<size><ext>`, so two different files with the same name never
+    collide and the same content uploaded twice is written once. The manifest of stored contents is kept
+    in `manifest.json`.
+
+    Streamlit hands back the same uploads on every rerun; uploads already handled are recognised by their
+    upload id before anything is read or written. New uploads are hashed and written straight from the
+    upload buffer, chunk by chunk, without copying it.
+    """
+
+    def __init__(self, root: str = UPLOAD_DIR, seen_size: int = UPLOAD_SEEN_SIZE):
+        self.root = root
+        self.seen_size = seen_size
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._seen: "OrderedDict[str, str]" = OrderedDict()
+        self._entries: Dict[str, dict] = self._load()
+
+    def _load(self) -> Dict[str, dict]:
+        path = os.path.join(self.root, MANIFEST_FILE)
+        if not os.path.isfile(path):
+            return {}
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            # The stored files are intact: uploads of them are simply recorded again.
+            logger.error(f"Unreadable upload manifest {path}, starting a new one: {e}")
+            return {}
+
+    def _save(self):
+        """
+        Write the manifest to a temporary file, flushed to disk, and swap it in: a crash leaves either the
+        old or the new manifest, never a truncated one.
+        """
+        path = os.path.join(self.root, MANIFEST_FILE)
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{MANIFEST_FILE}.", suffix=".tmp", dir=self.root)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self._entries, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def upload_id(file) -> Optional[str]:
+        return getattr(file, "file_id", None) or getattr(file, "id", None)
+
+    @staticmethod
+    def iter_chunks(file: BinaryIO, chunk_bytes: int = UPLOAD_CHUNK_BYTES) -> Iterator[memoryview]:
+        """
+        Chunks of the upload. In-memory uploads are sliced from their buffer without copying.
+        """
+        if hasattr(file, "getbuffer"):
+            buffer = file.getbuffer()
+            try:
+                for start in range(0, len(buffer), chunk_bytes):
+                    yield buffer[start : start + chunk_bytes]
+            finally:
+                buffer.release()
+            return
+        file.seek(0)
+        while chunk := file.read(chunk_bytes):
+            yield memoryview(chunk)
+
+    def hash_file(self, file: BinaryIO) -> str:
+        digest, size = hashlib.sha256(), 0
+        for chunk in self.iter_chunks(file):
+            digest.update(chunk)
+            size += len(chunk)
+        return f"{digest.hexdigest()}-{size}"
+
+    def path(self, key: str, name: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}{os.path.splitext(name)[1].lower()}")
+
+    def store(self, file) -> Optional[str]:
+        """
+        Store an upload and return its content-addressed path, or None if this very upload was already
+        handled by an earlier rerun.
+        """
+        upload_id = self.upload_id(file)
+        with self._lock:
+            if upload_id is not None and upload_id in self._seen:
+                self._seen.move_to_end(upload_id)
+                return None
+        key = self.hash_file(file)
+        path = self.path(key, file.name)
+        with self._lock:
+            if key not in self._entries or not os.path.isfile(path):
+                self._write(file, path)
+                self._entries[key] = {"path": path, "name": file.name, "created_at": time.time()}
+                self._save()
+            else:
+                logger.debug(f"{file.name} is already stored at {path}")
+            if upload_id is not None:
+                self._seen[upload_id] = path
+                while len(self._seen) > self.seen_size:
+                    self._seen.popitem(last=False)
+        return path
+
+    def _write(self, file: BinaryIO, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            for chunk in self.iter_chunks(file):
+                f.write(chunk)
+        os.replace(tmp_path, path)
+        logger.debug(f"Stored upload {file.name} at {path}")
+
+    def name(self, path: str) -> str:
+        """
+        Original name of a stored file.
+        """
+        key = os.path.splitext(os.path.basename(path))[0]
+        return self._entries.get(key, {}).get("name", os.path.basename(path))
+
+    def __len__(self):
+        return len(self._entries)
+
+
+upload_manifest = UploadManifest()
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import List, Optional
+
+import pandas as pd
+from loguru import logger
+
+from ..utils.utils import log_traceback
+
+OCR_CACHE_DIR = os.getenv(
+    "OCR_CACHE_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "tmp", "ocr_cache"))
+)
+OCR_CACHE_MAX_MB = int(os.getenv("OCR_CACHE_MAX_MB", 1024))
+
+# Settings that change how fast OCR runs but not what it produces.
+NON_KEY_SETTINGS = ("parallelize", "max_workers", "memory_budget_mb")
+
+
+class OCRCache:
+    """
+    Content-addressed on-disk cache of per-page OCR DataFrames.
+
+    Each entry is a directory named after the cache key holding one Parquet file per page.
+    Recency is tracked through the directory mtime and the least recently used entries are
+    evicted once the cache grows past ``max_mb``.
+    """
+
+    def __init__(self, cache_dir: str = OCR_CACHE_DIR, max_mb: int = OCR_CACHE_MAX_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_mb * 1024 * 1024
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(chunk_size):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def make_key(self, path: str, provider: str, **settings) -> str:
+        settings = {k: v for k, v in settings.items() if k not in NON_KEY_SETTINGS}
+        settings_str = json.dumps({"provider": provider, **settings}, sort_keys=True, default=str)
+        settings_hash = hashlib.sha256(settings_str.encode()).hexdigest()[:16]
+        return f"{self.hash_file(path)}-{settings_hash}"
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key: str) -> Optional[List[pd.DataFrame]]:
+        entry_dir = self._entry_dir(key)
+        if not os.path.isdir(entry_dir):
+            logger.debug(f"OCR cache miss: {key}")
+            return None
+        try:
+            files = sorted(f for f in os.listdir(entry_dir) if f.endswith(".parquet"))
+            df_lst = [pd.read_parquet(os.path.join(entry_dir, f)) for f in files]
+        except Exception as e:
+            logger.error(f"Failed to read OCR cache entry {key}: {e}")
+            log_traceback()
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+        os.utime(entry_dir)
+        logger.info(f"OCR cache hit: {key} ({len(df_lst)} pages)")
+        return df_lst
+
+    def put(self, key: str, df_lst: List[pd.DataFrame]):
+        entry_dir = self._entry_dir(key)
+        # Unique per writer: ingestion threads of one process may write the same entry at the same time.
+        tmp_dir = tempfile.mkdtemp(prefix=f"{key}.", suffix=".tmp", dir=self.cache_dir)
+        try:
+            for pageno, df in enumerate(df_lst):
+                if "Text" in df.columns:
+                    df = df.astype({"Text": str})
+                df.reset_index(drop=True).to_parquet(os.path.join(tmp_dir, f"page_{pageno:05d}.parquet"), index=False)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            try:
+                os.replace(tmp_dir, entry_dir)
+            except OSError:
+                if not os.path.isdir(entry_dir):
+                    raise
+                # Another writer stored the same entry in between; it holds the same pages.
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except Exception as e:
+            logger.error(f"Failed to write OCR cache entry {key}: {e}")
+            log_traceback()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self.evict()
+
+    @staticmethod
+    def _dir_size(path: str) -> int:
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_dir() and not entry.name.endswith(".tmp"):
+                entries.append((entry.stat().st_mtime, self._dir_size(entry.path), entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            logger.debug(f"Evicting OCR cache entry {os.path.basename(path)}")
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
@@ -1,18 +1,39 @@
-from typing import List
+import itertools
+import multiprocessing
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 import pytesseract
 from loguru import logger
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image
 from pytesseract import Output
 
 from ..utils.ocr_utils import DFMixins, OCRMixins
 from .base import BaseExtractor
 
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", os.cpu_count() or 1))
+OCR_DPI = int(os.getenv("OCR_DPI", 200))
+OCR_MEMORY_BUDGET_MB = int(os.getenv("OCR_MEMORY_BUDGET_MB", 512))
+# Forking a process that runs threads (Streamlit, the ingestion pool) can deadlock the children.
+OCR_START_METHOD = os.getenv(
+    "OCR_START_METHOD", "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
 
 class TesseractExtractor(BaseExtractor, OCRMixins, DFMixins):
+    """
+    Pages whose OCR fails come back as empty frames; their positions in the returned list are kept in
+    `failed_pages` so that callers can tell them apart from blank pages.
+    """
+
+    def __init__(self):
+        self.failed_pages: List[int] = []
 
     def split_filename_and_ext(self):
         file = self.file_path.split("/")[-1].rsplit(".", 1)
@@ -41,20 +62,155 @@ class TesseractExtractor(BaseExtractor, OCRMixins, DFMixins):
         df_standard = df[OCRMixins.COLUMNS]
         return df_standard
 
-    def extract(self, file: str, parallelize: bool = False) -> List[pd.DataFrame]:
+    @staticmethod
+    def get_page_window(info: dict, dpi: int, memory_budget_mb: float) -> int:
+        """
+        Number of pages that can be rasterized at once without exceeding the memory budget.
+        Each page is held twice while in flight, once as a PIL image and once as a numpy array.
+        """
+        match = re.match(r"([\d.]+) x ([\d.]+)", info.get("Page size", ""))
+        width_pts, height_pts = (float(match.group(1)), float(match.group(2))) if match else (612.0, 792.0)
+        page_bytes = (width_pts / 72 * dpi) * (height_pts / 72 * dpi) * 3 * 2
+        return max(1, int(memory_budget_mb * 1024 * 1024 // page_bytes))
+
+    @staticmethod
+    def get_page_ranges(page_numbers: List[int], window: int) -> Iterator[Tuple[int, int]]:
+        """
+        Group 1-based page numbers into contiguous (first_page, last_page) runs of at most `window` pages.
+        """
+        first_page = last_page = None
+        for page in sorted(page_numbers):
+            if first_page is not None and page == last_page + 1 and page - first_page < window:
+                last_page = page
+                continue
+            if first_page is not None:
+                yield first_page, last_page
+            first_page = last_page = page
+        if first_page is not None:
+            yield first_page, last_page
+
+    @classmethod
+    def get_parallel_limits(
+        cls, info: Optional[dict], dpi: int, memory_budget_mb: float, max_workers: int
+    ) -> Tuple[int, int]:
+        """
+        Workers and pages in flight for page-parallel OCR. Half the memory budget goes to the rasterization
+        window and half to the pages in flight, each held once here and once by the worker OCRing it.
+        """
+        max_pending = 2 * max(1, max_workers)
+        if info is not None:
+            max_pending = min(max_pending, cls.get_page_window(info, dpi, memory_budget_mb / 2))
+        return max(1, min(max_workers, max_pending)), max_pending
+
+    def iter_images(
+        self,
+        file: str,
+        dpi: int = OCR_DPI,
+        memory_budget_mb: float = OCR_MEMORY_BUDGET_MB,
+        pages: Optional[List[int]] = None,
+        info: Optional[dict] = None,
+    ) -> Iterator[np.ndarray]:
+        """
+        Rasterize the file in windows of pages and yield one page at a time, so that peak memory
+        depends on the window size and not on the page count. `pages` restricts rasterization
+        to the given 0-based page indices.
+        """
+        if not file.lower().endswith(".pdf"):
+            yield np.array(Image.open(file))
+            return
+        info = info or pdfinfo_from_path(file)
+        n_pages = int(info["Pages"])
+        page_numbers = [p + 1 for p in pages] if pages is not None else list(range(1, n_pages + 1))
+        window = self.get_page_window(info, dpi, memory_budget_mb)
+        logger.info(f"Rasterizing {len(page_numbers)} pages at {dpi} DPI in windows of {window} pages")
+        for first_page, last_page in self.get_page_ranges(page_numbers, window):
+            window_images = convert_from_path(file, dpi=dpi, first_page=first_page, last_page=last_page)
+            while window_images:
+                img = window_images.pop(0)
+                yield np.array(img)
+                img.close()
+
+    def extract(
+        self,
+        file: str,
+        parallelize: bool = False,
+        max_workers: Optional[int] = None,
+        dpi: int = OCR_DPI,
+        memory_budget_mb: int = OCR_MEMORY_BUDGET_MB,
+        pages: Optional[List[int]] = None,
+        on_page: Optional[Callable[[int], None]] = None,
+        **kwargs,
+    ) -> List[pd.DataFrame]:
+        """
+        OCR the file page by page. `on_page` is called with the 0-based number of each page as it is done.
+        """
+        self.failed_pages = []
+        page_numbers = sorted(pages) if pages is not None else itertools.count()
+        if parallelize:
+            return self._extract_parallel(
+                file, page_numbers, max_workers or OCR_MAX_WORKERS, dpi, memory_budget_mb, pages, on_page
+            )
+        images = self.iter_images(file, dpi=dpi, memory_budget_mb=memory_budget_mb, pages=pages)
         df_list = []
-        if file.lower().endswith(".pdf"):
-            files = convert_from_path(file)
-            files = [np.array(img) for img in files]
-        else:
-            img_ = Image.open(file)
-            files = [np.array(img_)]
-        for img in files:
-            df = self.get_ocr_dataframe(img)
-            df_list.append(df)
+        for position, (pageno, img) in enumerate(zip(page_numbers, images)):
+            df_list.append(self._get_page_dataframe(position, pageno, img))
+            del img
+            if on_page is not None:
+                on_page(pageno)
+        return df_list
 
+    def _extract_parallel(
+        self,
+        file: str,
+        page_numbers: Iterable[int],
+        max_workers: int,
+        dpi: int,
+        memory_budget_mb: int,
+        pages: Optional[List[int]] = None,
+        on_page: Optional[Callable[[int], None]] = None,
+    ) -> List[pd.DataFrame]:
+        info = pdfinfo_from_path(file) if file.lower().endswith(".pdf") else None
+        max_workers, max_pending = self.get_parallel_limits(info, dpi, memory_budget_mb, max_workers)
+        images = self.iter_images(file, dpi=dpi, memory_budget_mb=memory_budget_mb / 2, pages=pages, info=info)
+        logger.info(f"OCR-ing pages with {max_workers} workers, at most {max_pending} pages in flight")
+        df_list = []
+        pending = deque()
+        mp_context = multiprocessing.get_context(OCR_START_METHOD)
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as executor:
+            for position, (pageno, img) in enumerate(zip(page_numbers, images)):
+                pending.append((position, pageno, executor.submit(self.get_ocr_dataframe, img)))
+                del img
+                if len(pending) >= max_pending:
+                    df_list.append(self._collect_page_dataframe(*pending.popleft(), on_page))
+            while pending:
+                df_list.append(self._collect_page_dataframe(*pending.popleft(), on_page))
         return df_list
 
+    def _get_page_dataframe(self, position: int, pageno: int, img: np.ndarray) -> pd.DataFrame:
+        try:
+            return self.get_ocr_dataframe(img)
+        except Exception as e:
+            logger.error(f"OCR failed for page {pageno + 1}: {e}")
+            self.failed_pages.append(position)
+            return self.get_empty_dataframe()
+
+    def _collect_page_dataframe(
+        self, position: int, pageno: int, future, on_page: Optional[Callable[[int], None]] = None
+    ) -> pd.DataFrame:
+        try:
+            df = future.result()
+        except Exception as e:
+            logger.error(f"OCR failed for page {pageno + 1}: {e}")
+            self.failed_pages.append(position)
+            df = self.get_empty_dataframe()
+        if on_page is not None:
+            on_page(pageno)
+        return df
+
+    @staticmethod
+    def get_empty_dataframe() -> pd.DataFrame:
+        return pd.DataFrame(columns=OCRMixins.COLUMNS)
+
     def get_ocr_dataframe(self, img):
         df = pytesseract.image_to_data(img, output_type=Output.DATAFRAME)
         df = df.dropna(subset=["text"])
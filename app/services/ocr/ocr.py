@@ -1,5 +1,5 @@
 import os
-from typing import List, Union
+from typing import Callable, List, Optional, Union
 
 import fitz
 import pandas as pd
@@ -12,55 +12,153 @@ from .base import BaseParser
 from .extractors import OCRProvider
 
 OCR_PROVIDER = os.getenv("OCR_PROVIDER", "tesseract")
+# A text layer this sparse is a stamp, header or page number rather than the page's body.
+OCR_MIN_PAGE_WORDS = int(os.getenv("OCR_MIN_PAGE_WORDS", 10))
+# A page mostly covered by an image is a scan unless its words also cover a fair share of it.
+OCR_SCAN_IMAGE_COVERAGE = float(os.getenv("OCR_SCAN_IMAGE_COVERAGE", 0.8))
+OCR_MIN_TEXT_COVERAGE = float(os.getenv("OCR_MIN_TEXT_COVERAGE", 0.05))
 
 
 class DigitalOCRParser(BaseParser, OCRMixins):
+    WORD_COLUMNS = [
+        "Text",
+        "x0",
+        "y0",
+        "x2",
+        "y2",
+        "block",
+        "line",
+        "brk",
+    ]
+
     def parse(self, file: str, **kwargs):
         doc = fitz.open(file)
         df_list = []
         for pageno, page in enumerate(doc):
-            page_word_detail_list = self._pdf_text_extract_page(page)
-            COLUMNS = [
-                "Text",
-                "x0",
-                "y0",
-                "x2",
-                "y2",
-                "block",
-                "line",
-            ]
-            df = pd.DataFrame(page_word_detail_list, columns=COLUMNS)
-            df["page"] = pageno
+            df = self.parse_page(page, pageno)
             df_list.append(df)
 
         return df_list
 
+    def parse_page(self, page: fitz.Page, pageno: int) -> pd.DataFrame:
+        page_word_detail_list = self._pdf_text_extract_page(page)
+        df = pd.DataFrame(page_word_detail_list, columns=self.WORD_COLUMNS)
+        df["page"] = pageno
+        return df
+
 
 class NonDigitalOCRParser(BaseParser, OCRMixins):
 
     def __init__(self, provider: str = OCR_PROVIDER):
         self.provider = provider
+        self.failed_pages: List[int] = []
 
     def parse(self, files: str, **kwargs) -> List[pd.DataFrame]:
         logger.info(f"STARTING {self.__class__.__name__}!!!")
         ocr_extractor = OCRProvider.get_extractor(self.provider)
 
-        df_lst = ocr_extractor.extract(files)
+        df_lst = ocr_extractor.extract(files, **kwargs)
+        self.failed_pages = list(getattr(ocr_extractor, "failed_pages", []))
         return df_lst
 
 
 class OCRParser(BaseParser, OCRMixins):
+    """
+    Routes every page of a PDF to the cheapest parser that can handle it: pages with a text
+    layer are read through PyMuPDF and only the remaining pages are rasterized and OCRed.
+
+    Pages that could not be OCRed are returned as empty frames and listed, 0-based, in `failed_pages`.
+    """
+
     def __init__(self, provider: str = OCR_PROVIDER):
-        self.parsers = (DigitalOCRParser(), NonDigitalOCRParser(provider))
+        self.digital_parser = DigitalOCRParser()
+        self.ocr_parser = NonDigitalOCRParser(provider)
+        self.failed_pages: List[int] = []
+
+    def parse(
+        self, files: str, on_page: Optional[Callable[[int, Optional[int]], None]] = None, **kwargs
+    ) -> List[pd.DataFrame]:
+        """
+        `on_page(done, total)` is called as pages are parsed; `total` is None when the page count is not
+        known up front (non-PDF files).
+        """
+        self.failed_pages = []
+        if not files.lower().endswith(".pdf"):
+            return self._parse_all(files, on_page, **kwargs)
+        try:
+            doc = fitz.open(files)
+        except Exception as e:
+            logger.error(f"Error in {self.digital_parser.__class__.__name__}: {e}")
+            log_traceback()
+            return self._parse_all(files, on_page, **kwargs)
 
-    def parse(self, files: str, **kwargs) -> List[pd.DataFrame]:
         df_lst = []
-        for parser in self.parsers:
+        scanned_pages = []
+        n_pages = len(doc)
+        count_page = self._page_counter(on_page, n_pages)
+        for pageno, page in enumerate(doc):
+            df = self.digital_parser.parse_page(page, pageno)
+            if self.is_digital(page, df):
+                logger.info(f"Page {pageno + 1}: text layer found ({len(df)} words), using digital extraction")
+                count_page()
+            else:
+                logger.info(
+                    f"Page {pageno + 1}: no usable text layer ({len(df)} words), routing to"
+                    f" {self.ocr_parser.provider} OCR"
+                )
+                scanned_pages.append(pageno)
+            df_lst.append(df)
+        doc.close()
+
+        if scanned_pages:
             try:
-                df_lst = parser.parse(files, **kwargs)
+                ocr_dfs = self.ocr_parser.parse(files, pages=scanned_pages, on_page=count_page, **kwargs)
             except Exception as e:
-                logger.error(f"Error in {parser.__class__.__name__}: {e}")
+                logger.error(f"Error in {self.ocr_parser.__class__.__name__}: {e}")
                 log_traceback()
-            if df_lst:
+                self.failed_pages = scanned_pages
                 return df_lst
+            for pageno, df in zip(scanned_pages, ocr_dfs):
+                df["page"] = pageno
+                df_lst[pageno] = df
+            self.failed_pages = [scanned_pages[i] for i in self.ocr_parser.failed_pages]
+        logger.info(f"Routed {len(df_lst) - len(scanned_pages)} digital and {len(scanned_pages)} scanned pages")
         return df_lst
+
+    @staticmethod
+    def _coverage(boxes, page_rect: fitz.Rect) -> float:
+        area = abs(page_rect) or 1.0
+        return sum(abs(fitz.Rect(box) & page_rect) for box in boxes) / area
+
+    @classmethod
+    def is_digital(cls, page: fitz.Page, df: pd.DataFrame) -> bool:
+        """
+        Whether the page's text layer holds its content: at least OCR_MIN_PAGE_WORDS words and, on a page
+        that is mostly one scanned image, words covering at least OCR_MIN_TEXT_COVERAGE of it.
+        """
+        if len(df) < OCR_MIN_PAGE_WORDS:
+            return False
+        images = [info["bbox"] for info in page.get_image_info()]
+        if cls._coverage(images, page.rect) < OCR_SCAN_IMAGE_COVERAGE:
+            return True
+        words = df[["x0", "y0", "x2", "y2"]].itertuples(index=False, name=None)
+        return cls._coverage(words, page.rect) >= OCR_MIN_TEXT_COVERAGE
+
+    def _parse_all(
+        self, files: str, on_page: Optional[Callable[[int, Optional[int]], None]], **kwargs
+    ) -> List[pd.DataFrame]:
+        df_lst = self.ocr_parser.parse(files, on_page=self._page_counter(on_page, None), **kwargs)
+        self.failed_pages = self.ocr_parser.failed_pages
+        return df_lst
+
+    @staticmethod
+    def _page_counter(on_page: Optional[Callable[[int, Optional[int]], None]], total: Optional[int]):
+        done = 0
+
+        def count_page(*_):
+            nonlocal done
+            done += 1
+            if on_page is not None:
+                on_page(done, total)
+
+        return count_page
@@ -0,0 +1,173 @@
+import os
+import re
+import threading
+import zlib
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+from langchain.schema import Document as LangchainDocument
+
+from ..utils.utils import count_tokens
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", 128))
+DEDUP_BANDS = int(os.getenv("DEDUP_BANDS", 16))
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0.85))
+DEDUP_SHINGLE_SIZE = int(os.getenv("DEDUP_SHINGLE_SIZE", 3))
+PROVENANCE_KEYS = ("source", "page_no", "bbox")
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class ChunkDeduplicator:
+    """
+    Drops chunks that are near-duplicates of a chunk seen before, in near-linear time.
+
+    Each chunk gets a MinHash signature over its word shingles. The signature is cut into `bands` bands and
+    chunks sharing any band are candidates; a candidate is a duplicate when the estimated Jaccard similarity
+    reaches `threshold`. Dropped chunks are not lost: their provenance (source, page, bbox) is recorded in
+    `duplicates` under the id of the chunk that was kept, for the caller to attach to it.
+    """
+
+    def __init__(
+        self,
+        num_perm: int = DEDUP_NUM_PERM,
+        bands: int = DEDUP_BANDS,
+        threshold: float = DEDUP_THRESHOLD,
+        shingle_size: int = DEDUP_SHINGLE_SIZE,
+    ):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(1)
+        self._a = rng.integers(0, 2**64 - 1, num_perm, dtype=np.uint64, endpoint=True) | np.uint64(1)
+        self._b = rng.integers(0, 2**64 - 1, num_perm, dtype=np.uint64, endpoint=True)
+        self._buckets: List[Dict[bytes, List[str]]] = [defaultdict(list) for _ in range(bands)]
+        self._signatures: Dict[str, np.ndarray] = {}
+        self.duplicates: Dict[str, List[dict]] = defaultdict(list)
+        self.seen = 0
+        self.dropped = 0
+        self.saved_tokens = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {
+            "seen": self.seen,
+            "dropped": self.dropped,
+            "drop_rate": self.dropped / self.seen if self.seen else 0.0,
+            "saved_tokens": self.saved_tokens,
+        }
+
+    def shingles(self, text: str) -> np.ndarray:
+        words = WORD_PATTERN.findall(text.lower())
+        size = min(self.shingle_size, len(words)) or 1
+        shingles = {" ".join(words[i : i + size]) for i in range(max(len(words) - size + 1, 1))}
+        return np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles), dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        # Multiply-shift hashing of the 32-bit shingle hashes: the high 32 bits of a * x + b (mod 2 ** 64).
+        hashes = (np.outer(self.shingles(text), self._a) + self._b) >> np.uint64(32)
+        return hashes.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows : (band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def find(self, signature: np.ndarray) -> Optional[str]:
+        """
+        Id of a previously added chunk that is a near-duplicate of `signature`, if any.
+        """
+        candidates = set()
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(bucket.get(key, ()))
+        best, best_similarity = None, self.threshold
+        for doc_id in candidates:
+            if (candidate := self._signatures.get(doc_id)) is None:
+                continue
+            similarity = float(np.mean(candidate == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = doc_id, similarity
+        return best
+
+    def add(self, doc_id: str, signature: np.ndarray):
+        self._signatures[doc_id] = signature
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            bucket[key].append(doc_id)
+
+    def discard(self, doc_ids: Iterable[str]):
+        """
+        Forget chunks that did not make it into the index. Their stale bucket entries are skipped by `find`.
+        """
+        with self._lock:
+            for doc_id in doc_ids:
+                self._signatures.pop(doc_id, None)
+                self.duplicates.pop(doc_id, None)
+
+    def add_documents(self, documents: Iterable[LangchainDocument]):
+        for document in documents:
+            self.add(document.id, self.signature(document.page_content))
+
+    @staticmethod
+    def new_counts() -> Dict[str, int]:
+        return {"seen": 0, "dropped": 0, "saved_tokens": 0}
+
+    def filter(
+        self, documents: Iterable[LangchainDocument], counts: Optional[Dict[str, int]] = None
+    ) -> Iterator[LangchainDocument]:
+        """
+        Yield the documents that are not near-duplicates of an earlier one. Documents must have ids.
+        `counts` (see `new_counts`) receives the counts of this call; the lifetime totals are kept on
+        the deduplicator.
+        """
+        counts = counts if counts is not None else self.new_counts()
+        for document in documents:
+            signature = self.signature(document.page_content)
+            with self._lock:
+                self.seen += 1
+                counts["seen"] += 1
+                if (kept_id := self.find(signature)) is None:
+                    self.add(document.id, signature)
+                else:
+                    tokens = count_tokens(document.page_content)
+                    self.dropped += 1
+                    self.saved_tokens += tokens
+                    counts["dropped"] += 1
+                    counts["saved_tokens"] += tokens
+                    provenance = {key: document.metadata[key] for key in PROVENANCE_KEYS if key in document.metadata}
+                    self.duplicates[kept_id].append(provenance)
+            if kept_id is None:
+                yield document
+
+    def pop_duplicates(self, is_kept: Callable[[str], bool] = lambda doc_id: True) -> Dict[str, List[dict]]:
+        """
+        Remove and return the recorded duplicates of the kept chunks for which `is_kept` holds.
+        """
+        with self._lock:
+            return {kept_id: self.duplicates.pop(kept_id) for kept_id in list(self.duplicates) if is_kept(kept_id)}
+
+    def report(self, counts: Optional[Dict[str, int]] = None, bytes_per_vector: int = 0) -> str:
+        """
+        Summary of `counts` from one `filter` call, or of the lifetime totals.
+        """
+        counts = counts if counts is not None else {key: getattr(self, key) for key in self.new_counts()}
+        saved_kb = counts["dropped"] * bytes_per_vector / 1024
+        return (
+            f"Dropped {counts['dropped']} of {counts['seen']} chunks as near-duplicates, saving "
+            f"{counts['saved_tokens']} embedding tokens and ~{saved_kb:.1f} KB of index"
+        )
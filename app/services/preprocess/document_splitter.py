@@ -1,45 +1,161 @@
+import os
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Union
+from typing import TYPE_CHECKING, Iterator, List, Union
 
+import numpy as np
+from langchain.schema import Document as LangchainDocument
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from loguru import logger
 
-from ..ingress.channel import BaseDocument
+from ..utils.utils import count_tokens
+
+if TYPE_CHECKING:
+    from ..ingress.channel import BaseDocument, OCRDocument
+    from ..structures.ocr import OCRDATA
+
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", 256))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 32))
+SPLITTER_STRATEGY = os.getenv("SPLITTER_STRATEGY", "layout")
 
 
 class BaseDocumentSplitter(ABC):
+    name: str
+
+    def __init__(self, chunk_tokens: int = CHUNK_TOKENS, chunk_overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap_tokens = chunk_overlap_tokens
+
     @abstractmethod
-    def split(self, document: BaseDocument, **kwargs) -> List[BaseDocument]:
+    def split(self, document: "BaseDocument", **kwargs) -> Iterator[LangchainDocument]:
         raise NotImplementedError
 
 
 class PageSplitter(BaseDocumentSplitter):
+    """
+    Splits the page documents of a document, or already generated documents, with the recursive
+    character splitter, sizing chunks in tokens.
+    """
+
     name = "page"
 
-    def split(self, documents: List[BaseDocument], **kwargs) -> List[BaseDocument]:
-        logger.info("Splitting the documents into chunks ...")
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, length_function=len)
-        chunks = text_splitter.split_documents(documents)
-        logger.info(f"Splitted into {len(chunks)} chunks.")
-        return chunks
+    def split(self, document: Union["BaseDocument", List[LangchainDocument]], **kwargs) -> Iterator[LangchainDocument]:
+        documents = document if isinstance(document, list) else document.generate_document(**kwargs)
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_tokens, chunk_overlap=self.chunk_overlap_tokens, length_function=count_tokens
+        )
+        for page in documents:
+            yield from text_splitter.split_documents([page])
+
+
+class LayoutSplitter(BaseDocumentSplitter):
+    """
+    Chunks an OCRDocument along its layout: whole paragraphs (which never span OCR blocks or columns) are
+    packed into a chunk until the token budget is reached, and only paragraphs larger than the budget are
+    cut, at line boundaries with `chunk_overlap_tokens` of trailing lines repeated. Chunks never cross
+    pages and carry the page number and the bounding box of their lines.
+
+    Pages are processed lazily, so chunks can be embedded while later pages are still being chunked.
+    """
+
+    name = "layout"
+
+    def split(self, document: "OCRDocument", **kwargs) -> Iterator[LangchainDocument]:
+        chunk_index = 0
+        for pageno, page in enumerate(document.doc_ocr):
+            for text, bbox in self.split_page(page):
+                metadata = {"page_no": pageno + 1, "source": document.path, "bbox": bbox, "chunk": chunk_index}
+                chunk_index += 1
+                yield LangchainDocument(page_content=text, metadata=metadata)
+
+    def split_page(self, page: "OCRDATA") -> Iterator[tuple]:
+        lines = page.lines
+        if lines.empty:
+            return
+        texts = lines["Text"].astype(str).tolist()
+        # Lines are counted as they appear inside a chunk, after a space, so that their counts add up to the
+        # count of the joined text. Each paragraph also pays for the separator that precedes it.
+        tokens = np.fromiter((count_tokens(" " + text) for text in texts), dtype=np.int64, count=len(texts))
+        paragraphs = lines["paragraph"].to_numpy()
+        bboxes = lines[["x0", "y0", "x2", "y2"]].to_numpy(dtype=np.float64)
+        starts = np.flatnonzero(np.r_[True, paragraphs[1:] != paragraphs[:-1]])
+        bounds = np.r_[starts, len(paragraphs)]
+
+        chunk: List[int] = []
+        size = 0
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            paragraph_size = int(tokens[start:end].sum()) + 1
+            if chunk and size + paragraph_size > self.chunk_tokens:
+                yield self._make_chunk(chunk, texts, paragraphs, bboxes)
+                chunk, size = [], 0
+            if paragraph_size <= self.chunk_tokens:
+                chunk.extend(range(start, end))
+                size += paragraph_size
+                continue
+            for row in range(start, end):
+                if chunk and size + tokens[row] > self.chunk_tokens:
+                    yield self._make_chunk(chunk, texts, paragraphs, bboxes)
+                    chunk, size = self._overlap(chunk, tokens)
+                chunk.append(row)
+                size += int(tokens[row])
+        if chunk:
+            yield self._make_chunk(chunk, texts, paragraphs, bboxes)
+
+    def _overlap(self, chunk: List[int], tokens: np.ndarray):
+        overlap, size = [], 0
+        for row in reversed(chunk):
+            if size + tokens[row] > self.chunk_overlap_tokens:
+                break
+            overlap.insert(0, row)
+            size += int(tokens[row])
+        return overlap, size
+
+    @staticmethod
+    def _make_chunk(rows: List[int], texts: List[str], paragraphs: np.ndarray, bboxes: np.ndarray):
+        parts = [texts[rows[0]]]
+        for previous, row in zip(rows[:-1], rows[1:]):
+            parts.append("\n\n" if paragraphs[row] != paragraphs[previous] else " ")
+            parts.append(texts[row])
+        box = bboxes[rows]
+        bbox = [float(box[:, 0].min()), float(box[:, 1].min()), float(box[:, 2].max()), float(box[:, 3].max())]
+        return "".join(parts), bbox
 
 
 class DocumentSplitterStrategy:
-    STRATEGY_MAP = {"page": PageSplitter}
+    STRATEGY_MAP = {"page": PageSplitter, "layout": LayoutSplitter}
 
-    def __init__(self):
+    def __init__(self, chunk_tokens: int = CHUNK_TOKENS, chunk_overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
         self.strategy = None
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap_tokens = chunk_overlap_tokens
 
-    def get_splitter(self, strategy) -> BaseDocumentSplitter:
+    @classmethod
+    def register(cls, splitter: type) -> type:
+        """
+        Class decorator adding a BaseDocumentSplitter subclass to the strategies under its `name`.
+        """
+        cls.STRATEGY_MAP[splitter.name] = splitter
+        return splitter
+
+    def get_splitter(self, strategy: str) -> BaseDocumentSplitter:
         if strategy in self.STRATEGY_MAP:
-            self.strategy = self.STRATEGY_MAP.get(strategy)()
+            self.strategy = self.STRATEGY_MAP.get(strategy)(self.chunk_tokens, self.chunk_overlap_tokens)
         else:
-            raise NotImplementedError(f"Splitter strategy {self.strategy} is not implemented yet!!!")
+            raise NotImplementedError(f"Splitter strategy {strategy} is not implemented yet!!!")
         return self.strategy
 
-    def split(self, document: BaseDocument, **kwargs) -> List[BaseDocument]:
-        splitter = self.get_splitter()
-        return splitter.split(document, **kwargs)
+    def split(
+        self, document: "BaseDocument", strategy: str = SPLITTER_STRATEGY, **kwargs
+    ) -> Iterator[LangchainDocument]:
+        splitter = self.get_splitter(strategy)
+        logger.info(f"Splitting {document!r} into chunks of up to {self.chunk_tokens} tokens ({splitter.name})")
+        return self._log_count(splitter.split(document, **kwargs))
+
+    @staticmethod
+    def _log_count(chunks: Iterator[LangchainDocument]) -> Iterator[LangchainDocument]:
+        n_chunks = 0
+        for n_chunks, chunk in enumerate(chunks, 1):
+            yield chunk
+        logger.info(f"Splitted into {n_chunks} chunks.")
 
     def __repr__(self):
         return f"DocumentSplitterStrategy - ({self.strategy})"
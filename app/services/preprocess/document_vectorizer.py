@@ -0,0 +1,309 @@
+import asyncio
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+import numpy as np
+import openai
+from langchain.schema import Document as LangchainDocument
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+from loguru import logger
+
+from ..utils.utils import count_tokens, log_traceback
+
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "tmp", "embedding_cache.sqlite")),
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 500_000))
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", 20_000))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", 4))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", 6))
+EMBEDDING_BACKOFF_SECONDS = float(os.getenv("EMBEDDING_BACKOFF_SECONDS", 1.0))
+
+
+class EmbeddingStore:
+    """
+    SQLite table of embedding vectors keyed by a hash of (model, text).
+
+    Vectors are stored as raw float16/float32 blobs. Every lookup refreshes `last_access`, and the least
+    recently used rows are dropped once the table grows past `max_entries`.
+    """
+
+    def __init__(
+        self,
+        path: str = EMBEDDING_CACHE_PATH,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+        dtype: str = EMBEDDING_CACHE_DTYPE,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\x00{text}".encode()).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update((key, np.frombuffer(vector, dtype=self.dtype).astype(np.float32)) for key, vector in rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, vectors: Dict[str, List[float]]):
+        now = time.time()
+        rows = [(key, np.asarray(vector, dtype=self.dtype).tobytes(), now) for key, vector in vectors.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if count <= self.max_entries:
+                return
+            logger.debug(f"Evicting {count - self.max_entries} embeddings from the cache")
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+                (count - self.max_entries,),
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves repeated texts from an EmbeddingStore and only sends cache misses
+    to the wrapped backend.
+    """
+
+    def __init__(self, embeddings: Embeddings, store: Optional[EmbeddingStore] = None, model: Optional[str] = None):
+        self.embeddings = embeddings
+        self.store = store if store is not None else EmbeddingStore()
+        self.model = model or getattr(embeddings, "model", embeddings.__class__.__name__)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self.store.make_key(self.model, text) for text in texts]
+        cached = self.store.get_many(list(set(keys)))
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            logger.info(f"Embedding {len(missing)} new texts ({len(texts) - len(missing)} served from cache)")
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            new = dict(zip(missing.keys(), vectors))
+            self.store.put_many(new)
+            dtype = self.store.dtype
+            cached.update((key, np.asarray(vector, dtype=dtype).astype(np.float32)) for key, vector in new.items())
+        return [cached[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class EmbeddingPipeline:
+    """
+    Embeds documents in token-bounded batches, running up to `concurrency` batches at a time and
+    retrying batches that hit rate limits, server errors or timeouts with exponential backoff (honouring
+    Retry-After on 429 responses). Other errors are raised at once.
+
+    Each batch is added to the vector store as soon as it completes, so a batch that keeps failing
+    does not lose the work of the others. Failed documents are kept in `failed`.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_tokens: int = EMBEDDING_BATCH_TOKENS,
+        concurrency: int = EMBEDDING_CONCURRENCY,
+        max_retries: int = EMBEDDING_MAX_RETRIES,
+        backoff: float = EMBEDDING_BACKOFF_SECONDS,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ):
+        self.embeddings = embeddings
+        self.batch_tokens = batch_tokens
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.on_progress = on_progress
+        self.failed: List[LangchainDocument] = []
+
+    def make_batches(self, documents: Iterable[LangchainDocument]) -> Iterator[List[LangchainDocument]]:
+        batch, batch_tokens = [], 0
+        for document in documents:
+            tokens = count_tokens(document.page_content)
+            if batch and batch_tokens + tokens > self.batch_tokens:
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(document)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """
+        Rate limits, server errors, timeouts and dropped connections. Anything else (a bad key, a bad
+        request, a bug) fails the same way on every attempt.
+        """
+        if isinstance(error, (openai.APIConnectionError, TimeoutError, ConnectionError)):
+            return True
+        status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+        return isinstance(status, int) and (status == 429 or status >= 500)
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            return float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            return None
+
+    async def _embed_batch(
+        self, batch: List[LangchainDocument], semaphore: asyncio.Semaphore
+    ) -> Tuple[List[LangchainDocument], Optional[List[List[float]]]]:
+        texts = [document.page_content for document in batch]
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return batch, await self.embeddings.aembed_documents(texts)
+                except Exception as e:
+                    if not self._is_retryable(e):
+                        raise
+                    if attempt == self.max_retries:
+                        logger.error(f"Embedding batch of {len(batch)} documents failed: {e}")
+                        log_traceback()
+                        return batch, None
+                    delay = self._retry_after(e) or self.backoff * 2**attempt * (1 + random.random())
+                    logger.warning(f"Embedding batch of {len(batch)} failed ({e}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+
+    def _add_batch(
+        self, batch: List[LangchainDocument], vectors: List[List[float]], vector_store: Optional[FAISS]
+    ) -> FAISS:
+        text_embeddings = [(document.page_content, vector) for document, vector in zip(batch, vectors)]
+        metadatas = [document.metadata for document in batch]
+        ids = [document.id or str(uuid4()) for document in batch]
+        if vector_store is None:
+            return FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas, ids=ids)
+        vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        return vector_store
+
+    async def aembed_into(
+        self, documents: Iterable[LangchainDocument], vector_store: Optional[FAISS] = None
+    ) -> Optional[FAISS]:
+        """
+        `documents` may be a lazy iterable: batches are sent as soon as they are filled, with at most
+        `concurrency` in flight, so embedding overlaps with whatever produces the documents.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending = set()
+        total_documents = done_documents = n_batches = 0
+
+        async def drain(return_when):
+            nonlocal pending, vector_store, done_documents
+            done, pending = await asyncio.wait(pending, return_when=return_when)
+            for future in done:
+                batch, vectors = future.result()
+                if vectors is None:
+                    self.failed.extend(batch)
+                    continue
+                vector_store = self._add_batch(batch, vectors, vector_store)
+                done_documents += len(batch)
+                if self.on_progress is not None:
+                    self.on_progress(done_documents, total_documents)
+
+        # The documents are produced (OCR, splitting) in a worker thread, so that producing the next batches
+        # goes on while the event loop waits for the embedding calls.
+        loop = asyncio.get_running_loop()
+        batches: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+
+        stopped = threading.Event()
+
+        def produce():
+            try:
+                for batch in self.make_batches(documents):
+                    if stopped.is_set():
+                        return
+                    asyncio.run_coroutine_threadsafe(batches.put(batch), loop).result()
+            finally:
+                if not stopped.is_set():
+                    asyncio.run_coroutine_threadsafe(batches.put(None), loop).result()
+
+        producer = asyncio.ensure_future(asyncio.to_thread(produce))
+        try:
+            while (batch := await batches.get()) is not None:
+                total_documents += len(batch)
+                n_batches += 1
+                pending.add(asyncio.ensure_future(self._embed_batch(batch, semaphore)))
+                if len(pending) >= self.concurrency:
+                    await drain(asyncio.FIRST_COMPLETED)
+            if pending:
+                await drain(asyncio.ALL_COMPLETED)
+        finally:
+            # On an error, unblock the producer and let it stop at its next batch.
+            stopped.set()
+            while not batches.empty():
+                batches.get_nowait()
+        await producer
+        logger.info(f"Embedded {done_documents} of {total_documents} documents in {n_batches} batches")
+        if self.failed:
+            logger.error(f"{len(self.failed)} of {total_documents} documents could not be embedded")
+        return vector_store
+
+    def embed_into(
+        self, documents: Iterable[LangchainDocument], vector_store: Optional[FAISS] = None
+    ) -> Optional[FAISS]:
+        return asyncio.run(self.aembed_into(documents, vector_store))
+
+
+@lru_cache(maxsize=None)
+def get_embeddings() -> CachedEmbeddings:
+    """
+    Process-wide cached embedding client, shared by every conversation and session. It takes no options,
+    so every caller gets the same client, cache connection and hit counters; progress is reported by
+    EmbeddingPipeline's on_progress.
+    """
+    return CachedEmbeddings(OpenAIEmbeddings())
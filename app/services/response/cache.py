@@ -0,0 +1,139 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 256))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 3600))
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", 0.95))
+
+
+@dataclass
+class CacheEntry:
+    response: Dict[str, Any]
+    vector: Optional[np.ndarray]
+    version: int
+    created_at: float
+
+
+class ResponseCache:
+    """
+    Answer cache scoped to an index version.
+
+    Lookups first try the normalized query text, then the most similar cached query by cosine similarity
+    of the query embeddings. Entries expire after `ttl` seconds, the least recently used are dropped past
+    `max_size`, and entries from an older index version are never served.
+    """
+
+    def __init__(
+        self,
+        embeddings: Optional[Embeddings] = None,
+        max_size: int = RESPONSE_CACHE_SIZE,
+        ttl: float = RESPONSE_CACHE_TTL_SECONDS,
+        similarity_threshold: float = RESPONSE_CACHE_SIMILARITY,
+    ):
+        self.embeddings = embeddings
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        query = re.sub(r"\s+", " ", query.strip().lower())
+        return query.rstrip("?!. ")
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        hits = self.exact_hits + self.semantic_hits
+        total = hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "size": len(self._entries),
+        }
+
+    def embed(self, query: str) -> Optional[np.ndarray]:
+        """
+        Normalized embedding of the raw query text. The text is the one retrieval embeds, so with a caching
+        embeddings client the two share a single backend call.
+        """
+        if self.embeddings is None:
+            return None
+        vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _expire(self, version: int):
+        now = time.time()
+        stale = [
+            key for key, entry in self._entries.items() if entry.version != version or now - entry.created_at > self.ttl
+        ]
+        for key in stale:
+            del self._entries[key]
+
+    def get_exact(self, query: str, version: int) -> Optional[Dict[str, Any]]:
+        """
+        The cached response for the normalized query text only; never embeds and never counts a miss.
+        """
+        key = self.normalize(query)
+        with self._lock:
+            self._expire(version)
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            response = self._entries[key].response
+        logger.info(f"Response cache exact hit for {query!r}")
+        return response
+
+    def get(self, query: str, version: int) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """
+        The cached response for `query`, if any, and the query vector when one was computed for the
+        semantic lookup. Pass the vector back to `put` so that a miss costs a single embedding.
+        """
+        if (response := self.get_exact(query, version)) is not None:
+            return response, None
+        with self._lock:
+            candidates = [(k, entry) for k, entry in self._entries.items() if entry.vector is not None]
+        vector = self.embed(query) if candidates else None
+        if vector is not None:
+            similarities = np.stack([entry.vector for _, entry in candidates]) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.similarity_threshold:
+                with self._lock:
+                    best_key, entry = candidates[best]
+                    if best_key in self._entries:
+                        self._entries.move_to_end(best_key)
+                    self.semantic_hits += 1
+                logger.info(f"Response cache semantic hit for {query!r} (similarity {similarities[best]:.3f})")
+                return entry.response, vector
+        with self._lock:
+            self.misses += 1
+        return None, vector
+
+    def put(self, query: str, version: int, response: Dict[str, Any], vector: Optional[np.ndarray] = None):
+        key = self.normalize(query)
+        vector = vector if vector is not None else self.embed(query)
+        entry = CacheEntry(response=response, vector=vector, version=version, created_at=time.time())
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,149 @@
+import os
+import re
+from typing import List, Optional, Tuple
+
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from loguru import logger
+
+from ..structures.conversation import Conversation
+from ..structures.conversation_store import ConversationStore, conversation_store
+from ..utils.utils import count_tokens
+
+MEMORY_ENABLED = os.getenv("MEMORY_ENABLED", "true").lower() == "true"
+MEMORY_HISTORY_TOKENS = int(os.getenv("MEMORY_HISTORY_TOKENS", 1000))
+MEMORY_SUMMARY_WORDS = int(os.getenv("MEMORY_SUMMARY_WORDS", 200))
+MEMORY_FOLD_PAGE = int(os.getenv("MEMORY_FOLD_PAGE", 50))
+MEMORY_LLM_MODEL = os.getenv("MEMORY_LLM_MODEL", "gpt-4o-mini")
+# Questions this short, or referring back to the conversation, are rewritten; the rest stand on their own.
+MEMORY_SHORT_QUESTION_WORDS = int(os.getenv("MEMORY_SHORT_QUESTION_WORDS", 3))
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(it|its|they|them|their|this|that|these|those|he|she|him|her|his|hers|there|former|latter|above|"
+    r"previous|earlier|same|also|else|another|other|more|again|what about|how about)\b|^\s*(and|but|or|so|then)\b",
+    re.IGNORECASE,
+)
+
+SUMMARY_TEMPLATE = """Progressively summarize the conversation between a user and an assistant about their documents.
+Extend the current summary with the new lines and return the new summary in at most {max_words} words.
+Keep names, numbers and the subjects the user asked about.
+
+Current summary:
+{summary}
+
+New lines:
+{lines}
+
+New summary:"""
+
+CONDENSE_TEMPLATE = """Given the conversation below and a follow-up question, rephrase the follow-up question to be a
+standalone question that can be understood without the conversation. Keep its language and return only the question.
+
+Summary of earlier conversation:
+{summary}
+
+Recent conversation:
+{history}
+
+Follow-up question: {question}
+Standalone question:"""
+
+
+class ConversationMemory:
+    """
+    Bounded conversation history for follow-up questions.
+
+    The most recent turns are kept verbatim up to `history_tokens`; older turns are folded into a rolling
+    summary. The summary is stored in the conversation store with the seq of the last turn it covers, so
+    each turn is summarized once, when it falls out of the verbatim window. `llm` is any language model
+    runnable, which makes a fake list model enough for tests; a small model (MEMORY_LLM_MODEL) is enough
+    for summarizing and rewriting.
+    """
+
+    def __init__(
+        self,
+        llm: BaseLanguageModel,
+        store: Optional[ConversationStore] = None,
+        history_tokens: int = MEMORY_HISTORY_TOKENS,
+        summary_words: int = MEMORY_SUMMARY_WORDS,
+    ):
+        self.store = store if store is not None else conversation_store
+        self.history_tokens = history_tokens
+        self.summary_words = summary_words
+        self.summarize_chain = PromptTemplate.from_template(SUMMARY_TEMPLATE) | llm | StrOutputParser()
+        self.condense_chain = PromptTemplate.from_template(CONDENSE_TEMPLATE) | llm | StrOutputParser()
+
+    @staticmethod
+    def format_turns(turns: List[Conversation]) -> str:
+        return "\n".join(f"User: {turn.query.message}\nAssistant: {turn.response.message}" for turn in turns)
+
+    def _recent(self, conversation_id: str) -> List[Conversation]:
+        """
+        The newest turns whose text fits in `history_tokens`, oldest first.
+        """
+        recent: List[Conversation] = []
+        used, before_seq = 0, None
+        while True:
+            page = self.store.load_turns(conversation_id, before_seq=before_seq)
+            for turn in reversed(page):
+                used += count_tokens(self.format_turns([turn]))
+                if used > self.history_tokens:
+                    return recent[::-1]
+                recent.append(turn)
+            if not page or page[0].seq == 0:
+                return recent[::-1]
+            before_seq = page[0].seq
+
+    def _fold(self, conversation_id: str, summary: str, through_seq: int, until_seq: int) -> Tuple[str, int]:
+        """
+        Fold the turns after `through_seq` and before `until_seq` into the summary, a page at a time.
+        """
+        while through_seq + 1 < until_seq:
+            limit = min(MEMORY_FOLD_PAGE, until_seq - through_seq - 1)
+            turns = self.store.load_turns(conversation_id, before_seq=through_seq + 1 + limit, limit=limit)
+            if not turns:
+                break
+            summary = self.summarize_chain.invoke(
+                {"summary": summary or "(empty)", "lines": self.format_turns(turns), "max_words": self.summary_words}
+            ).strip()
+            through_seq = turns[-1].seq
+            self.store.set_summary(conversation_id, summary, through_seq)
+            logger.debug(f"Folded {len(turns)} turns of {conversation_id} into the summary (through {through_seq})")
+        return summary, through_seq
+
+    def history(self, conversation_id: str) -> Tuple[str, List[Conversation]]:
+        """
+        The rolling summary of the older turns and the recent turns kept verbatim.
+        """
+        recent = self._recent(conversation_id)
+        summary, through_seq = self.store.get_summary(conversation_id)
+        if recent:
+            until_seq = recent[0].seq
+        else:
+            until_seq = self.store.count_turns(conversation_id)
+        if through_seq + 1 < until_seq:
+            summary, through_seq = self._fold(conversation_id, summary, through_seq, until_seq)
+        return summary, [turn for turn in recent if turn.seq > through_seq]
+
+    @staticmethod
+    def is_follow_up(question: str) -> bool:
+        """
+        Whether the question may depend on the conversation: it is very short or refers back to it.
+        """
+        return len(question.split()) <= MEMORY_SHORT_QUESTION_WORDS or bool(FOLLOW_UP_PATTERN.search(question))
+
+    def condense_question(self, conversation_id: str, question: str) -> str:
+        """
+        Rewrite a follow-up question into a standalone one. Questions that stand on their own and
+        questions opening a conversation are returned unchanged, without an LLM call.
+        """
+        if not self.is_follow_up(question):
+            return question
+        summary, recent = self.history(conversation_id)
+        if not summary and not recent:
+            return question
+        standalone = self.condense_chain.invoke(
+            {"summary": summary or "(none)", "history": self.format_turns(recent), "question": question}
+        ).strip()
+        logger.debug(f"Condensed {question!r} into {standalone!r}")
+        return standalone or question
@@ -0,0 +1,138 @@
+import math
+import os
+import threading
+from contextlib import nullcontext
+from typing import Optional
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from loguru import logger
+
+ANN_INDEX_TYPE = os.getenv("ANN_INDEX_TYPE", "auto")
+ANN_PROMOTE_TO = os.getenv("ANN_PROMOTE_TO", "hnsw_sq16")
+ANN_PROMOTION_THRESHOLD = int(os.getenv("ANN_PROMOTION_THRESHOLD", 200_000))
+ANN_HNSW_M = int(os.getenv("ANN_HNSW_M", 32))
+ANN_EF_SEARCH = int(os.getenv("ANN_EF_SEARCH", 64))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", 16))
+ANN_PQ_M = int(os.getenv("ANN_PQ_M", 64))
+ANN_TRAIN_SAMPLE = int(os.getenv("ANN_TRAIN_SAMPLE", 100_000))
+
+
+class ANNIndexFactory:
+    """
+    Builds FAISS indexes for the supported modes:
+
+    - `flat`: exact search over float32 vectors (what FAISS.from_documents creates)
+    - `sq16`: exact search over float16 vectors, half the memory
+    - `hnsw` / `hnsw_sq16`: HNSW graph over float32 / float16 vectors
+    - `ivf`: inverted lists with trained centroids over float32 vectors
+    - `ivfpq`: inverted lists with product-quantized codes, the smallest footprint
+
+    A store starts with a flat index, which is promoted once it holds more than ANN_PROMOTION_THRESHOLD
+    vectors: to ANN_INDEX_TYPE, or to ANN_PROMOTE_TO when that is `auto`.
+    """
+
+    INDEX_TYPES = ("flat", "sq16", "hnsw", "hnsw_sq16", "ivf", "ivfpq")
+
+    @staticmethod
+    def n_lists(n_vectors: int) -> int:
+        return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39 or 1))
+
+    @staticmethod
+    def pq_m(dim: int, max_m: int = ANN_PQ_M) -> int:
+        return max(m for m in range(1, min(dim, max_m) + 1) if dim % m == 0)
+
+    @staticmethod
+    def pq_bits(n_vectors: int) -> int:
+        # k-means wants ~39 training points per centroid and each sub-quantizer has 2 ** bits centroids
+        return max(1, min(8, int(math.log2(max(n_vectors // 39, 2)))))
+
+    @classmethod
+    def factory_string(cls, index_type: str, dim: int, n_vectors: int) -> str:
+        if index_type == "flat":
+            return "Flat"
+        if index_type == "sq16":
+            return "SQfp16"
+        if index_type == "hnsw":
+            return f"HNSW{ANN_HNSW_M},Flat"
+        if index_type == "hnsw_sq16":
+            return f"HNSW{ANN_HNSW_M},SQfp16"
+        if index_type == "ivf":
+            return f"IVF{cls.n_lists(n_vectors)},Flat"
+        if index_type == "ivfpq":
+            return f"IVF{cls.n_lists(n_vectors)},PQ{cls.pq_m(dim)}x{cls.pq_bits(n_vectors)}"
+        raise NotImplementedError(f"Index type {index_type} is not implemented yet!!!")
+
+    @staticmethod
+    def set_search_parameters(index: faiss.Index):
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = min(ANN_NPROBE, ivf.nlist)
+        hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+        if hnsw is not None:
+            hnsw.efSearch = ANN_EF_SEARCH
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, index_type: str) -> faiss.Index:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        n_vectors, dim = vectors.shape
+        factory = cls.factory_string(index_type, dim, n_vectors)
+        logger.info(f"Building {index_type} index ({factory}) over {n_vectors} vectors")
+        index = faiss.index_factory(dim, factory, faiss.METRIC_L2)
+        if not index.is_trained:
+            sample = vectors
+            if n_vectors > ANN_TRAIN_SAMPLE:
+                sample = vectors[np.random.default_rng(0).choice(n_vectors, ANN_TRAIN_SAMPLE, replace=False)]
+            index.train(sample)
+        index.add(vectors)
+        cls.set_search_parameters(index)
+        return index
+
+    @staticmethod
+    def is_flat(index: faiss.Index) -> bool:
+        return isinstance(faiss.downcast_index(index), faiss.IndexFlat)
+
+    @classmethod
+    def target_type(cls, vector_store: FAISS, index_type: str = ANN_INDEX_TYPE):
+        """
+        Index type the store should be rebuilt as, or None if it is already in the right shape. Only flat
+        indexes past ANN_PROMOTION_THRESHOLD are rebuilt, whatever the configured type: smaller stores
+        are searched exactly at little cost, and too few vectors would train IVF centroids poorly.
+        """
+        target = ANN_PROMOTE_TO if index_type == "auto" else index_type
+        if target == "flat" or not cls.is_flat(vector_store.index):
+            return None
+        if vector_store.index.ntotal <= ANN_PROMOTION_THRESHOLD:
+            return None
+        return target
+
+    @classmethod
+    def promote(
+        cls, vector_store: FAISS, index_type: str = ANN_INDEX_TYPE, lock: Optional[threading.Lock] = None
+    ) -> bool:
+        """
+        Rebuild the store's flat index as the configured ANN index. Vector positions, and with them the
+        docstore mapping, are preserved.
+
+        `lock` is the one guarding the store. It is only held to snapshot the vectors and to swap the new
+        index in, so searches go on against the flat index while the ANN index is trained and filled.
+        Vectors added in the meantime are copied over at the swap.
+        """
+        lock = lock or nullcontext()
+        with lock:
+            target = cls.target_type(vector_store, index_type)
+            if target is None:
+                return False
+            flat = vector_store.index
+            n_vectors = flat.ntotal
+            vectors = flat.reconstruct_n(0, n_vectors)
+        index = cls.build(vectors, target)
+        with lock:
+            if vector_store.index is not flat:
+                logger.warning("The index was replaced while it was being promoted, dropping the promoted copy")
+                return False
+            if flat.ntotal > n_vectors:
+                index.add(flat.reconstruct_n(n_vectors, flat.ntotal - n_vectors))
+            vector_store.index = index
+        return True
@@ -0,0 +1,161 @@
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain.schema import Document as LangchainDocument
+
+from ..utils.utils import count_tokens
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 3000))
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", 0.7))
+# Shorter runs are too likely to repeat by chance, e.g. a chunk ending and the next starting with "the".
+MIN_OVERLAP_WORDS = 2
+WORD_PATTERN = re.compile(r"\S+")
+
+
+class ContextPacker:
+    """
+    Chooses the context of a prompt from the retrieved candidates.
+
+    Candidates are ordered by maximal marginal relevance, so that a chunk close to one already chosen
+    ranks below a less similar but still relevant one, and then packed greedily until the token budget
+    is used up. Consecutive chunks of the same page are merged into one document and the words they
+    share through the splitter's overlap are counted once.
+    """
+
+    def __init__(self, token_budget: int = CONTEXT_TOKEN_BUDGET, mmr_lambda: float = CONTEXT_MMR_LAMBDA):
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def mmr(self, query_vector: Sequence[float], vectors: Sequence[Sequence[float]]) -> List[int]:
+        """
+        Order of all candidates by maximal marginal relevance (cosine similarity).
+        """
+        vectors = self._normalize(np.asarray(vectors, dtype=np.float32))
+        relevance = vectors @ self._normalize(np.asarray(query_vector, dtype=np.float32))
+        redundancy = np.full(len(vectors), -np.inf, dtype=np.float32)
+        remaining = np.ones(len(vectors), dtype=bool)
+        order: List[int] = []
+        for _ in range(len(vectors)):
+            penalty = np.where(np.isinf(redundancy), 0, redundancy)
+            scores = np.where(remaining, self.mmr_lambda * relevance - (1 - self.mmr_lambda) * penalty, -np.inf)
+            best = int(np.argmax(scores))
+            order.append(best)
+            remaining[best] = False
+            redundancy = np.maximum(redundancy, vectors @ vectors[best])
+        return order
+
+    @staticmethod
+    def _position(document: LangchainDocument) -> Optional[Tuple[str, int, int]]:
+        metadata = document.metadata
+        if metadata.get("page_no") is None or metadata.get("chunk") is None:
+            return None
+        return str(metadata.get("source")), metadata["page_no"], metadata["chunk"]
+
+    @staticmethod
+    def _overlap(first: str, second: str) -> int:
+        """
+        Number of leading words of `second` that repeat the trailing words of `first`. Words rather than
+        lines are compared because splitters join the lines of a paragraph with spaces.
+        """
+        first_words, second_words = first.split(), second.split()
+        for size in range(min(len(first_words), len(second_words)), MIN_OVERLAP_WORDS - 1, -1):
+            if first_words[-size:] == second_words[:size]:
+                return size
+        return 0
+
+    def _join(self, documents: List[LangchainDocument]) -> Tuple[str, int]:
+        """
+        Text of consecutive chunks with the overlapping words kept once, and the tokens that saves.
+        """
+        text, saved = documents[0].page_content, 0
+        for document in documents[1:]:
+            content = document.page_content
+            size = self._overlap(text, content)
+            if not size:
+                text = f"{text}\n{content}"
+                continue
+            words = list(WORD_PATTERN.finditer(content))
+            saved += count_tokens(" ".join(word.group() for word in words[:size]))
+            text += content[words[size - 1].end() :]
+        return text, saved
+
+    def _merge(self, group: List[LangchainDocument]) -> Tuple[LangchainDocument, int]:
+        if len(group) == 1:
+            return group[0], 0
+        text, saved = self._join(group)
+        boxes = [document.metadata.get("bbox") for document in group if document.metadata.get("bbox")]
+        metadata = {
+            **group[0].metadata,
+            "chunks": [document.metadata["chunk"] for document in group],
+            "chunk_ids": [document.id for document in group],
+        }
+        if boxes:
+            metadata["bbox"] = [
+                min(box[0] for box in boxes),
+                min(box[1] for box in boxes),
+                max(box[2] for box in boxes),
+                max(box[3] for box in boxes),
+            ]
+        return LangchainDocument(id=group[0].id, page_content=text, metadata=metadata), saved
+
+    def _groups(self, chosen: List[LangchainDocument]) -> List[List[LangchainDocument]]:
+        """
+        Chosen chunks grouped into runs of consecutive chunks of one page, in order of their best chunk.
+        """
+        groups: List[List[LangchainDocument]] = []
+        runs: Dict[Tuple[str, int, int], List[LangchainDocument]] = {}
+        for document in sorted(chosen, key=lambda document: self._position(document) or ("", 0, 0)):
+            position = self._position(document)
+            previous = runs.pop((position[0], position[1], position[2] - 1), None) if position else None
+            group = previous if previous is not None else []
+            if previous is None:
+                groups.append(group)
+            group.append(document)
+            if position:
+                runs[position] = group
+        rank = {id(document): i for i, document in enumerate(chosen)}
+        return sorted(groups, key=lambda group: min(rank[id(document)] for document in group))
+
+    def pack(
+        self,
+        documents: List[LangchainDocument],
+        query_vector: Optional[Sequence[float]] = None,
+        vectors: Optional[Sequence[Sequence[float]]] = None,
+    ) -> Tuple[List[LangchainDocument], Dict[str, int]]:
+        """
+        The context for a prompt: `documents` reranked by MMR when their vectors are given, packed under
+        the token budget and with adjacent chunks merged. Also returns the token counts before and after.
+        """
+        if query_vector is not None and vectors is not None and len(documents) > 1:
+            documents = [documents[i] for i in self.mmr(query_vector, vectors)]
+        tokens = [count_tokens(document.page_content) for document in documents]
+        chosen: List[LangchainDocument] = []
+        used = 0
+        for document, size in zip(documents, tokens):
+            if used + size <= self.token_budget:
+                chosen.append(document)
+                used += size
+        packed, overlap_saved = [], 0
+        for group in self._groups(chosen):
+            document, saved = self._merge(group)
+            packed.append(document)
+            overlap_saved += saved
+        candidate_tokens = sum(tokens)
+        packed_tokens = used - overlap_saved
+        stats = {
+            "candidates": len(documents),
+            "packed": len(packed),
+            "merged": len(chosen) - len(packed),
+            "candidate_tokens": candidate_tokens,
+            "packed_tokens": packed_tokens,
+            "overlap_tokens_saved": overlap_saved,
+            "tokens_saved": candidate_tokens - packed_tokens,
+        }
+        return packed, stats
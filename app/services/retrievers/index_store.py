@@ -0,0 +1,117 @@
+import os
+import pickle
+import shutil
+import weakref
+from typing import Optional
+
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+from ..preprocess.deduplicator import ChunkDeduplicator
+from .lexical import BM25Index
+
+INDEX_DIR = os.getenv(
+    "INDEX_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "tmp", "indexes"))
+)
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.pkl"
+LEXICAL_FILE = "lexical.pkl"
+DEDUP_FILE = "dedup.pkl"
+MMAP_FLAG = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+# Vector stores whose index is a read-only memory map of a file on disk.
+_MAPPED_STORES = weakref.WeakSet()
+
+
+class IndexStore:
+    """
+    On-disk FAISS index and docstore per conversation.
+
+    Indexes are loaded read-only and memory-mapped, so reopening a conversation costs a page-cache lookup
+    instead of a full read, and processes serving the same conversation share the pages. A mapped index
+    must be made writable with `make_writable` before documents are added to it.
+    """
+
+    def __init__(self, root: str = INDEX_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, conversation_id: str) -> str:
+        return os.path.join(self.root, conversation_id)
+
+    def exists(self, conversation_id: str) -> bool:
+        return os.path.isfile(os.path.join(self.path(conversation_id), INDEX_FILE))
+
+    def save(
+        self,
+        conversation_id: str,
+        vector_store: FAISS,
+        lexical_index: Optional[BM25Index] = None,
+        deduplicator: Optional[ChunkDeduplicator] = None,
+    ):
+        path = self.path(conversation_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(tmp_path, exist_ok=True)
+        faiss.write_index(vector_store.index, os.path.join(tmp_path, INDEX_FILE))
+        with open(os.path.join(tmp_path, DOCSTORE_FILE), "wb") as f:
+            pickle.dump((vector_store.docstore, vector_store.index_to_docstore_id), f, protocol=pickle.HIGHEST_PROTOCOL)
+        if lexical_index is not None:
+            with open(os.path.join(tmp_path, LEXICAL_FILE), "wb") as f:
+                pickle.dump(lexical_index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        if deduplicator is not None:
+            with open(os.path.join(tmp_path, DEDUP_FILE), "wb") as f:
+                pickle.dump(deduplicator, f, protocol=pickle.HIGHEST_PROTOCOL)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        logger.info(f"Saved index of {vector_store.index.ntotal} vectors for conversation {conversation_id}")
+
+    def load(self, conversation_id: str, embeddings: Embeddings, mmap: bool = True) -> Optional[FAISS]:
+        if not self.exists(conversation_id):
+            return None
+        path = self.path(conversation_id)
+        flags = MMAP_FLAG | faiss.IO_FLAG_READ_ONLY if mmap else 0
+        index = faiss.read_index(os.path.join(path, INDEX_FILE), flags)
+        with open(os.path.join(path, DOCSTORE_FILE), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        logger.info(f"Loaded index of {index.ntotal} vectors for conversation {conversation_id} (mmap={mmap})")
+        vector_store = FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id,
+        )
+        if mmap:
+            _MAPPED_STORES.add(vector_store)
+        return vector_store
+
+    def _load_pickle(self, conversation_id: str, filename: str):
+        path = os.path.join(self.path(conversation_id), filename)
+        if not os.path.isfile(path):
+            return None
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def load_lexical(self, conversation_id: str) -> Optional[BM25Index]:
+        return self._load_pickle(conversation_id, LEXICAL_FILE)
+
+    def load_deduplicator(self, conversation_id: str) -> Optional[ChunkDeduplicator]:
+        return self._load_pickle(conversation_id, DEDUP_FILE)
+
+    @staticmethod
+    def is_mapped(vector_store: FAISS) -> bool:
+        return vector_store in _MAPPED_STORES
+
+    @staticmethod
+    def make_writable(vector_store: FAISS) -> FAISS:
+        """
+        Replace a memory-mapped index with an owned in-memory copy so that it can be added to.
+        """
+        if vector_store in _MAPPED_STORES:
+            vector_store.index = faiss.deserialize_index(faiss.serialize_index(vector_store.index))
+            _MAPPED_STORES.discard(vector_store)
+        return vector_store
+
+    def delete(self, conversation_id: str):
+        shutil.rmtree(self.path(conversation_id), ignore_errors=True)
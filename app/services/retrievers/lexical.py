@@ -0,0 +1,92 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+TOKEN_PATTERN = re.compile(r"\w+(?:[-/.]\w+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or that the this to was were what when "
+    "where which who why will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens. Identifiers such as `INV-2023/001` are kept whole and also split into their
+    parts, so both exact and partial lookups match.
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in re.split(r"[-/._]", token) if part and part not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """
+    Incremental in-memory inverted index with Okapi BM25 scoring.
+
+    Documents are referenced by the ids they have in the vector store's docstore, so the index holds
+    only postings and document lengths, not the texts.
+    """
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.doc_ids: List[str] = []
+        self.doc_lengths: List[int] = []
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def add(self, doc_ids: Iterable[str], texts: Iterable[str]):
+        for doc_id, text in zip(doc_ids, texts):
+            tokens = tokenize(text)
+            position = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            self.doc_lengths.append(len(tokens))
+            self.total_length += len(tokens)
+            for term, tf in Counter(tokens).items():
+                self.postings[term][position] = tf
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float, float]]:
+        """
+        Top `k` documents as (doc_id, score, coverage) where coverage is the fraction of distinct
+        query terms the document contains.
+        """
+        terms = set(tokenize(query))
+        if not terms or not self.doc_ids:
+            return []
+        n_docs = len(self.doc_ids)
+        avg_length = self.total_length / n_docs or 1.0
+        scores: Dict[int, float] = defaultdict(float)
+        matches: Dict[int, int] = defaultdict(int)
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[position] / avg_length)
+                scores[position] += idf * tf * (self.k1 + 1) / (tf + norm)
+                matches[position] += 1
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.doc_ids[position], score, matches[position] / len(terms)) for position, score in top]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[str]:
+    """
+    Merge several ranked id lists into one, scoring each id by the sum of 1 / (k + rank).
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
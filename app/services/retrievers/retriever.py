@@ -1,79 +1,429 @@
-from typing import List
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import uuid4
 
 from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.schema import Document as LangchainDocument
 from langchain_community.vectorstores import FAISS
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_core.runnables import RunnableLambda
+from langchain_openai import ChatOpenAI
 from loguru import logger
 
+from ..preprocess.deduplicator import DEDUP_ENABLED, ChunkDeduplicator
+from ..preprocess.document_vectorizer import EmbeddingPipeline, get_embeddings
+from ..response.cache import ResponseCache
+from ..response.memory import MEMORY_ENABLED, MEMORY_LLM_MODEL, ConversationMemory
+from .ann import ANNIndexFactory
+from .context_packer import ContextPacker
+from .index_store import IndexStore
+from .lexical import BM25Index, reciprocal_rank_fusion
+
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o")
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", 4))
+ORCHESTRATOR_REGISTRY_SIZE = int(os.getenv("ORCHESTRATOR_REGISTRY_SIZE", 32))
+HYBRID_FETCH_FACTOR = int(os.getenv("HYBRID_FETCH_FACTOR", 4))
+LEXICAL_FAST_PATH = os.getenv("LEXICAL_FAST_PATH", "true").lower() == "true"
+LEXICAL_DECISIVE_RATIO = float(os.getenv("LEXICAL_DECISIVE_RATIO", 2.0))
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", 12))
+PROMPT_TEMPLATE = """Answer the following question based only on the provided context only:
+
+            <context>
+            {context}
+            </context>
+
+            Question: {input}"""
+
+
+@lru_cache(maxsize=None)
+def get_llm(model: str = LLM_MODEL) -> ChatOpenAI:
+    """
+    Process-wide ChatOpenAI client, shared by every conversation and session.
+    """
+    return ChatOpenAI(model=model)
+
 
 class Retriever:
-    def __init__(self, vector_store):
-        self.vector_store: FAISS = vector_store
+    def __init__(
+        self,
+        vector_store: Optional[FAISS] = None,
+        lexical_index: Optional[BM25Index] = None,
+        deduplicator: Optional[ChunkDeduplicator] = None,
+    ):
+        self.vector_store: Optional[FAISS] = vector_store
+        self.lexical_index: BM25Index = lexical_index if lexical_index is not None else BM25Index()
+        self.deduplicator: ChunkDeduplicator = deduplicator if deduplicator is not None else ChunkDeduplicator()
+        self._lock = threading.Lock()
+        self._positions: Dict[str, int] = {}
+        if lexical_index is None and vector_store is not None:
+            self._build_lexical_index()
+        if deduplicator is None and vector_store is not None and DEDUP_ENABLED:
+            self.deduplicator.add_documents(self.vector_store.docstore.search(doc_id) for doc_id in self._doc_ids())
 
     @classmethod
     def from_documents(cls, documents: List[LangchainDocument]):
-        vector_store = get_vector_store(documents)
-        return cls(vector_store)
+        retriever = cls()
+        retriever.add_documents(documents)
+        return retriever
 
     @classmethod
     def from_vector_store(cls, vector_store):
         return cls(vector_store)
 
-    def add_documents(self, documents: List[LangchainDocument]):
-        self.vector_store.add_documents(documents)
+    @classmethod
+    def from_disk(cls, conversation_id: str, index_store: Optional[IndexStore] = None) -> Optional["Retriever"]:
+        index_store = index_store or IndexStore()
+        vector_store = index_store.load(conversation_id, get_embeddings())
+        if vector_store is None:
+            return None
+        return cls(
+            vector_store,
+            index_store.load_lexical(conversation_id),
+            index_store.load_deduplicator(conversation_id),
+        )
+
+    def save(self, conversation_id: str, index_store: Optional[IndexStore] = None):
+        if self.vector_store is not None:
+            (index_store or IndexStore()).save(
+                conversation_id, self.vector_store, self.lexical_index, self.deduplicator
+            )
+
+    def _doc_ids(self) -> List[str]:
+        return list(self.vector_store.index_to_docstore_id.values())
+
+    def _build_lexical_index(self):
+        doc_ids = self._doc_ids()
+        texts = [self.vector_store.docstore.search(doc_id).page_content for doc_id in doc_ids]
+        self.lexical_index.add(doc_ids, texts)
+        logger.info(f"Built lexical index over {len(doc_ids)} chunks")
+
+    @staticmethod
+    def _with_ids(documents: Iterable[LangchainDocument]) -> Iterator[LangchainDocument]:
+        for document in documents:
+            document.id = document.id or str(uuid4())
+            yield document
+
+    def add_documents(
+        self, documents: Iterable[LangchainDocument], on_progress: Optional[Callable[[int, int], None]] = None
+    ):
+        """
+        Embed and index `documents`, which may be a lazy stream of chunks. Near-duplicates of chunks
+        already indexed are dropped before embedding and recorded on the kept chunk.
+        """
+        self.merge(*self.embed_documents(documents, on_progress))
+
+    def embed_documents(
+        self, documents: Iterable[LangchainDocument], on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> Tuple[Optional[FAISS], List[LangchainDocument], Dict[str, int]]:
+        """
+        Embed `documents` into a separate staging store, leaving the live index untouched and searchable.
+        Returns the staging store, the documents in it and this ingest's deduplication counts, to be
+        passed to `merge`.
+        """
+        documents = self._with_ids(documents)
+        dedup_counts = self.deduplicator.new_counts()
+        if DEDUP_ENABLED:
+            documents = self.deduplicator.filter(documents, dedup_counts)
+        seen: List[LangchainDocument] = []
+
+        def tracked():
+            for document in documents:
+                seen.append(document)
+                yield document
+
+        if self.vector_store is None:
+            embeddings = get_embeddings()
+        else:
+            embeddings = self.vector_store.embedding_function
+        pipeline = EmbeddingPipeline(embeddings, on_progress=on_progress)
+        staged = pipeline.embed_into(tracked())
+        failed = {document.id for document in pipeline.failed}
+        self.deduplicator.discard(failed)
+        return staged, [document for document in seen if document.id not in failed], dedup_counts
+
+    def merge(
+        self,
+        staged: Optional[FAISS],
+        documents: List[LangchainDocument],
+        dedup_counts: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Add a staging store built by `embed_documents` to the live index. Only this step, which copies
+        already computed vectors, excludes concurrent searches; a promotion to an ANN index that it
+        triggers excludes them only while the new index is swapped in.
+        """
+        if staged is None:
+            if DEDUP_ENABLED and dedup_counts:
+                logger.info(self.deduplicator.report(dedup_counts))
+            return
+        with self._lock:
+            if self.vector_store is None:
+                self.vector_store = staged
+            else:
+                IndexStore.make_writable(self.vector_store)
+                ids = [staged.index_to_docstore_id[i] for i in range(staged.index.ntotal)]
+                vectors = staged.index.reconstruct_n(0, staged.index.ntotal)
+                staged_documents = [staged.docstore.search(doc_id) for doc_id in ids]
+                self.vector_store.add_embeddings(
+                    [(document.page_content, vector) for document, vector in zip(staged_documents, vectors)],
+                    metadatas=[document.metadata for document in staged_documents],
+                    ids=ids,
+                )
+            self.lexical_index.add(
+                [document.id for document in documents], [document.page_content for document in documents]
+            )
+            if DEDUP_ENABLED:
+                self._attach_duplicates(dedup_counts)
+        # Training and filling an ANN index takes long at this size: it is built outside the lock.
+        if ANNIndexFactory.promote(self.vector_store, lock=self._lock):
+            logger.info(f"Promoted the index of {self.vector_store.index.ntotal} vectors to an ANN index")
+
+    def _attach_duplicates(self, dedup_counts: Optional[Dict[str, int]] = None):
+        """
+        Record the provenance of dropped near-duplicates on the chunk that was kept in their place.
+        Duplicates of chunks still being embedded by another job are left for that job's merge.
+        """
+        docstore = self.vector_store.docstore
+        duplicates = self.deduplicator.pop_duplicates(
+            lambda doc_id: isinstance(docstore.search(doc_id), LangchainDocument)
+        )
+        for kept_id, provenance in duplicates.items():
+            docstore.search(kept_id).metadata.setdefault("duplicates", []).extend(provenance)
+        index = self.vector_store.index
+        try:
+            bytes_per_vector = index.sa_code_size()
+        except RuntimeError:
+            bytes_per_vector = index.d * 4
+        logger.info(self.deduplicator.report(dedup_counts, bytes_per_vector))
+
+    def _lexical_is_decisive(self, lexical: List[Tuple[str, float, float]]) -> bool:
+        """
+        The top lexical hit matches every query term and clearly outscores the runner-up.
+        """
+        if not LEXICAL_FAST_PATH or not lexical:
+            return False
+        _, top_score, coverage = lexical[0]
+        runner_up = lexical[1][1] if len(lexical) > 1 else 0.0
+        return coverage == 1.0 and top_score >= LEXICAL_DECISIVE_RATIO * runner_up
+
+    def search(self, query: str, k: int = RETRIEVER_K) -> List[LangchainDocument]:
+        """
+        Hybrid search: BM25 and dense results merged by reciprocal-rank fusion. When the lexical result
+        is decisive the dense search, and with it the query embedding call, is skipped.
+        """
+        return self.search_with_vector(query, k)[0]
+
+    def search_with_vector(
+        self, query: str, k: int = RETRIEVER_K
+    ) -> Tuple[List[LangchainDocument], Optional[List[float]]]:
+        """
+        `search`, also returning the query vector, or None when the lexical fast path skipped embedding it.
+        """
+        if self.vector_store is None:
+            return [], None
+        fetch_k = k * HYBRID_FETCH_FACTOR
+        with self._lock:
+            lexical = self.lexical_index.search(query, k=fetch_k)
+            if self._lexical_is_decisive(lexical):
+                logger.debug(f"Lexical fast path for {query!r}")
+                return [self.vector_store.docstore.search(doc_id) for doc_id, _, _ in lexical[:k]], None
+            embeddings = self.vector_store.embedding_function
+        # The query is embedded outside the lock so that a merge is not held up by the embedding call.
+        vector = embeddings.embed_query(query)
+        with self._lock:
+            dense = self.vector_store.similarity_search_by_vector(vector, k=fetch_k)
+            documents = {document.id: document for document in dense}
+            ranked = reciprocal_rank_fusion([list(documents), [doc_id for doc_id, _, _ in lexical]])
+            return [documents.get(doc_id) or self.vector_store.docstore.search(doc_id) for doc_id in ranked[:k]], vector
 
-    def as_retriever(self):
-        return self.vector_store.as_retriever()
+    def vectors(self, documents: List[LangchainDocument]) -> List[List[float]]:
+        """
+        Stored vectors of indexed documents. Indexes that cannot reconstruct vectors (IVF) fall back to
+        the embedding cache, which holds every indexed chunk.
+        """
+        with self._lock:
+            index = self.vector_store.index
+            if len(self._positions) != index.ntotal:
+                self._positions = {doc_id: i for i, doc_id in self.vector_store.index_to_docstore_id.items()}
+            try:
+                return [index.reconstruct(self._positions[document.id]).tolist() for document in documents]
+            except (KeyError, RuntimeError):
+                embeddings = self.vector_store.embedding_function
+        return embeddings.embed_documents([document.page_content for document in documents])
 
 
 class ChainManager:
-    def __init__(self, retriever: Retriever):
+    def __init__(self, retriever: Retriever, packer: Optional[ContextPacker] = None):
         self.retriever = retriever
+        self.packer = packer if packer is not None else ContextPacker()
         self.chain = self.create_chain()
 
     def create_chain(self):
-        llm = ChatOpenAI(model="gpt-4o")
-        prompt = ChatPromptTemplate.from_template(
-            """Answer the following question based only on the provided context only:
-
-            <context>
-            {context}
-            </context>
-
-            Question: {input}"""
-        )
+        llm = get_llm()
+        prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
         document_chain = create_stuff_documents_chain(llm, prompt)
-        retriever = self.retriever.as_retriever()
-        retrieval_chain = create_retrieval_chain(retriever, document_chain)
+        retrieve_context = itemgetter("input") | RunnableLambda(self.retrieve_context) | itemgetter(0)
+        retrieval_chain = create_retrieval_chain(retrieve_context, document_chain)
         return retrieval_chain
 
+    def retrieve_context(self, query: str) -> Tuple[List[LangchainDocument], Dict[str, int]]:
+        """
+        Retrieve CONTEXT_CANDIDATES chunks and pack them into the prompt's token budget. Returns the context
+        and the packing statistics, which are per query and so never kept on the shared chain manager.
+        """
+        candidates, query_vector = self.retriever.search_with_vector(query, k=CONTEXT_CANDIDATES)
+        vectors = self.retriever.vectors(candidates) if query_vector is not None and len(candidates) > 1 else None
+        context, stats = self.packer.pack(candidates, query_vector, vectors)
+        logger.info(
+            f"Packed {stats['candidates']} candidates into {stats['packed']} context documents"
+            f" ({stats['merged']} merged): {stats['packed_tokens']} tokens, {stats['tokens_saved']} saved"
+        )
+        return context, stats
+
     def get_response(self, query: str):
         return self.chain.invoke({"input": query})
 
-    def update_chain(self):
-        logger.info("Updating the chain to reflect new vector store state")
-        self.chain = self.create_chain()
+    def stream_response(self, query: str) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the retrieved context as soon as retrieval finishes, then the answer token by token.
+        """
+        for chunk in self.chain.stream({"input": query}):
+            if "context" in chunk:
+                yield {"context": chunk["context"]}
+            if chunk.get("answer"):
+                yield {"answer": chunk["answer"]}
 
 
 class Orchestrator:
-    def __init__(self, retriever: Retriever):
+    def __init__(
+        self,
+        retriever: Retriever,
+        conversation_id: Optional[str] = None,
+        response_cache: Optional[ResponseCache] = None,
+        memory: Optional[ConversationMemory] = None,
+    ):
         self.retriever = retriever
+        self.conversation_id = conversation_id
         self.chain_manager = ChainManager(self.retriever)
+        self.response_cache = response_cache if response_cache is not None else ResponseCache(get_embeddings())
+        if memory is None and MEMORY_ENABLED and conversation_id is not None:
+            memory = ConversationMemory(get_llm(MEMORY_LLM_MODEL))
+        self.memory = memory
+        self.index_version = 0
+        self._lock = threading.Lock()
+
+    def add_documents(
+        self, documents: Iterable[LangchainDocument], on_progress: Optional[Callable[[int, int], None]] = None
+    ):
+        """
+        Safe to call from several ingestion threads at once: documents are embedded concurrently and only
+        the merge into the index, the version bump and the save are serialized.
+        """
+        staged = self.retriever.embed_documents(documents, on_progress)
+        with self._lock:
+            self.retriever.merge(*staged)
+            self.index_version += 1
+            self.response_cache.invalidate()
+            if self.conversation_id is not None:
+                self.retriever.save(self.conversation_id)
+
+    def standalone_query(self, query: str) -> str:
+        """
+        The query rewritten with the conversation history, so that retrieval and the response cache see
+        follow-up questions in full.
+        """
+        if self.memory is None or self.conversation_id is None:
+            return query
+        return self.memory.condense_question(self.conversation_id, query)
 
-    def add_documents(self, documents: List[LangchainDocument]):
-        self.retriever.add_documents(documents)
-        self.chain_manager.update_chain()
+    def _cached_response(self, query: str, version: int) -> Tuple[Optional[Dict[str, Any]], str, Optional[Any]]:
+        """
+        Look the raw query up in the response cache before paying for condensing it, then the standalone
+        query. Follow-ups skip the first lookup: the same words point elsewhere as the history moves on.
+        Returns the cached response, if any, the standalone query and its vector for `put`.
+        """
+        follow_up = self.memory is not None and self.memory.is_follow_up(query)
+        if not follow_up and (response := self.response_cache.get_exact(query, version)) is not None:
+            return response, query, None
+        query = self.standalone_query(query)
+        response, vector = self.response_cache.get(query, version)
+        return response, query, vector
 
     def get_response(self, query: str):
-        return self.chain_manager.get_response(query)
+        version = self.index_version
+        response, query, vector = self._cached_response(query, version)
+        if response is not None:
+            return response
+        response = self.chain_manager.get_response(query)
+        self.response_cache.put(query, version, response, vector)
+        logger.debug(f"Response cache: {self.response_cache.stats}")
+        return response
+
+    def stream_response(self, query: str) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming counterpart of `get_response`: yields `{"context": [...]}` first and then
+        `{"answer": token}` chunks. The assembled response is cached once the stream completes.
+        """
+        version = self.index_version
+        response, query, vector = self._cached_response(query, version)
+        if response is not None:
+            yield {"context": response["context"]}
+            yield {"answer": response["answer"]}
+            return
+        context, tokens = [], []
+        for chunk in self.chain_manager.stream_response(query):
+            if "context" in chunk:
+                context = chunk["context"]
+            if "answer" in chunk:
+                tokens.append(chunk["answer"])
+            yield chunk
+        response = {"input": query, "context": context, "answer": "".join(tokens)}
+        self.response_cache.put(query, version, response, vector)
+
+
+class OrchestratorRegistry:
+    """
+    Process-wide registry holding one long-lived Orchestrator per conversation, so Streamlit reruns
+    and concurrent sessions reuse the same index, chain and clients. The least recently used
+    conversations are dropped past `max_size`; their indexes stay on disk.
+    """
+
+    def __init__(self, max_size: int = ORCHESTRATOR_REGISTRY_SIZE):
+        self.max_size = max_size
+        self._orchestrators: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, conversation_id: str) -> Orchestrator:
+        with self._lock:
+            if conversation_id in self._orchestrators:
+                self._orchestrators.move_to_end(conversation_id)
+                return self._orchestrators[conversation_id]
+            retriever = Retriever.from_disk(conversation_id) or Retriever()
+            orchestrator = Orchestrator(retriever, conversation_id=conversation_id)
+            self._orchestrators[conversation_id] = orchestrator
+            while len(self._orchestrators) > self.max_size:
+                evicted_id, _ = self._orchestrators.popitem(last=False)
+                logger.debug(f"Dropping orchestrator of conversation {evicted_id} from the registry")
+            return orchestrator
+
+    def __contains__(self, conversation_id: str) -> bool:
+        return conversation_id in self._orchestrators
+
+    def __len__(self):
+        return len(self._orchestrators)
+
+
+orchestrator_registry = OrchestratorRegistry()
 
 
 def get_vector_store(documents: List[LangchainDocument]):
-    embeddings = OpenAIEmbeddings(show_progress_bar=True)
+    embeddings = get_embeddings()
     logger.info("Creating Embeddings")
-    vector_store = FAISS.from_documents(documents=documents, embedding=embeddings)
-    logger.info("Successfully created a vector_store")
+    vector_store = EmbeddingPipeline(embeddings).embed_into(documents)
+    logger.info(f"Successfully created a vector_store. Embedding cache: {embeddings.stats}")
     return vector_store
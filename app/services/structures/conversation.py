@@ -23,6 +23,8 @@ class Conversation(BaseModel):
     query: Message
     response: Message
     context: Optional[str] = None
+    context_ids: List[str] = list()
+    seq: Optional[int] = None
     created_at: str = Field(default_factory=lambda: str(datetime.now()))
 
     def __str__(self):
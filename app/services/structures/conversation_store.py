@@ -0,0 +1,290 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain.schema import Document as LangchainDocument
+
+from .conversation import Conversation, ConversationList, Message
+
+CONVERSATION_DB_PATH = os.getenv(
+    "CONVERSATION_DB_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "tmp", "conversations.sqlite")),
+)
+TURN_PAGE_SIZE = int(os.getenv("TURN_PAGE_SIZE", 20))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    created_at TEXT,
+    updated_at REAL,
+    n_turns INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_updated ON conversations (updated_at);
+CREATE TABLE IF NOT EXISTS turns (
+    id TEXT PRIMARY KEY,
+    conversation_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    query TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_turns_seq ON turns (conversation_id, seq);
+CREATE TABLE IF NOT EXISTS chunks (
+    id TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    metadata TEXT
+);
+CREATE TABLE IF NOT EXISTS turn_context (
+    turn_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    chunk_id TEXT NOT NULL,
+    PRIMARY KEY (turn_id, position)
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    conversation_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    through_seq INTEGER NOT NULL,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS context_files (
+    conversation_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (conversation_id, path)
+);
+"""
+
+
+class ConversationStore:
+    """
+    SQLite store of conversations.
+
+    Turns are only ever inserted, one row per turn, so saving a turn costs the same however long the
+    conversation is. The retrieved context of a turn is stored as references to deduplicated chunk rows.
+    Conversations are listed from their header rows alone and their turns are loaded in pages, newest
+    first, by sequence number.
+    """
+
+    def __init__(self, path: str = CONVERSATION_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    @staticmethod
+    def _message_json(message: Message) -> str:
+        return json.dumps(message.model_dump(by_alias=True))
+
+    @staticmethod
+    def chunk_id(document: LangchainDocument) -> str:
+        return document.id or hashlib.sha256(document.page_content.encode()).hexdigest()
+
+    def create_conversation(self, conversation_list: ConversationList):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO conversations (id, title, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (conversation_list.id, conversation_list.title, conversation_list.created_at, time.time()),
+            )
+            self._conn.commit()
+
+    def list_conversations(self, limit: int = 50, offset: int = 0, search: Optional[str] = None) -> List[Dict]:
+        """
+        Conversation headers (id, title, created_at, n_turns), most recently active first.
+        """
+        query = "SELECT id, title, created_at, n_turns FROM conversations"
+        params: list = []
+        if search:
+            query += " WHERE title LIKE ?"
+            params.append(f"%{search}%")
+        query += " ORDER BY updated_at DESC LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(zip(("id", "title", "created_at", "n_turns"), row)) for row in rows]
+
+    def count_conversations(self, search: Optional[str] = None) -> int:
+        with self._lock:
+            if search:
+                return self._conn.execute(
+                    "SELECT COUNT(*) FROM conversations WHERE title LIKE ?", (f"%{search}%",)
+                ).fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def get_conversation(self, conversation_id: str, last_n: int = TURN_PAGE_SIZE) -> Optional[ConversationList]:
+        """
+        The conversation with its context files and its `last_n` most recent turns.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, title, created_at FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            files = self._conn.execute(
+                "SELECT path FROM context_files WHERE conversation_id = ? ORDER BY rowid", (conversation_id,)
+            ).fetchall()
+        turns = self.load_turns(conversation_id, limit=last_n)
+        return ConversationList(
+            id=row[0],
+            title=row[1],
+            created_at=row[2],
+            conversations=turns,
+            context_files=[path for (path,) in files],
+        )
+
+    def count_turns(self, conversation_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT n_turns FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+        return row[0] if row else 0
+
+    def load_turns(
+        self, conversation_id: str, before_seq: Optional[int] = None, limit: int = TURN_PAGE_SIZE
+    ) -> List[Conversation]:
+        """
+        Up to `limit` turns preceding `before_seq` (the most recent ones by default), oldest first.
+        """
+        before_seq = before_seq if before_seq is not None else 2**62
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, seq, query, response, created_at FROM turns"
+                " WHERE conversation_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+                (conversation_id, before_seq, limit),
+            ).fetchall()
+            turn_ids = [row[0] for row in rows]
+            placeholders = ",".join("?" * len(turn_ids))
+            context_rows = self._conn.execute(
+                f"SELECT turn_id, chunk_id FROM turn_context WHERE turn_id IN ({placeholders})"
+                " ORDER BY turn_id, position",
+                turn_ids,
+            ).fetchall()
+        context_ids: Dict[str, List[str]] = {}
+        for turn_id, chunk_id in context_rows:
+            context_ids.setdefault(turn_id, []).append(chunk_id)
+        return [
+            Conversation(
+                _id=turn_id,
+                seq=seq,
+                query=Message(**json.loads(query)),
+                response=Message(**json.loads(response)),
+                context_ids=context_ids.get(turn_id, []),
+                created_at=created_at,
+            )
+            for turn_id, seq, query, response, created_at in reversed(rows)
+        ]
+
+    def load_window(self, conversation_list: ConversationList, window: int) -> Tuple[List[Conversation], int]:
+        """
+        The `window` most recent turns of a conversation and the number of turns before them. Turns missing
+        from `conversation_list` are loaded from the store and prepended to it, so paging further back only
+        queries the turns not seen yet.
+        """
+        turns = conversation_list.conversations
+        if len(turns) < window and turns and turns[0].seq:
+            turns[:0] = self.load_turns(conversation_list.id, before_seq=turns[0].seq, limit=window - len(turns))
+        visible = turns[-window:]
+        hidden = visible[0].seq if visible and visible[0].seq else len(turns) - len(visible)
+        return visible, hidden
+
+    def append_turn(
+        self, conversation_id: str, conversation: Conversation, context: Sequence[LangchainDocument] = ()
+    ) -> Conversation:
+        """
+        Insert one turn and the references to its context chunks; chunks already stored are not duplicated.
+        """
+        chunk_ids = [self.chunk_id(document) for document in context]
+        with self._lock, self._conn:
+            (seq,) = self._conn.execute(
+                "SELECT n_turns FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone() or (0,)
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunks (id, content, metadata) VALUES (?, ?, ?)",
+                [
+                    (chunk_id, document.page_content, json.dumps(document.metadata, default=str))
+                    for chunk_id, document in zip(chunk_ids, context)
+                ],
+            )
+            self._conn.execute(
+                "INSERT INTO turns (id, conversation_id, seq, query, response, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    conversation.id,
+                    conversation_id,
+                    seq,
+                    self._message_json(conversation.query),
+                    self._message_json(conversation.response),
+                    conversation.created_at,
+                ),
+            )
+            self._conn.executemany(
+                "INSERT INTO turn_context (turn_id, position, chunk_id) VALUES (?, ?, ?)",
+                [(conversation.id, position, chunk_id) for position, chunk_id in enumerate(chunk_ids)],
+            )
+            self._conn.execute(
+                "UPDATE conversations SET n_turns = n_turns + 1, updated_at = ? WHERE id = ?",
+                (time.time(), conversation_id),
+            )
+        conversation.seq = seq
+        conversation.context_ids = chunk_ids
+        return conversation
+
+    def add_context_file(self, conversation_id: str, path: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO context_files (conversation_id, path) VALUES (?, ?)", (conversation_id, path)
+            )
+
+    def get_summary(self, conversation_id: str) -> Tuple[str, int]:
+        """
+        The rolling summary of a conversation and the seq of the last turn folded into it (-1 if none).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, through_seq FROM summaries WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()
+        return row if row else ("", -1)
+
+    def set_summary(self, conversation_id: str, summary: str, through_seq: int):
+        """
+        Store a summary unless one covering later turns was stored meanwhile.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO summaries (conversation_id, summary, through_seq, updated_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (conversation_id) DO UPDATE SET summary = excluded.summary,"
+                " through_seq = excluded.through_seq, updated_at = excluded.updated_at"
+                " WHERE excluded.through_seq > summaries.through_seq",
+                (conversation_id, summary, through_seq, time.time()),
+            )
+
+    def get_chunks(self, chunk_ids: Sequence[str]) -> List[LangchainDocument]:
+        placeholders = ",".join("?" * len(chunk_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, content, metadata FROM chunks WHERE id IN ({placeholders})", list(chunk_ids)
+            ).fetchall()
+        found = {
+            chunk_id: LangchainDocument(id=chunk_id, page_content=content, metadata=json.loads(metadata or "{}"))
+            for chunk_id, content, metadata in rows
+        }
+        return [found[chunk_id] for chunk_id in chunk_ids if chunk_id in found]
+
+    def delete_conversation(self, conversation_id: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM turn_context WHERE turn_id IN (SELECT id FROM turns WHERE conversation_id = ?)",
+                (conversation_id,),
+            )
+            self._conn.execute("DELETE FROM turns WHERE conversation_id = ?", (conversation_id,))
+            self._conn.execute("DELETE FROM context_files WHERE conversation_id = ?", (conversation_id,))
+            self._conn.execute("DELETE FROM summaries WHERE conversation_id = ?", (conversation_id,))
+            self._conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+
+
+conversation_store = ConversationStore()
@@ -1,9 +1,12 @@
 from dataclasses import dataclass
-from typing import List
+from functools import cached_property
+from typing import List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
 from ..utils.ocr_utils import BBoxMixins, DFMixins
+from ..utils.spatial_index import GridIndex
 
 
 @dataclass
@@ -51,126 +54,212 @@ class BBox(BBoxMixins):
         return self.to_tuple()
 
 
+WORD_DTYPE = np.dtype(
+    [
+        ("x0", "f8"),
+        ("y0", "f8"),
+        ("x2", "f8"),
+        ("y2", "f8"),
+        ("Text", "O"),
+        ("block", "i4"),
+        ("page", "i4"),
+        ("index_sort", "i4"),
+        ("line", "i4"),
+        ("confidence", "f4"),
+    ]
+)
+WORD_DEFAULTS = {
+    "x0": -1,
+    "y0": -1,
+    "x2": -1,
+    "y2": -1,
+    "Text": "",
+    "block": -1,
+    "page": -1,
+    "index_sort": -1,
+    "line": -1,
+    "confidence": -1,
+}
+
+
+def _field(name):
+    return property(lambda self: self._data[name][self._index])
+
+
 class Word(BBoxMixins):
-    x0: float
-    y0: float
-    x2: float
-    y2: float
-    Text: str
-    block: int
-    page: int
-    index_sort: int
-    line: int
-    confidence: float
+    """
+    Lightweight view on a single row of a WordList array. No data is copied.
+    """
+
+    __slots__ = ("_data", "_index")
+
+    x0: float = _field("x0")
+    y0: float = _field("y0")
+    x2: float = _field("x2")
+    y2: float = _field("y2")
+    Text: str = _field("Text")
+    block: int = _field("block")
+    page: int = _field("page")
+    index_sort: int = _field("index_sort")
+    line: int = _field("line")
+    confidence: float = _field("confidence")
+
+    def __init__(self, data: np.ndarray, index: int = 0):
+        self._data = data
+        self._index = index
 
     @classmethod
     def create_empty_word(cls):
-        return cls(-1, -1, -1, -1, "", -1, -1, -1, "", -1, -1)
+        return cls.from_dict(WORD_DEFAULTS)
 
     def to_bbox(self):
         return BBox(self.x0, self.y0, self.x2, self.y2)
 
     def to_dict(self):
-        return {
-            "x0": self.x0,
-            "y0": self.y0,
-            "x2": self.x2,
-            "y2": self.y2,
-            "Text": self.Text,
-            "block": self.block,
-            "page": self.page,
-            "index_sort": self.index_sort,
-            "line": self.line,
-            "confidence": self.confidence,
-        }
+        return dict(zip(WORD_DTYPE.names, self._data[self._index].item()))
 
     @classmethod
     def from_dict(cls, data):
-        return cls(
-            data["x0"],
-            data["y0"],
-            data["x2"],
-            data["y2"],
-            data["Text"],
-            data["block"],
-            data["page"],
-            data["index_sort"],
-            data["line"],
-            data["confidence"],
-        )
+        array = np.empty(1, dtype=WORD_DTYPE)
+        array[0] = tuple(data.get(name, WORD_DEFAULTS[name]) for name in WORD_DTYPE.names)
+        return cls(array, 0)
 
     @classmethod
     def from_bbox(cls, bbox):
-        return cls(bbox.x0, bbox.y0, bbox.x2, bbox.y2, "", -1, -1, -1, "", -1, -1)
+        return cls.from_dict({**WORD_DEFAULTS, **bbox.to_dict()})
 
     @property
-    def Text(self):
+    def text(self):
         return self.Text
 
     @property
-    def text(self):
-        return self.Text
+    def bbox(self):
+        return (self.x0, self.y0, self.x2, self.y2)
 
     def __str__(self) -> str:
         return f"{self.Text} - ({self.x0}, {self.y0}, {self.x2}, {self.y2}) - {self.block} - {self.page} - {self.index_sort} - {self.line}"
 
+    def __repr__(self) -> str:
+        return f"Word({self.Text!r})"
+
 
 class WordList:
-    word_list: List[Word]
-    bbox: BBox
+    """
+    Columnar word container backed by a numpy structured array of WORD_DTYPE.
+    Indexing returns Word views and slicing returns WordList views on the same array.
+    Views share a version counter that every write bumps, so that no view keeps a stale bbox.
+    """
+
+    def __init__(self, data: np.ndarray, version: Optional[List[int]] = None):
+        self._data = data
+        self._version = version if version is not None else [0]
+        self._bbox = None
+
+    @property
+    def data(self) -> np.ndarray:
+        return self._data
+
+    @data.setter
+    def data(self, data: np.ndarray):
+        self._data = data
+        self._version = [0]
+        self._bbox = None
+
+    def invalidate(self):
+        """
+        Drop the cached bbox of this list and its views. Needed only after writing to `data` in place.
+        """
+        self._version[0] += 1
 
     @classmethod
     def from_df(cls, df: pd.DataFrame):
-        word_list = [Word.from_dict(row) for index, row in df.iterrows()]
-        bbox = BBoxMixins.combine([word.to_bbox() for word in word_list])
-        return cls(word_list, bbox)
+        data = np.empty(len(df), dtype=WORD_DTYPE)
+        for name in WORD_DTYPE.names:
+            if name in df.columns:
+                column = df[name].to_numpy()
+                data[name] = column.astype(str) if name == "Text" else column
+            else:
+                data[name] = WORD_DEFAULTS[name]
+        return cls(data)
 
     @classmethod
     def from_dict(cls, data: dict):
-        word_list = [Word.from_dict(row) for row in data["word_list"]]
-        bbox = BBox.from_dict(data["bbox"])
-        return cls(word_list, bbox)
+        return cls.from_df(pd.DataFrame(data["word_list"], columns=list(WORD_DTYPE.names)))
 
     def to_df(self):
-        data = [word.to_dict() for word in self.word_list]
-        return pd.DataFrame(data)
+        return pd.DataFrame({name: self.data[name] for name in WORD_DTYPE.names})
 
     def to_dict(self):
         return {
-            "word_list": [word.to_dict() for word in self.word_list],
+            "word_list": self.to_df().to_dict("records"),
             "bbox": self.bbox.to_dict(),
         }
 
     @property
     def words(self):
-        return self.word_list
+        return list(self)
 
     @property
     def text(self):
-        return " ".join([word.Text for word in self.word_list])
+        return " ".join(self.data["Text"])
 
     @property
     def bbox(self):
-        return BBoxMixins.combine([word.to_bbox() for word in self.word_list])
+        if self._bbox is None or self._bbox[0] != self._version[0]:
+            self._bbox = (self._version[0], self._get_bbox())
+        return self._bbox[1]
+
+    def _get_bbox(self):
+        if len(self.data) == 0:
+            return BBox.create_empty_bbox()
+        return BBox(
+            float(self.data["x0"].min()),
+            float(self.data["y0"].min()),
+            float(self.data["x2"].max()),
+            float(self.data["y2"].max()),
+        )
 
     @property
     def Text(self):
         return self.text
 
     def __len__(self):
-        return len(self.word_list)
+        return len(self.data)
+
+    def _check_index(self, index: int) -> int:
+        if index < 0:
+            index += len(self.data)
+        if not 0 <= index < len(self.data):
+            raise IndexError("WordList index out of range")
+        return index
 
     def __getitem__(self, index):
-        return self.word_list[index]
+        if isinstance(index, slice):
+            return WordList(self.data[index], self._version)
+        return Word(self.data, self._check_index(index))
+
+    def __setitem__(self, index, value):
+        """
+        Overwrite a word from a Word or a dict, or a slice from a WordList of the same length.
+        """
+        if isinstance(index, slice):
+            self.data[index] = value.data
+        else:
+            if isinstance(value, Word):
+                value = value.to_dict()
+            self.data[self._check_index(index)] = tuple(
+                value.get(name, WORD_DEFAULTS[name]) for name in WORD_DTYPE.names
+            )
+        self.invalidate()
 
     def __iter__(self):
-        return iter(self.word_list)
+        return (Word(self.data, index) for index in range(len(self.data)))
 
     def __repr__(self):
-        return f"WordList({self.word_list})"
+        return f"WordList({len(self)} words)"
 
     def __str__(self):
-        return str(self.word_list)
+        return str(self.words)
 
 
 class OCRDATA(DFMixins):
@@ -193,9 +282,57 @@ class OCRDATA(DFMixins):
     def create_empty_object(cls):
         return cls(pd.DataFrame())
 
+    @cached_property
+    def words(self) -> WordList:
+        return WordList.from_df(self.df)
+
+    @property
+    def bbox(self) -> BBox:
+        return self.words.bbox
+
+    @cached_property
+    def bboxes(self) -> np.ndarray:
+        if self.df.empty:
+            return np.empty((0, 4), dtype=np.float64)
+        return self.df[["x0", "y0", "x2", "y2"]].to_numpy(dtype=np.float64)
+
+    @cached_property
+    def spatial_index(self) -> GridIndex:
+        return GridIndex(self.bboxes)
+
+    def words_in(self, bbox, contained: bool = False) -> pd.DataFrame:
+        """
+        Words intersecting `bbox`, or fully inside it when `contained` is set.
+        """
+        return self.df.iloc[self.spatial_index.query(bbox, contained=contained)]
+
+    def nearest_words(self, x: float, y: float, k: int = 1) -> pd.DataFrame:
+        return self.df.iloc[self.spatial_index.nearest((x, y), k=k)]
+
+    def group_bboxes(self, columns: Tuple[str, ...] = ("block", "line")) -> pd.DataFrame:
+        """
+        One combined bounding box per group of words, e.g. per line or per block.
+        """
+        if self.df.empty:
+            return pd.DataFrame(columns=[*columns, "x0", "y0", "x2", "y2"])
+        keys, combined = BBoxMixins.combine_grouped(self.bboxes, self.df[list(columns)].to_numpy())
+        return pd.DataFrame(np.column_stack((keys, combined)), columns=[*columns, "x0", "y0", "x2", "y2"])
+
+    @cached_property
+    def ordered_df(self) -> pd.DataFrame:
+        return self.combine(self.df)
+
+    @cached_property
+    def lines(self) -> pd.DataFrame:
+        return self.get_lines(self.ordered_df)
+
+    @cached_property
+    def paragraphs(self) -> pd.DataFrame:
+        return self.get_paragraphs(self.lines)
+
     @property
     def text(self):
-        return " ".join(self.df["Text"])
+        return "\n\n".join(self.paragraphs["Text"])
 
 
 class DocOCR:
@@ -2,12 +2,14 @@ import re
 from typing import List
 
 import fitz
+import numpy as np
 import pandas as pd
 from loguru import logger
 from pydantic import BaseModel
 
 
 class BBoxMixins:
+    __slots__ = ()
 
     @staticmethod
     def iou(bbox1, bbox2):
@@ -52,6 +54,64 @@ class BBoxMixins:
     def bbox_from_image(image):
         return (0, 0, image.width, image.height)
 
+    @staticmethod
+    def as_bbox_array(bboxes) -> np.ndarray:
+        return np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+
+    @staticmethod
+    def bbox_areas(bboxes) -> np.ndarray:
+        b = BBoxMixins.as_bbox_array(bboxes)
+        return (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+
+    @staticmethod
+    def bbox_centers(bboxes) -> np.ndarray:
+        b = BBoxMixins.as_bbox_array(bboxes)
+        return np.column_stack(((b[:, 0] + b[:, 2]) / 2, (b[:, 1] + b[:, 3]) / 2))
+
+    @staticmethod
+    def iou_matrix(bboxes1, bboxes2) -> np.ndarray:
+        """
+        Pairwise Intersection over Union of two sets of bounding boxes, shape (len(bboxes1), len(bboxes2)).
+        """
+        a = BBoxMixins.as_bbox_array(bboxes1)[:, None, :]
+        b = BBoxMixins.as_bbox_array(bboxes2)[None, :, :]
+        width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+        height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+        intersection = width * height
+        union = BBoxMixins.bbox_areas(bboxes1)[:, None] + BBoxMixins.bbox_areas(bboxes2)[None, :] - intersection
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(union > 0, intersection / union, 0.0)
+
+    @staticmethod
+    def intersects(bboxes, bbox) -> np.ndarray:
+        b = BBoxMixins.as_bbox_array(bboxes)
+        x0, y0, x2, y2 = bbox
+        return (b[:, 0] < x2) & (b[:, 2] > x0) & (b[:, 1] < y2) & (b[:, 3] > y0)
+
+    @staticmethod
+    def contained_in(bboxes, bbox) -> np.ndarray:
+        b = BBoxMixins.as_bbox_array(bboxes)
+        x0, y0, x2, y2 = bbox
+        return (b[:, 0] >= x0) & (b[:, 1] >= y0) & (b[:, 2] <= x2) & (b[:, 3] <= y2)
+
+    @staticmethod
+    def combine_grouped(bboxes, groups):
+        """
+        Combine bounding boxes sharing the same group key (e.g. block or (block, line) columns).
+        Returns the unique group keys and one combined bounding box per key.
+        """
+        b = BBoxMixins.as_bbox_array(bboxes)
+        keys, inverse = np.unique(np.asarray(groups), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        combined = np.empty((len(keys), 4), dtype=np.float64)
+        combined[:, :2] = np.inf
+        combined[:, 2:] = -np.inf
+        np.minimum.at(combined[:, 0], inverse, b[:, 0])
+        np.minimum.at(combined[:, 1], inverse, b[:, 1])
+        np.maximum.at(combined[:, 2], inverse, b[:, 2])
+        np.maximum.at(combined[:, 3], inverse, b[:, 3])
+        return keys, combined
+
 
 class OCRMixins:
     COLUMNS: List[str] = [
@@ -85,13 +145,158 @@ class OCRMixins:
 
 
 class DFMixins:
+    LINE_Y_TOLERANCE: float = 0.5
+    SPANNING_LINE_RATIO: float = 0.6
+    COLUMN_GUTTER_RATIO: float = 1.0
+    PARAGRAPH_GAP_RATIO: float = 1.0
+
     @staticmethod
-    def combine(df: pd.DataFrame, horizontal_thresh: float) -> pd.DataFrame:
+    def combine(df: pd.DataFrame, horizontal_thresh: float = 1.0) -> pd.DataFrame:
         """
-        Combine the words in the DataFrame that are adjacent to each other.
+        Combine the words in the DataFrame that are adjacent to each other into lines, columns and
+        paragraphs, and return the words sorted in reading order.
+
+        Adds the columns `line_id`, `column` and `paragraph`, all numbered in reading order. Words on
+        the same baseline are split into separate lines when the horizontal gap between them exceeds
+        `horizontal_thresh` times the median word height. The `block`/`line` columns are used as
+        line hints when present.
         """
         if df.empty:
             return df
 
-        df = df.sort_values(["y0", "x0"]).reset_index(drop=True)
-        return df
+        df = df.reset_index(drop=True)
+        x0, y0, x2, y2 = (df[col].to_numpy(dtype=np.float64) for col in ("x0", "y0", "x2", "y2"))
+        median_h = max(float(np.median(y2 - y0)), 1e-6)
+        line_ids = DFMixins._cluster_lines(df, x0, y0, x2, y2, median_h, horizontal_thresh)
+        lines = DFMixins._order_lines(df.assign(line_id=line_ids), median_h)
+
+        line_rank = np.empty(len(lines), dtype=int)
+        line_rank[lines["line_id"].to_numpy()] = np.arange(len(lines))
+        word_line = line_rank[line_ids]
+        order = np.lexsort((x0, word_line))
+        return df.iloc[order].assign(
+            line_id=word_line[order],
+            column=lines["column"].to_numpy()[word_line[order]],
+            paragraph=lines["paragraph"].to_numpy()[word_line[order]],
+        )
+
+    @staticmethod
+    def _has_line_hints(df: pd.DataFrame) -> bool:
+        return "block" in df.columns and "line" in df.columns and df[["block", "line"]].notna().all().all()
+
+    @staticmethod
+    def _cluster_lines(df, x0, y0, x2, y2, median_h: float, horizontal_thresh: float) -> np.ndarray:
+        """
+        Assign a line id to every word in O(n log n): sort by vertical center (within the block/line
+        hint group when available) and start a new line on a vertical jump, then split each line on
+        large horizontal gaps.
+        """
+        n = len(df)
+        has_hints = DFMixins._has_line_hints(df)
+        if has_hints:
+            _, groups = np.unique(df[["block", "line"]].to_numpy(), axis=0, return_inverse=True)
+            groups = groups.reshape(-1)
+        else:
+            groups = np.zeros(n, dtype=int)
+        y_center = (y0 + y2) / 2
+
+        order = np.lexsort((y_center, groups))
+        breaks = (np.diff(groups[order]) != 0) | (np.diff(y_center[order]) > DFMixins.LINE_Y_TOLERANCE * median_h)
+        rows = np.empty(n, dtype=int)
+        rows[order] = np.concatenate(([0], np.cumsum(breaks)))
+        if has_hints:
+            return rows
+
+        order = np.lexsort((x0, rows))
+        gaps = x0[order][1:] - x2[order][:-1]
+        breaks = (np.diff(rows[order]) != 0) | (gaps > horizontal_thresh * median_h)
+        line_ids = np.empty(n, dtype=int)
+        line_ids[order] = np.concatenate(([0], np.cumsum(breaks)))
+        return line_ids
+
+    @staticmethod
+    def _order_lines(df: pd.DataFrame, median_h: float) -> pd.DataFrame:
+        """
+        Sort lines into reading order and number their columns and paragraphs.
+
+        Lines wider than SPANNING_LINE_RATIO of the page (titles, full-width paragraphs) cut the page
+        into horizontal bands. Within a band, column gutters are found by merging the x-ranges of the
+        remaining lines and columns are read left to right, top to bottom.
+        """
+        agg = {"x0": ("x0", "min"), "y0": ("y0", "min"), "x2": ("x2", "max"), "y2": ("y2", "max")}
+        if "block" in df.columns:
+            agg["block"] = ("block", "first")
+        lines = df.groupby("line_id", sort=True).agg(**agg).reset_index()
+        x0, y0, x2, y2 = (lines[col].to_numpy(dtype=np.float64) for col in ("x0", "y0", "x2", "y2"))
+
+        page_width = max(x2.max() - x0.min(), 1e-6)
+        spanning = (x2 - x0) > DFMixins.SPANNING_LINE_RATIO * page_width
+        span_y0 = np.sort(y0[spanning])
+        band = np.where(
+            spanning,
+            2 * np.searchsorted(span_y0, y0, side="left") + 1,
+            2 * np.searchsorted(span_y0, y0, side="right"),
+        )
+
+        column = np.zeros(len(lines), dtype=int)
+        for band_id in np.unique(band[~spanning]):
+            idx = np.nonzero((band == band_id) & ~spanning)[0]
+            idx = idx[np.argsort(x0[idx], kind="stable")]
+            reach = np.maximum.accumulate(x2[idx])
+            new_column = x0[idx][1:] > reach[:-1] + DFMixins.COLUMN_GUTTER_RATIO * median_h
+            column[idx] = np.concatenate(([0], np.cumsum(new_column)))
+
+        order = np.lexsort((x0, y0, column, band))
+        # Every spanning line sits in a band of its own, so a full-width paragraph (and the short
+        # line that ends it) crosses bands: keep it together when the lines are close and aligned.
+        single_column = np.bincount(band, weights=column, minlength=band.max() + 1) == 0
+        prev, succ = order[:-1], order[1:]
+        close = y0[succ] - y2[prev] <= DFMixins.PARAGRAPH_GAP_RATIO * median_h
+        wrapped = spanning[prev] & single_column[band[succ]] & (np.abs(x0[succ] - x0[prev]) <= median_h)
+        continued = close & ((spanning[prev] & spanning[succ]) | wrapped)
+        new_paragraph = ((band[succ] != band[prev]) & ~continued) | (column[succ] != column[prev]) | ~close
+        if "block" in lines.columns:
+            new_paragraph |= np.diff(lines["block"].to_numpy()[order]) != 0
+        paragraph = np.concatenate(([0], np.cumsum(new_paragraph)))
+        lines = lines.iloc[order].assign(column=column[order], paragraph=paragraph)
+        return lines.reset_index(drop=True)
+
+    @staticmethod
+    def _join_groups(keys: np.ndarray, texts: List[str], sep: str = " ") -> List[str]:
+        """
+        Join `texts` per run of equal consecutive `keys`.
+        """
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        bounds = np.r_[starts, len(keys)]
+        return [sep.join(texts[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+
+    @staticmethod
+    def _group_bbox(df: pd.DataFrame, key: str, extra: List[str]) -> pd.DataFrame:
+        df = df.sort_values(key, kind="stable")
+        grouped = df.groupby(key, sort=True).agg(
+            **{col: (col, "first") for col in extra},
+            x0=("x0", "min"),
+            y0=("y0", "min"),
+            x2=("x2", "max"),
+            y2=("y2", "max"),
+        )
+        grouped["Text"] = DFMixins._join_groups(df[key].to_numpy(), df["Text"].astype(str).tolist())
+        return grouped.reset_index()
+
+    @staticmethod
+    def get_lines(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        One row per line of a DataFrame returned by `combine`, with its text and bounding box.
+        """
+        if df.empty:
+            return pd.DataFrame(columns=["line_id", "paragraph", "column", "x0", "y0", "x2", "y2", "Text"])
+        return DFMixins._group_bbox(df, "line_id", ["paragraph", "column"])
+
+    @staticmethod
+    def get_paragraphs(lines: pd.DataFrame) -> pd.DataFrame:
+        """
+        One row per paragraph of a DataFrame returned by `get_lines`, with its text and bounding box.
+        """
+        if lines.empty:
+            return pd.DataFrame(columns=["paragraph", "column", "x0", "y0", "x2", "y2", "Text"])
+        return DFMixins._group_bbox(lines, "paragraph", ["column"])
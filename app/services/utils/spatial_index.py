@@ -0,0 +1,105 @@
+import numpy as np
+
+from .ocr_utils import BBoxMixins
+
+
+class GridIndex(BBoxMixins):
+    """
+    Uniform grid over the centers of a page's bounding boxes.
+
+    Boxes are bucketed by the cell containing their center and stored CSR-style (sorted box ids plus
+    per-cell offsets), so a query only touches the cells around it. Rectangle queries widen the cell
+    range by the largest half box size, which keeps them exact for boxes spanning several cells.
+    """
+
+    def __init__(self, bboxes, cell_size: float = None):
+        self.bboxes = self.as_bbox_array(bboxes)
+        self.centers = self.bbox_centers(self.bboxes)
+        n = len(self.bboxes)
+        if n:
+            self.origin = self.bboxes[:, :2].min(axis=0)
+            extent = np.maximum(self.bboxes[:, 2:].max(axis=0) - self.origin, 1.0)
+            sizes = self.bboxes[:, 2:] - self.bboxes[:, :2]
+            self.margin = sizes.max(axis=0) / 2
+        else:
+            self.origin = np.zeros(2)
+            extent = np.ones(2)
+            self.margin = np.zeros(2)
+        if cell_size is None:
+            # Roughly a handful of boxes per cell on a uniformly filled page.
+            cell_size = float(np.sqrt(extent[0] * extent[1] / max(n / 4, 1)))
+        self.cell_size = max(cell_size, 1e-6)
+        self.shape = np.maximum(np.ceil(extent / self.cell_size).astype(int), 1)
+
+        cells = self._cell_of(self.centers)
+        cell_ids = cells[:, 1] * self.shape[0] + cells[:, 0]
+        self.order = np.argsort(cell_ids, kind="stable")
+        self.offsets = np.searchsorted(cell_ids[self.order], np.arange(self.shape[0] * self.shape[1] + 1))
+
+    def __len__(self):
+        return len(self.bboxes)
+
+    def _cell_of(self, points) -> np.ndarray:
+        cells = np.floor((np.asarray(points, dtype=np.float64).reshape(-1, 2) - self.origin) / self.cell_size)
+        return np.clip(cells.astype(int), 0, self.shape - 1)
+
+    def _candidates(self, cx0: int, cy0: int, cx2: int, cy2: int) -> np.ndarray:
+        rows = [
+            self.order[self.offsets[cy * self.shape[0] + cx0] : self.offsets[cy * self.shape[0] + cx2 + 1]]
+            for cy in range(cy0, cy2 + 1)
+        ]
+        return np.concatenate(rows) if rows else np.empty(0, dtype=int)
+
+    def query(self, bbox, contained: bool = False) -> np.ndarray:
+        """
+        Indices of the boxes intersecting `bbox` (or fully inside it when `contained` is set), in input order.
+        """
+        if not len(self):
+            return np.empty(0, dtype=int)
+        x0, y0, x2, y2 = bbox
+        (cx0, cy0), (cx2, cy2) = self._cell_of(
+            [[x0 - self.margin[0], y0 - self.margin[1]], [x2 + self.margin[0], y2 + self.margin[1]]]
+        )
+        candidates = self._candidates(cx0, cy0, cx2, cy2)
+        check = self.contained_in if contained else self.intersects
+        return np.sort(candidates[check(self.bboxes[candidates], bbox)])
+
+    def nearest(self, point, k: int = 1) -> np.ndarray:
+        """
+        Indices of the `k` boxes whose centers are closest to `point`, nearest first.
+        """
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=int)
+        point = np.asarray(point, dtype=np.float64)
+        cx, cy = self._cell_of(point)[0]
+        radius = 0
+        while True:
+            cx0, cy0 = max(cx - radius, 0), max(cy - radius, 0)
+            cx2, cy2 = min(cx + radius, self.shape[0] - 1), min(cy + radius, self.shape[1] - 1)
+            candidates = self._candidates(cx0, cy0, cx2, cy2)
+            covers_all = cx0 == 0 and cy0 == 0 and cx2 == self.shape[0] - 1 and cy2 == self.shape[1] - 1
+            if len(candidates) >= k:
+                distances = np.linalg.norm(self.centers[candidates] - point, axis=1)
+                nearest = np.argsort(distances, kind="stable")[:k]
+                if covers_all or distances[nearest[-1]] <= self._searched_distance(point, cx0, cy0, cx2, cy2):
+                    return candidates[nearest]
+            radius += 1
+
+    def _searched_distance(self, point, cx0: int, cy0: int, cx2: int, cy2: int) -> float:
+        """
+        Distance from `point` to the closest edge of the searched cell range that is not a grid border.
+        Nothing outside the searched range can be closer than this.
+        """
+        lo = self.origin + np.array([cx0, cy0]) * self.cell_size
+        hi = self.origin + (np.array([cx2, cy2]) + 1) * self.cell_size
+        distances = [np.inf]
+        if cx0 > 0:
+            distances.append(point[0] - lo[0])
+        if cy0 > 0:
+            distances.append(point[1] - lo[1])
+        if cx2 < self.shape[0] - 1:
+            distances.append(hi[0] - point[0])
+        if cy2 < self.shape[1] - 1:
+            distances.append(hi[1] - point[1])
+        return max(min(distances), 0.0)
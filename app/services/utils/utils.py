@@ -1,7 +1,27 @@
 import traceback
+from functools import lru_cache
 
 from loguru import logger
 
 
 def log_traceback():
     logger.error(f"TRACEBACK: {traceback.format_exc()}")
+
+
+@lru_cache(maxsize=1)
+def get_token_encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable ({e}), estimating tokens from characters")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = get_token_encoding()
+    if encoding is None:
+        # Rounded up, so that the estimates of the parts of a text add up to at least the estimate of the whole.
+        return max(1, -(-len(text) // 4))
+    return len(encoding.encode(text, disallowed_special=()))
@@ -1,22 +1,47 @@
-from typing import Generic, Optional, TypeVar
+import time
+from typing import Any, Dict, Generic, MutableMapping, Optional, TypeVar
 
 import streamlit as st
 from loguru import logger
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, Field, PrivateAttr
 from pydantic.generics import GenericModel
 
 T = TypeVar("T")
 
 
 class SessionState(GenericModel):
-    session: Optional[dict] = Field(..., exclude=False)
+    """
+    Typed view over st.session_state.
+
+    Assignments only mark a field dirty; `sync_to_session` then writes the dirty fields, by reference, once
+    per rerun. Nothing is dumped or copied, so large objects (page state, conversation lists, indexes) cost
+    the same to keep in the session however big they grow. In-place mutations of a field must be flagged
+    with `mark_dirty`.
+    """
+
+    # Kept as the very object passed in: validating it as a dict would copy st.session_state.
+    session: Optional[Any] = Field(..., exclude=False)
     pages: Optional[dict] = Field(default_factory=dict)
     file_uploaded: bool = False
     theme: str = "light"
     user: str = "Random User"
     metadata: Optional[dict] = Field(default_factory=dict)
+    conversation_id: Optional[str] = None
     vector_store: Optional[T] = Field(default_factory=lambda: None)
 
+    _dirty: set = PrivateAttr(default_factory=set)
+    _sync_stats: Dict[str, Any] = PrivateAttr(default_factory=dict)
+
+    def model_post_init(self, __context):
+        if not isinstance(self.session, MutableMapping):
+            super().__setattr__("session", {})
+        self._dirty = set(self.fields())
+        self._reset_stats()
+
+    @classmethod
+    def fields(cls):
+        return [key for key in cls.model_fields if key != "session"]
+
     def reset(self):
         self.file_uploaded = False
         self.theme = "light"
@@ -24,42 +49,58 @@ class SessionState(GenericModel):
         self.sync_to_session()
 
     def to_dict(self):
-        return self.model_dump()
+        return {key: getattr(self, key) for key in self.fields()}
+
+    def mark_dirty(self, *names: str):
+        self._dirty.update(names)
+
+    def _reset_stats(self):
+        self._sync_stats = {"pulled": 0, "pushed": 0, "ms": 0.0}
 
     def sync_to_session(self):
-        """Sync the values from the SessionState model to st.session_state."""
-        for key, value in self.to_dict().items():
-            if key == "session":
-                continue
-            self.session[key] = value
+        """Write the fields changed since the last sync to st.session_state."""
+        start = time.perf_counter()
+        dirty, self._dirty = self._dirty, set()
+        for key in dirty:
+            self.session[key] = getattr(self, key)
+        self._sync_stats["pushed"] += len(dirty)
+        self._sync_stats["ms"] += (time.perf_counter() - start) * 1000
 
     def sync_from_session(self):
-        """Sync the values from st.session_state to the SessionState model."""
-        for key in self.__fields__:
-            if key == "session":
+        """Pick up fields that were replaced in st.session_state directly, e.g. by keyed widgets."""
+        self._reset_stats()
+        start = time.perf_counter()
+        for key in self.fields():
+            if key in self._dirty or key not in self.session:
                 continue
-            if key in self.session:
+            if self.session[key] is not getattr(self, key):
                 super().__setattr__(key, self.session[key])
+                self._sync_stats["pulled"] += 1
+        self._sync_stats["ms"] += (time.perf_counter() - start) * 1000
+
+    @property
+    def sync_stats(self) -> Dict[str, Any]:
+        return dict(self._sync_stats)
+
+    def log_sync_stats(self):
+        stats = self._sync_stats
+        logger.debug(f"Session sync: pulled {stats['pulled']}, pushed {stats['pushed']} fields in {stats['ms']:.3f} ms")
 
     def log_session(self):
-        logger.debug(f"Session: {self.session}")
-
-    @model_validator(mode="after")
-    def set_session_value(cls, values):
-        if not isinstance(values.session, dict):
-            values.session = {}
-        for value in values:
-            if value[0] == "session":
-                continue
-            values.session[value[0]] = value[1]
-        return values
+        logger.debug(f"Session: {self}")
 
     def __setattr__(self, name, value):
         if name == "session" and self.session is not None:
             raise AttributeError("Session cannot be set directly")
         super().__setattr__(name, value)
-        if name != "session" and self.session is not None:
-            self.session[name] = value
+        if name in type(self).model_fields and name != "session":
+            self._dirty.add(name)
+
+    def __repr__(self):
+        return f"SessionState(user={self.user!r}, theme={self.theme!r}, dirty={sorted(self._dirty)})"
+
+    def __str__(self):
+        return self.__repr__()
 
     class Config:
         arbitrary_types_allowed = True
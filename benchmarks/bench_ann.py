@@ -0,0 +1,60 @@
+"""
+Recall and latency of each ANN index mode against the exact flat baseline, on clustered synthetic vectors.
+
+    python -m benchmarks.bench_ann --vectors 100000 --dim 1536 --queries 200 --k 10
+"""
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from app.services.retrievers.ann import ANNIndexFactory
+
+
+def make_vectors(n_vectors: int, dim: int, n_queries: int, n_clusters: int = 100):
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, n_vectors + n_queries)
+    vectors = centers[labels] + 0.5 * rng.standard_normal((n_vectors + n_queries, dim)).astype(np.float32)
+    return vectors[:n_vectors], vectors[n_vectors:]
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(row) & set(expected)) for row, expected in zip(found, truth))
+    return hits / truth.size
+
+
+def run(n_vectors: int, dim: int, n_queries: int, k: int, index_types):
+    vectors, queries = make_vectors(n_vectors, dim, n_queries)
+    truth = None
+    for index_type in index_types:
+        start = time.perf_counter()
+        index = ANNIndexFactory.build(vectors, index_type)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        for query in queries:
+            _, found = index.search(query[None, :], k)
+        latency = (time.perf_counter() - start) / n_queries
+        _, found = index.search(queries, k)
+        if truth is None:
+            truth = found
+        size_mb = faiss.serialize_index(index).nbytes / 2**20
+        print(
+            f"{index_type:>10} | build: {build:7.2f} s | latency: {latency * 1000:7.3f} ms/query"
+            f" | recall@{k}: {recall_at_k(found, truth):.3f} | size: {size_mb:8.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", default=list(ANNIndexFactory.INDEX_TYPES))
+    args = parser.parse_args()
+    # The flat index is the exact baseline every other mode is measured against.
+    types = ["flat"] + [index_type for index_type in args.types if index_type != "flat"]
+    run(args.vectors, args.dim, args.queries, args.k, types)
@@ -0,0 +1,90 @@
+"""
+Throughput of the layout-aware splitter against RecursiveCharacterTextSplitter on synthetic OCR pages.
+
+    python -m benchmarks.bench_splitter --pages 50 --repeat 3
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from langchain.schema import Document as LangchainDocument
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from app.services.ingress.channel import OCRDocument
+from app.services.preprocess.document_splitter import CHUNK_OVERLAP_TOKENS, CHUNK_TOKENS, LayoutSplitter
+from app.services.structures.ocr import DocOCR
+from app.services.utils.utils import count_tokens
+
+
+def make_page(pageno: int, n_paragraphs: int = 12, lines_per_paragraph: int = 6, words_per_line: int = 9):
+    """
+    A two-column page: every paragraph is an OCR block of full lines of varying count, followed by a blank line.
+    """
+    rng = np.random.default_rng(pageno)
+    rows = []
+    next_y = [100, 100]
+    for paragraph in range(n_paragraphs):
+        column = paragraph * 2 // n_paragraphs
+        for line in range(rng.integers(1, 2 * lines_per_paragraph)):
+            y0 = next_y[column]
+            next_y[column] += 40
+            x = 100 + column * 1200
+            for word in range(words_per_line):
+                width = rng.integers(40, 110)
+                rows.append(
+                    (x, y0, x + width, y0 + 30, f"w{rng.integers(0, 5000)}", paragraph, pageno, len(rows), line, 0.9)
+                )
+                x += width + 15
+        next_y[column] += 40
+    columns = ["x0", "y0", "x2", "y2", "Text", "block", "page", "index_sort", "line", "confidence"]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def make_document(dfs) -> OCRDocument:
+    document = OCRDocument.__new__(OCRDocument)
+    document.path = "synthetic.pdf"
+    document.doc_ocr = DocOCR.from_df(dfs)
+    return document
+
+
+def summarize(name: str, seconds: float, chunks, n_pages: int):
+    tokens = [count_tokens(chunk.page_content) for chunk in chunks]
+    print(
+        f"{name:>18} | {n_pages / seconds:8.1f} pages/s | {len(chunks):6d} chunks"
+        f" | tokens/chunk: mean {np.mean(tokens):6.1f} max {max(tokens):4d}"
+    )
+
+
+def run(n_pages: int, repeat: int):
+    dfs = [make_page(pageno) for pageno in range(n_pages)]
+
+    # Both sides start from raw OCR words, so line and paragraph reconstruction is included.
+    start = time.perf_counter()
+    for _ in range(repeat):
+        chunks = list(LayoutSplitter().split(make_document(dfs)))
+    summarize("layout", (time.perf_counter() - start) / repeat, chunks, n_pages)
+
+    for name, splitter in (
+        ("recursive (chars)", RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, length_function=len)),
+        (
+            "recursive (tokens)",
+            RecursiveCharacterTextSplitter(
+                chunk_size=CHUNK_TOKENS, chunk_overlap=CHUNK_OVERLAP_TOKENS, length_function=count_tokens
+            ),
+        ),
+    ):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            pages = [LangchainDocument(page_content=page.text) for page in make_document(dfs).doc_ocr]
+            chunks = splitter.split_documents(pages)
+        summarize(name, (time.perf_counter() - start) / repeat, chunks, n_pages)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.pages, args.repeat)
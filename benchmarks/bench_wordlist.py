@@ -0,0 +1,91 @@
+"""
+Compare the array-backed WordList against a per-object word list built with df.iterrows().
+
+    python -m benchmarks.bench_wordlist --words 5000 --repeat 20
+"""
+
+import argparse
+import timeit
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from app.services.structures.ocr import WordList
+from app.services.utils.ocr_utils import BBoxMixins
+
+
+@dataclass
+class ObjectWord:
+    x0: float
+    y0: float
+    x2: float
+    y2: float
+    Text: str
+    block: int
+    page: int
+    index_sort: int
+    line: int
+    confidence: float
+
+
+class ObjectWordList:
+    def __init__(self, word_list):
+        self.word_list = word_list
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame):
+        return cls([ObjectWord(**row) for _, row in df.iterrows()])
+
+    def to_df(self):
+        return pd.DataFrame([word.__dict__ for word in self.word_list])
+
+    @property
+    def bbox(self):
+        return BBoxMixins.combine([(w.x0, w.y0, w.x2, w.y2) for w in self.word_list])
+
+    @property
+    def text(self):
+        return " ".join(word.Text for word in self.word_list)
+
+
+def make_page(n_words: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    x0 = rng.uniform(0, 2400, n_words)
+    y0 = rng.uniform(0, 3300, n_words)
+    return pd.DataFrame(
+        {
+            "x0": x0,
+            "y0": y0,
+            "x2": x0 + rng.uniform(10, 200, n_words),
+            "y2": y0 + rng.uniform(10, 40, n_words),
+            "Text": [f"word{i}" for i in range(n_words)],
+            "block": rng.integers(0, 20, n_words),
+            "page": 0,
+            "index_sort": np.arange(n_words),
+            "line": rng.integers(0, 80, n_words),
+            "confidence": rng.uniform(0, 1, n_words),
+        }
+    )
+
+
+def run(n_words: int, repeat: int):
+    df = make_page(n_words)
+    for name, cls in (("object", ObjectWordList), ("array", WordList)):
+        word_list = cls.from_df(df)
+        timings = {
+            "from_df": timeit.timeit(lambda: cls.from_df(df), number=repeat) / repeat,
+            "bbox": timeit.timeit(lambda: word_list.bbox, number=repeat) / repeat,
+            "text": timeit.timeit(lambda: word_list.text, number=repeat) / repeat,
+            "to_df": timeit.timeit(lambda: word_list.to_df(), number=repeat) / repeat,
+        }
+        report = " | ".join(f"{op}: {seconds * 1000:8.3f} ms" for op, seconds in timings.items())
+        print(f"{name:>6} ({n_words} words) | {report}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    run(args.words, args.repeat)
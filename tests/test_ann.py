@@ -0,0 +1,101 @@
+import faiss
+import numpy as np
+import pytest
+from langchain.schema import Document as LangchainDocument
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from app.services.retrievers import ann
+from app.services.retrievers.ann import ANNIndexFactory
+from app.services.retrievers.retriever import Retriever
+
+DIM = 8
+
+
+class NoEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        raise AssertionError("the test only adds precomputed vectors")
+
+    def embed_query(self, text):
+        raise AssertionError("the test only searches by vector")
+
+
+def make_vectors(n: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+def make_store(vectors: np.ndarray, prefix: str = "doc") -> FAISS:
+    ids = [f"{prefix}{i}" for i in range(len(vectors))]
+    return FAISS.from_embeddings(list(zip(ids, vectors.tolist())), NoEmbeddings(), ids=ids)
+
+
+@pytest.fixture(autouse=True)
+def small_threshold(monkeypatch):
+    monkeypatch.setattr(ann, "ANN_PROMOTION_THRESHOLD", 50)
+    monkeypatch.setattr(ann, "ANN_PROMOTE_TO", "hnsw")
+
+
+def test_target_type():
+    small, large = make_store(make_vectors(50)), make_store(make_vectors(51))
+    assert ANNIndexFactory.target_type(small, "auto") is None
+    assert ANNIndexFactory.target_type(large, "auto") == "hnsw"
+    assert ANNIndexFactory.target_type(small, "ivf") is None
+    assert ANNIndexFactory.target_type(large, "ivf") == "ivf"
+    assert ANNIndexFactory.target_type(large, "flat") is None
+
+    large.index = ANNIndexFactory.build(make_vectors(51), "sq16")
+    assert ANNIndexFactory.target_type(large, "auto") is None
+
+
+@pytest.mark.parametrize("index_type", ["hnsw", "ivf"])
+def test_promotion_keeps_positions_and_documents(index_type):
+    vectors = make_vectors(200)
+    store = make_store(vectors)
+    assert ANNIndexFactory.promote(store, index_type)
+    assert not ANNIndexFactory.is_flat(store.index)
+    assert store.index.ntotal == 200
+    assert not ANNIndexFactory.promote(store, index_type)
+
+    for i in (0, 99, 199):
+        (document,) = store.similarity_search_by_vector(vectors[i].tolist(), k=1)
+        assert document.page_content == f"doc{i}"
+
+
+def test_vectors_added_during_the_build_are_carried_over(monkeypatch):
+    store = make_store(make_vectors(100))
+    extra = make_vectors(5, seed=1)
+    build = ANNIndexFactory.build.__func__
+
+    def build_while_adding(cls, vectors, index_type):
+        store.add_embeddings(
+            list(zip([f"extra{i}" for i in range(5)], extra.tolist())), ids=[f"extra{i}" for i in range(5)]
+        )
+        return build(cls, vectors, index_type)
+
+    monkeypatch.setattr(ANNIndexFactory, "build", classmethod(build_while_adding))
+    assert ANNIndexFactory.promote(store, "hnsw")
+    assert store.index.ntotal == 105
+    (document,) = store.similarity_search_by_vector(extra[3].tolist(), k=1)
+    assert document.page_content == "extra3"
+
+
+def test_retriever_lock_is_free_while_the_index_is_built(monkeypatch):
+    retriever = Retriever(make_store(make_vectors(40)))
+    staged = make_store(make_vectors(20, seed=2), prefix="new")
+    documents = [staged.docstore.search(f"new{i}") for i in range(20)]
+    build = ANNIndexFactory.build.__func__
+    lock_was_free = []
+
+    def build_checking_lock(cls, vectors, index_type):
+        acquired = retriever._lock.acquire(timeout=1)
+        lock_was_free.append(acquired)
+        if acquired:
+            retriever._lock.release()
+        return build(cls, vectors, index_type)
+
+    monkeypatch.setattr(ANNIndexFactory, "build", classmethod(build_checking_lock))
+    retriever.merge(staged, documents)
+    assert lock_was_free == [True]
+    assert isinstance(faiss.downcast_index(retriever.vector_store.index), faiss.IndexHNSWFlat)
+    assert retriever.vector_store.index.ntotal == 60
+    assert isinstance(retriever.vector_store.docstore.search("new5"), LangchainDocument)
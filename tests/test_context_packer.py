@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+import pandas as pd
+from langchain.schema import Document as LangchainDocument
+
+from app.services.preprocess.document_splitter import LayoutSplitter
+from app.services.retrievers.context_packer import ContextPacker
+
+
+def make_page(n_lines: int = 40) -> SimpleNamespace:
+    """
+    One OCR page holding a single paragraph too long for one chunk, so that the splitter cuts it with overlap.
+    """
+    lines = pd.DataFrame(
+        {
+            "Text": [f"line{i} alpha{i} beta{i} gamma{i} delta{i}" for i in range(n_lines)],
+            "paragraph": 0,
+            "x0": 0.0,
+            "y0": [float(i) for i in range(n_lines)],
+            "x2": 100.0,
+            "y2": [float(i + 1) for i in range(n_lines)],
+        }
+    )
+    return SimpleNamespace(lines=lines)
+
+
+def layout_chunks(page: SimpleNamespace):
+    splitter = LayoutSplitter(chunk_tokens=60, chunk_overlap_tokens=15)
+    return [
+        LangchainDocument(
+            id=f"chunk-{i}", page_content=text, metadata={"source": "a.pdf", "page_no": 1, "chunk": i, "bbox": bbox}
+        )
+        for i, (text, bbox) in enumerate(splitter.split_page(page))
+    ]
+
+
+def test_overlap_counts_words():
+    assert ContextPacker._overlap("alpha beta gamma delta", "gamma delta epsilon zeta") == 2
+    assert ContextPacker._overlap("alpha beta", "alpha beta") == 2
+    assert ContextPacker._overlap("alpha beta the", "the end") == 0
+
+
+def test_layout_chunks_overlap():
+    chunks = layout_chunks(make_page())
+    assert len(chunks) > 2
+    for first, second in zip(chunks, chunks[1:]):
+        assert ContextPacker._overlap(first.page_content, second.page_content) > 0
+
+
+def test_pack_merges_adjacent_chunks_without_repeating_overlap():
+    page = make_page()
+    chunks = layout_chunks(page)
+    packed, stats = ContextPacker(token_budget=10_000).pack(chunks)
+
+    assert len(packed) == 1
+    assert packed[0].page_content.split() == " ".join(page.lines["Text"]).split()
+    assert packed[0].metadata["chunks"] == list(range(len(chunks)))
+    assert packed[0].metadata["bbox"] == [0.0, 0.0, 100.0, float(len(page.lines))]
+    assert stats["merged"] == len(chunks) - 1
+    assert stats["overlap_tokens_saved"] > 0
+    assert stats["packed_tokens"] == stats["candidate_tokens"] - stats["overlap_tokens_saved"]
+
+
+def test_pack_keeps_other_pages_apart_and_respects_budget():
+    chunks = layout_chunks(make_page())
+    other = LangchainDocument(id="other", page_content="unrelated text", metadata={"source": "b.pdf", "page_no": 3})
+    packed, stats = ContextPacker(token_budget=10_000).pack([other, chunks[0], chunks[2]])
+    assert [document.id for document in packed] == ["other", "chunk-0", "chunk-2"]
+    assert stats["merged"] == 0
+
+    packed, stats = ContextPacker(token_budget=1).pack(chunks)
+    assert packed == [] and stats["packed_tokens"] == 0
+
+
+def test_mmr_demotes_near_duplicates():
+    query = [1.0, 0.0, 0.0]
+    vectors = [[1.0, 0.1, 0.0], [1.0, 0.11, 0.0], [0.7, 0.0, 0.7]]
+    assert ContextPacker(mmr_lambda=0.5).mmr(query, vectors) == [0, 2, 1]
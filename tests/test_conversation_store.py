@@ -0,0 +1,160 @@
+import sqlite3
+import time
+
+from langchain.schema import Document as LangchainDocument
+
+from app.services.structures.conversation import Conversation, ConversationList, Message
+from app.services.structures.conversation_store import ConversationStore
+
+
+def make_turn(i: int) -> Conversation:
+    return Conversation(
+        query=Message(sender="user", message=f"question {i}"),
+        response=Message(sender="assistant", message=f"answer {i}"),
+    )
+
+
+def make_conversation(store: ConversationStore, title: str, n_turns: int = 0) -> str:
+    conversation = ConversationList(title=title)
+    store.create_conversation(conversation)
+    for i in range(n_turns):
+        store.append_turn(conversation.id, make_turn(i))
+    return conversation.id
+
+
+def test_schema_is_created_and_reopened(tmp_path):
+    path = str(tmp_path / "db" / "conversations.sqlite")
+    store = ConversationStore(path)
+    conversation_id = make_conversation(store, "First", n_turns=3)
+    store.add_context_file(conversation_id, "a.pdf")
+    store.set_summary(conversation_id, "summary", 0)
+
+    reopened = ConversationStore(path)
+    tables = {name for (name,) in sqlite3.connect(path).execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    assert {"conversations", "turns", "chunks", "turn_context", "summaries", "context_files"} <= tables
+    conversation = reopened.get_conversation(conversation_id)
+    assert conversation.title == "First"
+    assert conversation.context_files == ["a.pdf"]
+    assert [turn.query.message for turn in conversation.conversations] == ["question 0", "question 1", "question 2"]
+    assert reopened.get_summary(conversation_id) == ("summary", 0)
+
+    reopened.append_turn(conversation_id, make_turn(3))
+    assert reopened.count_turns(conversation_id) == 4
+    assert reopened.load_turns(conversation_id, limit=1)[0].seq == 3
+
+
+def test_append_turn_numbers_turns_and_shares_chunks(tmp_path):
+    store = ConversationStore(str(tmp_path / "conversations.sqlite"))
+    conversation_id = make_conversation(store, "Chunks")
+    shared = LangchainDocument(id="shared", page_content="shared chunk", metadata={"page_no": 1})
+    first = store.append_turn(conversation_id, make_turn(0), [shared])
+    second = store.append_turn(conversation_id, make_turn(1), [LangchainDocument(page_content="new chunk"), shared])
+
+    assert (first.seq, second.seq) == (0, 1)
+    assert second.context_ids[1] == "shared"
+    assert store._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0] == 2
+    assert [turn.context_ids for turn in store.load_turns(conversation_id)] == [["shared"], second.context_ids]
+    chunks = store.get_chunks(second.context_ids)
+    assert [chunk.page_content for chunk in chunks] == ["new chunk", "shared chunk"]
+    assert chunks[1].metadata == {"page_no": 1}
+
+
+def test_load_turns_pages_backwards(tmp_path):
+    store = ConversationStore(str(tmp_path / "conversations.sqlite"))
+    conversation_id = make_conversation(store, "Paging", n_turns=7)
+
+    latest = store.load_turns(conversation_id, limit=3)
+    assert [turn.seq for turn in latest] == [4, 5, 6]
+    earlier = store.load_turns(conversation_id, before_seq=latest[0].seq, limit=3)
+    assert [turn.seq for turn in earlier] == [1, 2, 3]
+    assert [turn.seq for turn in store.load_turns(conversation_id, before_seq=1, limit=3)] == [0]
+    assert store.load_turns(conversation_id, before_seq=0) == []
+    assert store.load_turns("missing") == []
+    assert [turn.seq for turn in store.get_conversation(conversation_id, last_n=2).conversations] == [5, 6]
+
+
+def test_list_and_count_conversations(tmp_path):
+    store = ConversationStore(str(tmp_path / "conversations.sqlite"))
+    ids = []
+    for i in range(5):
+        ids.append(make_conversation(store, f"Invoices {i}" if i % 2 else f"Contracts {i}"))
+        time.sleep(0.002)
+    time.sleep(0.002)
+    store.append_turn(ids[0], make_turn(0))
+
+    headers = store.list_conversations(limit=2)
+    assert [header["id"] for header in headers] == [ids[0], ids[4]]
+    assert headers[0]["n_turns"] == 1
+    assert [header["id"] for header in store.list_conversations(limit=2, offset=2)] == [ids[3], ids[2]]
+    assert [header["id"] for header in store.list_conversations(limit=2, offset=4)] == [ids[1]]
+    assert store.count_conversations() == 5
+
+    assert [header["title"] for header in store.list_conversations(search="Invoices")] == ["Invoices 3", "Invoices 1"]
+    assert store.count_conversations(search="Invoices") == 2
+    assert store.count_conversations(search="Receipts") == 0
+
+
+def test_summary_never_goes_backwards(tmp_path):
+    path = str(tmp_path / "conversations.sqlite")
+    store = ConversationStore(path)
+    conversation_id = make_conversation(store, "Summary", n_turns=10)
+    assert store.get_summary(conversation_id) == ("", -1)
+
+    store.set_summary(conversation_id, "through 5", 5)
+    store.set_summary(conversation_id, "through 3", 3)
+    store.set_summary(conversation_id, "again 5", 5)
+    assert store.get_summary(conversation_id) == ("through 5", 5)
+
+    store.set_summary(conversation_id, "through 8", 8)
+    ConversationStore(path).set_summary(conversation_id, "stale", 6)
+    assert ConversationStore(path).get_summary(conversation_id) == ("through 8", 8)
+
+
+def test_delete_conversation(tmp_path):
+    store = ConversationStore(str(tmp_path / "conversations.sqlite"))
+    conversation_id = make_conversation(store, "Deleted", n_turns=2)
+    store.set_summary(conversation_id, "summary", 0)
+    store.delete_conversation(conversation_id)
+    assert store.get_conversation(conversation_id) is None
+    assert store.load_turns(conversation_id) == []
+    assert store.get_summary(conversation_id) == ("", -1)
+    assert store.count_conversations() == 0
+
+
+def test_history_window_pages_back_through_the_store(monkeypatch):
+    store = ConversationStore(":memory:")
+    conversation_id = make_conversation(store, "Long", n_turns=50)
+    conversation = store.get_conversation(conversation_id, last_n=20)
+    queries = []
+    load_turns = store.load_turns
+    monkeypatch.setattr(
+        store, "load_turns", lambda *args, **kwargs: queries.append(kwargs) or load_turns(*args, **kwargs)
+    )
+
+    visible, hidden = store.load_window(conversation, 10)
+    assert [turn.seq for turn in visible] == list(range(40, 50)) and hidden == 40
+    visible, hidden = store.load_window(conversation, 20)
+    assert [turn.seq for turn in visible] == list(range(30, 50)) and hidden == 30
+    assert queries == []
+
+    visible, hidden = store.load_window(conversation, 40)
+    assert [turn.seq for turn in visible] == list(range(10, 50)) and hidden == 10
+    assert queries == [{"before_seq": 30, "limit": 20}]
+    assert len(conversation) == 40
+
+    visible, hidden = store.load_window(conversation, 60)
+    assert [turn.seq for turn in visible] == list(range(50)) and hidden == 0
+    assert queries[-1] == {"before_seq": 10, "limit": 20}
+    store.load_window(conversation, 80)
+    assert len(queries) == 2
+
+
+def test_history_window_of_unsaved_turns():
+    store = ConversationStore(":memory:")
+    conversation = ConversationList()
+    visible, hidden = store.load_window(conversation, 2)
+    assert visible == conversation.conversations and hidden == 0
+
+    conversation.conversations += [make_turn(i) for i in range(3)]
+    visible, hidden = store.load_window(conversation, 2)
+    assert [turn.query.message for turn in visible] == ["question 1", "question 2"] and hidden == 2
@@ -0,0 +1,71 @@
+import csv
+
+import pytest
+
+from app.services.ingress import channel
+from app.services.ingress.channel import CSVDocument
+from app.services.utils.utils import count_tokens
+
+
+def make_csv(path: str, n_rows: int, width: int = 1) -> str:
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "note"])
+        for i in range(n_rows):
+            writer.writerow([i, f"item {i}", " ".join(["word"] * width) if i % 7 else f"quoted, {i}"])
+    return path
+
+
+@pytest.fixture(params=["arrow", "pandas"])
+def read_kwargs(request, monkeypatch):
+    # Small reads, so that row groups straddle the reader's batches.
+    monkeypatch.setattr(channel, "CSV_READ_BLOCK_BYTES", 256)
+    monkeypatch.setattr(channel, "CSV_READ_CHUNK_ROWS", 7)
+    return {} if request.param == "arrow" else {"sep": ","}
+
+
+def test_row_ranges_cover_every_row_once(tmp_path, read_kwargs):
+    path = make_csv(str(tmp_path / "rows.csv"), 103)
+    document = CSVDocument(path, rows_per_document=10, **read_kwargs)
+    documents = list(document.generate_document())
+
+    assert [d.metadata["row_start"] for d in documents] == list(range(0, 103, 10))
+    assert [d.metadata["row_end"] for d in documents] == [*range(10, 103, 10), 103]
+    assert [d.metadata["chunk"] for d in documents] == list(range(len(documents)))
+    for d in documents:
+        rows = list(csv.reader(d.page_content.splitlines()))
+        assert rows[0] == ["id", "name", "note"]
+        assert [int(row[0]) for row in rows[1:]] == list(range(d.metadata["row_start"], d.metadata["row_end"]))
+    assert len(document) == 103
+
+
+def test_row_groups_are_capped_by_tokens(tmp_path, read_kwargs):
+    path = make_csv(str(tmp_path / "wide.csv"), 40, width=30)
+    cap = 120
+    documents = list(
+        CSVDocument(path, rows_per_document=50, tokens_per_document=cap, **read_kwargs).generate_document()
+    )
+
+    assert len(documents) > 1
+    # Rows are counted one by one, which can differ from counting the whole text by a token per row.
+    assert all(count_tokens(d.page_content) <= cap * 1.05 for d in documents)
+    assert documents[-1].metadata["row_end"] == 40
+    for first, second in zip(documents, documents[1:]):
+        assert first.metadata["row_end"] == second.metadata["row_start"]
+
+
+def test_a_row_over_the_cap_is_kept_alone(tmp_path):
+    path = make_csv(str(tmp_path / "wide.csv"), 3, width=200)
+    documents = list(CSVDocument(path, tokens_per_document=10).generate_document())
+    assert [(d.metadata["row_start"], d.metadata["row_end"]) for d in documents] == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_length_and_contents_never_load_the_frame(tmp_path, read_kwargs):
+    path = make_csv(str(tmp_path / "rows.csv"), 25)
+    document = CSVDocument(path, **read_kwargs)
+    assert len(document) == 25
+    contents = document.get_contents()
+    assert document._data is None
+
+    with open(path, newline="") as f:
+        assert list(csv.reader(contents.splitlines())) == list(csv.reader(f))
@@ -0,0 +1,24 @@
+from langchain.schema import Document as LangchainDocument
+
+from app.services.preprocess.deduplicator import ChunkDeduplicator
+
+TEXT = "the quick brown fox jumps over the lazy dog near the river bank on a sunny afternoon in june"
+
+
+def documents(prefix: str, n: int):
+    return [LangchainDocument(id=f"{prefix}-{i}", page_content=TEXT) for i in range(n)]
+
+
+def test_counts_are_per_call_and_totals_per_lifetime():
+    deduplicator = ChunkDeduplicator()
+    first = deduplicator.new_counts()
+    kept = list(deduplicator.filter(documents("a", 3), first))
+    assert [document.id for document in kept] == ["a-0"]
+    assert first["seen"] == 3 and first["dropped"] == 2
+
+    second = deduplicator.new_counts()
+    assert list(deduplicator.filter(documents("b", 2), second)) == []
+    assert second["seen"] == 2 and second["dropped"] == 2
+    assert "Dropped 2 of 2 chunks" in deduplicator.report(second)
+    assert deduplicator.stats["seen"] == 5 and deduplicator.stats["dropped"] == 4
+    assert "Dropped 4 of 5 chunks" in deduplicator.report()
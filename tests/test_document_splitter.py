@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import pandas as pd
+
+from app.services.preprocess.document_splitter import LayoutSplitter
+from app.services.utils.utils import count_tokens
+
+CHUNK_TOKENS = 60
+OVERLAP_TOKENS = 15
+
+
+def make_page(paragraph_sizes) -> SimpleNamespace:
+    """
+    One OCR page with a paragraph of `size` lines per entry, lines 10 points apart and 20 points wide.
+    """
+    texts, paragraphs = [], []
+    for paragraph, size in enumerate(paragraph_sizes):
+        texts += [f"p{paragraph}l{i} alpha beta gamma" for i in range(size)]
+        paragraphs += [paragraph] * size
+    n_lines = len(texts)
+    lines = pd.DataFrame(
+        {
+            "Text": texts,
+            "paragraph": paragraphs,
+            "x0": [float(i % 3) for i in range(n_lines)],
+            "y0": [10.0 * i for i in range(n_lines)],
+            "x2": [20.0 + i % 5 for i in range(n_lines)],
+            "y2": [10.0 * i + 8 for i in range(n_lines)],
+        }
+    )
+    return SimpleNamespace(lines=lines)
+
+
+def split(pages):
+    document = SimpleNamespace(doc_ocr=pages, path="report.pdf")
+    return list(LayoutSplitter(chunk_tokens=CHUNK_TOKENS, chunk_overlap_tokens=OVERLAP_TOKENS).split(document))
+
+
+def chunk_lines(chunk):
+    return [line for paragraph in chunk.page_content.split("\n\n") for line in paragraph.split(" p")]
+
+
+def test_chunks_respect_the_token_budget_and_keep_small_paragraphs_whole():
+    page = make_page([2, 3, 40, 1, 2])
+    chunks = split([page])
+    assert len(chunks) > 3
+    for chunk in chunks:
+        assert count_tokens(chunk.page_content) <= CHUNK_TOKENS
+
+    # Paragraphs that fit the budget are never cut, and chunks follow the lines in order.
+    lines = page.lines
+    contents = [chunk.page_content for chunk in chunks]
+    for paragraph in (0, 1, 3, 4):
+        text = " ".join(lines.loc[lines["paragraph"] == paragraph, "Text"])
+        assert sum(text in content for content in contents) == 1
+    assert contents[0] == "\n\n".join([" ".join(lines["Text"][:2]), " ".join(lines["Text"][2:5])])
+    assert contents[-1].endswith(" ".join(lines["Text"][-2:]))
+
+
+def test_long_paragraphs_are_cut_at_lines_with_overlap():
+    page = make_page([40])
+    texts = page.lines["Text"].tolist()
+    chunks = split([page])
+    assert len(chunks) > 1
+
+    covered = []
+    for previous, chunk in zip([None] + chunks[:-1], chunks):
+        rows = [texts.index(line if line.startswith("p") else "p" + line) for line in chunk_lines(chunk)]
+        assert rows == list(range(rows[0], rows[-1] + 1))
+        if previous is not None:
+            overlap = covered[-1] - rows[0] + 1
+            assert overlap >= 1
+            assert count_tokens(" ".join(texts[rows[0] : covered[-1] + 1])) <= OVERLAP_TOKENS
+        covered.append(rows[-1])
+    assert covered[-1] == len(texts) - 1
+
+
+def test_chunk_metadata():
+    pages = [make_page([3, 40]), SimpleNamespace(lines=pd.DataFrame()), make_page([2])]
+    chunks = split(pages)
+
+    assert [chunk.metadata["chunk"] for chunk in chunks] == list(range(len(chunks)))
+    assert {chunk.metadata["source"] for chunk in chunks} == {"report.pdf"}
+    page_nos = [chunk.metadata["page_no"] for chunk in chunks]
+    assert page_nos == sorted(page_nos) and set(page_nos) == {1, 3}
+
+    for chunk in chunks:
+        page = pages[chunk.metadata["page_no"] - 1]
+        lines = page.lines[page.lines["Text"].map(lambda text: text in chunk.page_content)]
+        expected = [lines["x0"].min(), lines["y0"].min(), lines["x2"].max(), lines["y2"].max()]
+        assert chunk.metadata["bbox"] == expected
+
+    assert chunks[-1].page_content == "p0l0 alpha beta gamma p0l1 alpha beta gamma"
+    assert chunks[-1].metadata["bbox"] == [0.0, 0.0, 21.0, 18.0]
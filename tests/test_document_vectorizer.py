@@ -0,0 +1,102 @@
+import asyncio
+import time
+from typing import List
+
+import httpx
+import openai
+import pytest
+from langchain.schema import Document as LangchainDocument
+from langchain_core.embeddings import Embeddings
+
+from app.services.preprocess.document_vectorizer import EmbeddingPipeline
+
+
+class StubEmbeddings(Embeddings):
+    """
+    Deterministic 4-d vectors; `delay` seconds per async call, `errors` raised by the first calls.
+    """
+
+    def __init__(self, delay: float = 0.0, errors: List[Exception] = ()):
+        self.delay = delay
+        self.errors = list(errors)
+        self.calls: List[float] = []
+
+    def embed_documents(self, texts):
+        return [[float(len(text)), 1.0, 0.0, 0.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        self.calls.append(time.perf_counter())
+        await asyncio.sleep(self.delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.embed_documents(texts)
+
+
+def make_documents(n: int) -> List[LangchainDocument]:
+    return [LangchainDocument(page_content=f"document number {i}") for i in range(n)]
+
+
+def test_embedding_overlaps_with_production():
+    produced: List[float] = []
+
+    def slow_documents():
+        for document in make_documents(8):
+            time.sleep(0.02)
+            produced.append(time.perf_counter())
+            yield document
+
+    embeddings = StubEmbeddings(delay=0.05)
+    pipeline = EmbeddingPipeline(embeddings, batch_tokens=1, concurrency=16)
+    vector_store = pipeline.embed_into(slow_documents())
+
+    assert vector_store.index.ntotal == 8
+    assert embeddings.calls[0] < produced[-1]
+
+
+def api_error(error_class, status: int):
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    return error_class("error", response=httpx.Response(status, request=request), body=None)
+
+
+@pytest.mark.parametrize(
+    "error, retryable",
+    [
+        (api_error(openai.RateLimitError, 429), True),
+        (api_error(openai.InternalServerError, 503), True),
+        (openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com")), True),
+        (ConnectionResetError(), True),
+        (api_error(openai.AuthenticationError, 401), False),
+        (api_error(openai.BadRequestError, 400), False),
+        (TypeError("bug"), False),
+    ],
+)
+def test_retry_classification(error, retryable):
+    assert EmbeddingPipeline._is_retryable(error) is retryable
+
+
+def test_transient_errors_are_retried():
+    embeddings = StubEmbeddings(errors=[api_error(openai.RateLimitError, 429), TimeoutError()])
+    pipeline = EmbeddingPipeline(embeddings, backoff=0.0)
+    vector_store = pipeline.embed_into(make_documents(3))
+    assert vector_store.index.ntotal == 3
+    assert len(embeddings.calls) == 3
+    assert pipeline.failed == []
+
+
+def test_permanent_errors_are_raised_without_retrying():
+    embeddings = StubEmbeddings(errors=[api_error(openai.AuthenticationError, 401)])
+    pipeline = EmbeddingPipeline(embeddings, backoff=10.0)
+    with pytest.raises(openai.AuthenticationError):
+        pipeline.embed_into(make_documents(3))
+    assert len(embeddings.calls) == 1
+
+
+def test_permanent_error_stops_a_long_producer():
+    embeddings = StubEmbeddings(errors=[api_error(openai.AuthenticationError, 401)])
+    pipeline = EmbeddingPipeline(embeddings, batch_tokens=1, concurrency=2)
+    with pytest.raises(openai.AuthenticationError):
+        pipeline.embed_into(make_documents(200))
+    assert len(embeddings.calls) < 200
@@ -0,0 +1,57 @@
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.services.preprocess.document_vectorizer import CachedEmbeddings, EmbeddingStore
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(text)), 0.5, -0.25] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_vectors_round_trip_through_a_file(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    key = EmbeddingStore.make_key("model", "text")
+    vector = [0.1, -2.5, 3.14159, 1e-3]
+    EmbeddingStore(path).put_many({key: vector})
+
+    found = EmbeddingStore(path).get_many([key, EmbeddingStore.make_key("model", "other")])
+    assert list(found) == [key]
+    assert found[key].dtype == np.float32
+    np.testing.assert_allclose(found[key], vector, rtol=1e-3)
+
+    store = EmbeddingStore(str(tmp_path / "full.sqlite"), dtype="float32")
+    store.put_many({key: vector})
+    np.testing.assert_array_equal(store.get_many([key])[key], np.asarray(vector, dtype=np.float32))
+
+
+def test_least_recently_used_vectors_are_evicted():
+    store = EmbeddingStore(":memory:", max_entries=2)
+    store.put_many({"a": [1.0], "b": [2.0]})
+    time.sleep(0.01)
+    store.get_many(["a"])
+    time.sleep(0.01)
+    store.put_many({"c": [3.0]})
+
+    assert len(store) == 2
+    assert set(store.get_many(["a", "b", "c"])) == {"a", "c"}
+
+
+def test_cached_embeddings_only_embed_new_texts():
+    backend = CountingEmbeddings()
+    embeddings = CachedEmbeddings(backend, store=EmbeddingStore(":memory:"), model="model")
+    first = embeddings.embed_documents(["one", "two"])
+    second = embeddings.embed_documents(["two", "three", "two"])
+
+    assert backend.texts == ["one", "two", "three"]
+    assert second[0] == second[2] == first[1]
+    assert embeddings.stats["hits"] == 2 and embeddings.stats["misses"] == 3
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+from loguru import logger
+from PIL import Image
+
+from app.services.ocr import extractors
+from app.services.ocr.extractors import TesseractExtractor
+
+LETTER = {"Pages": "3", "Page size": "612 x 792 pts (letter)"}
+
+
+class MarkerExtractor(TesseractExtractor):
+    """
+    "OCRs" an image into one word, its marker pixel; marker 0 fails. Defined at module level so that the
+    worker processes can unpickle it.
+    """
+
+    def get_ocr_dataframe(self, img):
+        marker = int(img[0, 0, 0])
+        if marker == 0:
+            raise RuntimeError("unreadable page")
+        return pd.DataFrame({"Text": [f"page{marker}"]})
+
+
+def marker_images(markers):
+    def iter_images(self, file, **kwargs):
+        for marker in markers:
+            img = np.zeros((4, 4, 3), dtype=np.uint8)
+            img[0, 0, 0] = marker
+            yield img
+
+    return iter_images
+
+
+def collect_errors():
+    messages = []
+    handler = logger.add(messages.append, level="ERROR", format="{message}")
+    return messages, handler
+
+
+def test_failed_pages_are_reported_by_page_number(monkeypatch):
+    monkeypatch.setattr(MarkerExtractor, "iter_images", marker_images([3, 0, 8]))
+    messages, handler = collect_errors()
+    done = []
+    try:
+        df_list = MarkerExtractor().extract("scan.png", pages=[7, 2, 5], on_page=done.append)
+    finally:
+        logger.remove(handler)
+
+    assert [list(df["Text"]) for df in df_list] == [["page3"], [], ["page8"]]
+    assert done == [2, 5, 7]
+    assert ["OCR failed for page 6" in message for message in messages] == [True]
+
+
+def test_parallel_extraction_keeps_order_and_page_numbers(monkeypatch):
+    monkeypatch.setattr(MarkerExtractor, "iter_images", marker_images([1, 2, 0, 4, 5]))
+    messages, handler = collect_errors()
+    extractor = MarkerExtractor()
+    done = []
+    try:
+        df_list = extractor.extract(
+            "scan.png", parallelize=True, max_workers=2, pages=[10, 11, 12, 13, 14], on_page=done.append
+        )
+    finally:
+        logger.remove(handler)
+
+    assert [list(df["Text"]) for df in df_list] == [["page1"], ["page2"], [], ["page4"], ["page5"]]
+    assert extractor.failed_pages == [2]
+    assert done == [10, 11, 12, 13, 14]
+    assert any("OCR failed for page 13" in message for message in messages)
+
+
+def test_workers_never_fork():
+    assert extractors.OCR_START_METHOD in ("forkserver", "spawn")
+
+
+def test_pages_in_flight_fit_the_memory_budget():
+    page_mb = 1700 * 2200 * 3 * 2 / 2**20  # A letter page at 200 DPI, as image and array.
+    assert TesseractExtractor.get_parallel_limits(LETTER, 200, 10_000, 4) == (4, 8)
+    assert TesseractExtractor.get_parallel_limits(LETTER, 200, 2 * 3 * page_mb + 1, 8) == (3, 3)
+    assert TesseractExtractor.get_parallel_limits(LETTER, 200, 1, 8) == (1, 1)
+    assert TesseractExtractor.get_parallel_limits(None, 200, 1, 3) == (3, 6)
+
+
+def test_page_window_fits_the_memory_budget():
+    page_mb = 1700 * 2200 * 3 * 2 / 2**20
+    assert TesseractExtractor.get_page_window(LETTER, 200, 10 * page_mb) == 10
+    assert TesseractExtractor.get_page_window(LETTER, 200, 10 * page_mb - 0.01) == 9
+    assert TesseractExtractor.get_page_window(LETTER, 100, 10 * page_mb) == 40
+    # A budget below one page still rasterizes one page at a time.
+    assert TesseractExtractor.get_page_window(LETTER, 200, page_mb / 2) == 1
+    assert TesseractExtractor.get_page_window(LETTER, 200, 0) == 1
+    # Pages of unknown size count as letter pages.
+    assert TesseractExtractor.get_page_window({"Pages": "3"}, 200, 10 * page_mb) == 10
+    assert TesseractExtractor.get_page_window({"Page size": "unknown"}, 200, 10 * page_mb) == 10
+    a4 = {"Page size": "595.276 x 841.89 pts (A4)"}
+    assert TesseractExtractor.get_page_window(a4, 200, 10 * page_mb) == 9
+
+
+def test_page_ranges_are_contiguous_and_bounded_by_the_window():
+    ranges = TesseractExtractor.get_page_ranges
+    assert list(ranges(range(1, 8), 3)) == [(1, 3), (4, 6), (7, 7)]
+    assert list(ranges(range(1, 7), 3)) == [(1, 3), (4, 6)]
+    assert list(ranges(range(1, 4), 10)) == [(1, 3)]
+    assert list(ranges(range(1, 4), 1)) == [(1, 1), (2, 2), (3, 3)]
+    assert list(ranges([8, 2, 1, 3, 7, 12], 2)) == [(1, 2), (3, 3), (7, 8), (12, 12)]
+    assert list(ranges([5], 4)) == [(5, 5)]
+    assert list(ranges([], 4)) == []
+
+
+def test_page_subsets_rasterize_only_the_requested_pages(monkeypatch):
+    calls = []
+
+    def convert_from_path(file, dpi, first_page, last_page):
+        calls.append((first_page, last_page))
+        return [Image.new("RGB", (2, 2), (page, 0, 0)) for page in range(first_page, last_page + 1)]
+
+    monkeypatch.setattr(extractors, "convert_from_path", convert_from_path)
+    monkeypatch.setattr(TesseractExtractor, "get_page_window", staticmethod(lambda info, dpi, budget: 2))
+    info = {"Pages": "12", "Page size": LETTER["Page size"]}
+
+    images = TesseractExtractor().iter_images("doc.pdf", pages=[0, 1, 2, 6, 7, 11], info=info)
+    assert [int(img[0, 0, 0]) for img in images] == [1, 2, 3, 7, 8, 12]
+    assert calls == [(1, 2), (3, 3), (7, 8), (12, 12)]
+
+    calls.clear()
+    images = TesseractExtractor().iter_images("doc.pdf", info={"Pages": "5", "Page size": LETTER["Page size"]})
+    assert [int(img[0, 0, 0]) for img in images] == [1, 2, 3, 4, 5]
+    assert calls == [(1, 2), (3, 4), (5, 5)]
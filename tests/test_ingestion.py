@@ -0,0 +1,114 @@
+import fitz
+import pytest
+
+from app.services.ingress import ingestion
+from app.services.ingress.ingestion import IngestionJob, IngestionService
+from app.services.structures.conversation import ConversationList
+from app.services.structures.conversation_store import ConversationStore
+
+
+class RecordingOrchestrator:
+    def __init__(self, service: IngestionService, conversation_id: str, error: Exception = None):
+        self.service = service
+        self.conversation_id = conversation_id
+        self.error = error
+        self.statuses = []
+        self.documents = []
+
+    def add_documents(self, documents, on_progress=None):
+        self.statuses.append([job.status for job in self.service.jobs()])
+        self.documents.extend(documents)
+        if self.error is not None:
+            raise self.error
+        if on_progress is not None:
+            on_progress(len(self.documents), len(self.documents))
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = ConversationStore(":memory:")
+    monkeypatch.setattr(ingestion, "conversation_store", store)
+    return store
+
+
+def make_conversation(store: ConversationStore) -> str:
+    conversation = ConversationList()
+    store.create_conversation(conversation)
+    return conversation.id
+
+
+def make_csv(path: str) -> str:
+    with open(path, "w") as f:
+        f.write("name,amount\n" + "".join(f"item{i},{i}\n" for i in range(10)))
+    return path
+
+
+def test_job_moves_from_queued_to_done(tmp_path, store):
+    service = IngestionService(max_workers=1)
+    orchestrator = RecordingOrchestrator(service, make_conversation(store))
+    path = make_csv(str(tmp_path / "items.csv"))
+    job_id = service.submit(orchestrator, path)
+    assert service.get(job_id).status in ("queued", "embedding", "done")
+    service.shutdown()
+
+    job = service.get(job_id)
+    assert orchestrator.statuses == [["embedding"]]
+    assert job.status == "done" and job.finished and job.progress == 1.0
+    assert job.chunks_embedded == len(orchestrator.documents) == 1
+    assert job.finished_at is not None and job.error is None
+    assert service.active(orchestrator.conversation_id) == []
+    assert store.get_conversation(orchestrator.conversation_id).context_files == [path]
+
+
+def test_ocr_stage_reports_pages(tmp_path, store, monkeypatch):
+    service = IngestionService(max_workers=1)
+    orchestrator = RecordingOrchestrator(service, make_conversation(store))
+    path = str(tmp_path / "doc.pdf")
+    doc = fitz.open()
+    for page in range(2):
+        doc.new_page().insert_textbox(fitz.Rect(50, 50, 550, 750), " ".join(f"word{i}" for i in range(50)))
+    doc.save(path)
+
+    statuses = []
+    ocr_document = ingestion.OCRDocument
+
+    def recording_ocr_document(*args, **kwargs):
+        statuses.append(service.jobs()[0].status)
+        return ocr_document(*args, **kwargs)
+
+    monkeypatch.setattr(ingestion, "OCRDocument", recording_ocr_document)
+    job_id = service.submit(orchestrator, path, use_cache=False)
+    service.shutdown()
+
+    job = service.get(job_id)
+    assert statuses == ["ocr"]
+    assert orchestrator.statuses == [["embedding"]]
+    assert (job.status, job.pages_done, job.pages_total) == ("done", 2, 2)
+
+
+def test_failed_job_is_not_listed_as_context(tmp_path, store):
+    service = IngestionService(max_workers=1)
+    orchestrator = RecordingOrchestrator(service, make_conversation(store), error=RuntimeError("rate limited"))
+    path = make_csv(str(tmp_path / "items.csv"))
+    job_id = service.submit(orchestrator, path)
+    service.shutdown()
+
+    job = service.get(job_id)
+    assert (job.status, job.error) == ("failed", "rate limited")
+    assert job.finished and job.finished_at is not None
+    assert store.get_conversation(orchestrator.conversation_id).context_files == []
+
+
+def test_is_ingesting_and_pruning(store):
+    service = IngestionService(max_workers=1, history=2)
+    running = IngestionJob(conversation_id="c", path="a.pdf", status="embedding")
+    service._jobs[running.id] = running
+    assert service.is_ingesting("c", "a.pdf")
+    assert not service.is_ingesting("c", "b.pdf") and not service.is_ingesting("other", "a.pdf")
+
+    for i in range(3):
+        job = IngestionJob(conversation_id="c", path=f"{i}.pdf", status="done")
+        service._jobs[job.id] = job
+    service._prune()
+    assert [job.path for job in service.jobs("c")] == ["a.pdf", "2.pdf"]
+    service.shutdown()
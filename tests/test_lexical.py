@@ -0,0 +1,106 @@
+from collections import Counter
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from app.services.retrievers.lexical import BM25Index, reciprocal_rank_fusion, tokenize
+from app.services.retrievers.retriever import Retriever
+
+TEXTS = {
+    "invoice": "Invoice INV-2023/001 issued to Acme for consulting services",
+    "receipt": "Receipt for the payment of invoice services to Globex",
+    "contract": "Service contract between Acme and Globex for consulting",
+    "memo": "Memo about the quarterly budget review",
+}
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.queries = Counter()
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.queries[text] += 1
+        return self._vector(text)
+
+    @staticmethod
+    def _vector(text):
+        text = text.lower()
+        return [float("acme" in text), float("globex" in text), float("budget" in text), 1.0]
+
+
+def make_index() -> BM25Index:
+    index = BM25Index()
+    index.add(TEXTS.keys(), TEXTS.values())
+    return index
+
+
+def make_retriever():
+    embeddings = CountingEmbeddings()
+    vector_store = FAISS.from_embeddings(
+        [(text, embeddings._vector(text)) for text in TEXTS.values()],
+        embeddings,
+        metadatas=[{"source": doc_id} for doc_id in TEXTS],
+        ids=list(TEXTS),
+    )
+    return Retriever(vector_store), embeddings
+
+
+def test_tokenize_keeps_identifiers_whole_and_split():
+    assert tokenize("The invoice INV-2023/001") == ["invoice", "inv-2023/001", "inv", "2023", "001"]
+
+
+def test_bm25_ranks_rarer_and_denser_matches_first():
+    index = make_index()
+    ranked = index.search("consulting invoice")
+    assert [doc_id for doc_id, _, _ in ranked] == ["invoice", "receipt", "contract"]
+    scores = [score for _, score, _ in ranked]
+    assert scores == sorted(scores, reverse=True)
+    assert [coverage for _, _, coverage in ranked] == [1.0, 0.5, 0.5]
+
+
+def test_bm25_ignores_unknown_terms_and_stopwords():
+    index = make_index()
+    assert index.search("the of and") == []
+    assert index.search("unknownterm") == []
+    assert [doc_id for doc_id, _, _ in index.search("2023")] == ["invoice"]
+    assert BM25Index().search("invoice") == []
+
+
+def test_bm25_length_normalization():
+    index = BM25Index()
+    index.add(["short", "long"], ["budget", "budget " + " ".join(f"filler{i}" for i in range(50))])
+    assert [doc_id for doc_id, _, _ in index.search("budget")] == ["short", "long"]
+
+
+def test_rrf_overlapping_lists():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "d"]])
+    assert fused[:2] == ["b", "c"]
+    assert set(fused) == {"a", "b", "c", "d"}
+
+
+def test_rrf_disjoint_lists_interleave_by_rank():
+    fused = reciprocal_rank_fusion([["a", "b"], ["c", "d"]])
+    assert set(fused[:2]) == {"a", "c"} and set(fused[2:]) == {"b", "d"}
+    assert reciprocal_rank_fusion([]) == []
+
+
+def test_decisive_lexical_hit_skips_dense_search():
+    retriever, embeddings = make_retriever()
+    documents, vector = retriever.search_with_vector("INV-2023/001", k=2)
+    assert vector is None
+    assert documents[0].metadata["source"] == "invoice"
+    assert not embeddings.queries
+
+
+def test_ambiguous_query_falls_back_to_hybrid_search():
+    retriever, embeddings = make_retriever()
+    documents, vector = retriever.search_with_vector("Acme consulting", k=2)
+    assert vector == embeddings._vector("Acme consulting")
+    assert embeddings.queries["Acme consulting"] == 1
+    assert {document.metadata["source"] for document in documents} == {"invoice", "contract"}
+
+    documents, vector = retriever.search_with_vector("quarterly report", k=1)
+    assert vector is not None
@@ -0,0 +1,121 @@
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import FakeListLLM
+
+from app.services.response.cache import ResponseCache
+from app.services.response.memory import ConversationMemory
+from app.services.retrievers.retriever import Orchestrator, Retriever
+from app.services.structures.conversation import Conversation, ConversationList, Message
+from app.services.structures.conversation_store import ConversationStore
+
+
+def make_store(n_turns: int) -> tuple:
+    store = ConversationStore(":memory:")
+    conversation = ConversationList()
+    store.create_conversation(conversation)
+    for i in range(n_turns):
+        turn = Conversation(
+            query=Message(sender="user", message=f"question {i} " + "word " * 20),
+            response=Message(sender="assistant", message=f"answer {i} " + "word " * 20),
+        )
+        store.append_turn(conversation.id, turn)
+    return store, conversation.id
+
+
+def test_history_folds_older_turns_once():
+    store, conversation_id = make_store(6)
+    llm = FakeListLLM(responses=["summary one", "summary two"])
+    memory = ConversationMemory(llm, store=store, history_tokens=120)
+
+    summary, recent = memory.history(conversation_id)
+    assert summary == "summary one"
+    assert recent and recent[-1].seq == 5
+    _, through_seq = store.get_summary(conversation_id)
+    assert through_seq == recent[0].seq - 1
+    assert llm.i == 1
+
+    assert memory.history(conversation_id) == (summary, recent)
+    assert llm.i == 1
+
+    store.append_turn(
+        conversation_id,
+        Conversation(
+            query=Message(sender="user", message="question 6 " + "word " * 20),
+            response=Message(sender="assistant", message="answer 6 " + "word " * 20),
+        ),
+    )
+    summary, recent = memory.history(conversation_id)
+    assert summary == "summary two"
+    assert recent[-1].seq == 6
+    assert store.get_summary(conversation_id) == (summary, recent[0].seq - 1)
+
+
+def test_short_history_is_not_summarized():
+    store, conversation_id = make_store(2)
+    llm = FakeListLLM(responses=["unused", "unused"])
+    summary, recent = ConversationMemory(llm, store=store, history_tokens=1000).history(conversation_id)
+    assert summary == "" and [turn.seq for turn in recent] == [0, 1]
+    assert llm.i == 0
+
+
+def test_condense_skips_the_llm_without_history_or_follow_up():
+    llm = FakeListLLM(responses=["unused", "unused"])
+    store, conversation_id = make_store(0)
+    memory = ConversationMemory(llm, store=store)
+    assert memory.condense_question(conversation_id, "What does it cost?") == "What does it cost?"
+
+    store, conversation_id = make_store(2)
+    memory = ConversationMemory(llm, store=store)
+    question = "Which invoices were issued in March 2023?"
+    assert memory.condense_question(conversation_id, question) == question
+    assert llm.i == 0
+
+
+def test_condense_rewrites_follow_ups():
+    store, conversation_id = make_store(2)
+    llm = FakeListLLM(responses=["What is the total of invoice 7?"])
+    memory = ConversationMemory(llm, store=store)
+    assert memory.condense_question(conversation_id, "And what is its total?") == "What is the total of invoice 7?"
+
+
+class ConstantEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+def make_orchestrator(monkeypatch, llm, n_turns: int = 2):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    store, conversation_id = make_store(n_turns)
+    # A semantic threshold above 1 leaves only exact lookups, whatever the embeddings.
+    cache = ResponseCache(ConstantEmbeddings(), similarity_threshold=1.1)
+    orchestrator = Orchestrator(Retriever(), conversation_id, cache, ConversationMemory(llm, store=store))
+    answered = []
+
+    def answer(query):
+        answered.append(query)
+        return {"input": query, "context": [], "answer": f"answer to {query}"}
+
+    monkeypatch.setattr(orchestrator.chain_manager, "get_response", answer)
+    return orchestrator, answered
+
+
+def test_follow_ups_skip_the_raw_exact_lookup(monkeypatch):
+    llm = FakeListLLM(responses=["What is the total of invoice 8?", "unused"])
+    orchestrator, answered = make_orchestrator(monkeypatch, llm)
+    orchestrator.response_cache.put("What about the second one?", 0, {"answer": "stale"})
+
+    response = orchestrator.get_response("What about the second one?")
+    assert response["answer"] == "answer to What is the total of invoice 8?"
+    assert answered == ["What is the total of invoice 8?"]
+
+
+def test_standalone_questions_hit_the_raw_exact_lookup(monkeypatch):
+    llm = FakeListLLM(responses=["unused", "unused"])
+    orchestrator, answered = make_orchestrator(monkeypatch, llm)
+    question = "Which invoices were issued in March 2023?"
+    orchestrator.response_cache.put(question, 0, {"answer": "cached"})
+
+    assert orchestrator.get_response(question)["answer"] == "cached"
+    assert answered == [] and llm.i == 0
@@ -0,0 +1,138 @@
+import os
+import threading
+
+import fitz
+import numpy as np
+import pandas as pd
+
+from app.services.ingress.channel import OCRDocument
+from app.services.ocr.cache import OCRCache
+from app.services.ocr.extractors import TesseractExtractor
+
+
+def make_pdf(path: str, pages) -> str:
+    """
+    One page per entry of `pages`: its text, or None for a page with no text layer.
+    """
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        if text:
+            page.insert_textbox(fitz.Rect(50, 50, 550, 750), text, fontsize=11)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def make_pages(n_pages: int, n_words: int = 100):
+    return [
+        pd.DataFrame({"Text": [f"w{page}_{i}" for i in range(n_words)], "x0": np.arange(n_words, dtype=float)})
+        for page in range(n_pages)
+    ]
+
+
+def ocr_frame(words) -> pd.DataFrame:
+    n = len(words)
+    x0 = np.arange(n, dtype=float) * 50
+    return pd.DataFrame(
+        {
+            "x0": x0,
+            "y0": 10.0,
+            "x2": x0 + 40,
+            "y2": 20.0,
+            "Text": words,
+            "block": 1,
+            "page": 1,
+            "index_sort": np.arange(n),
+            "line": 1,
+            "confidence": 0.9,
+        }
+    )
+
+
+def test_put_get_round_trip(tmp_path):
+    cache = OCRCache(str(tmp_path / "cache"))
+    path = str(tmp_path / "a.bin")
+    with open(path, "wb") as f:
+        f.write(b"content")
+    key = cache.make_key(path, "tesseract", dpi=200)
+    assert cache.get(key) is None
+
+    pages = make_pages(3)
+    cache.put(key, pages)
+    cached = cache.get(key)
+    assert len(cached) == 3
+    for expected, actual in zip(pages, cached):
+        pd.testing.assert_frame_equal(expected, actual)
+    assert not [name for name in os.listdir(cache.cache_dir) if name.endswith(".tmp")]
+
+
+def test_key_follows_content_and_output_settings(tmp_path):
+    cache = OCRCache(str(tmp_path / "cache"))
+    first, second = str(tmp_path / "a.bin"), str(tmp_path / "b.bin")
+    for path, content in ((first, b"one"), (second, b"two")):
+        with open(path, "wb") as f:
+            f.write(content)
+
+    key = cache.make_key(first, "tesseract", dpi=200)
+    assert cache.make_key(first, "tesseract", dpi=200, parallelize=True, max_workers=8) == key
+    assert cache.make_key(first, "tesseract", dpi=300) != key
+    assert cache.make_key(first, "other", dpi=200) != key
+    assert cache.make_key(second, "tesseract", dpi=200) != key
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = OCRCache(str(tmp_path / "cache"))
+    cache.put("a", make_pages(1))
+    entry_bytes = cache._dir_size(cache._entry_dir("a"))
+    cache.max_bytes = int(entry_bytes * 2.5)
+    cache.put("b", make_pages(1))
+    os.utime(cache._entry_dir("a"), (1, 1))
+    os.utime(cache._entry_dir("b"), (2, 2))
+    cache.get("a")
+    cache.put("c", make_pages(1))
+
+    assert sorted(os.listdir(cache.cache_dir)) == ["a", "c"]
+
+
+def test_concurrent_writers_of_one_entry(tmp_path):
+    cache = OCRCache(str(tmp_path / "cache"))
+    pages = make_pages(20)
+    threads = [threading.Thread(target=cache.put, args=("key", pages)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(cache.get("key")) == 20
+    assert os.listdir(cache.cache_dir) == ["key"]
+
+
+def test_failed_ocr_pages_are_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(OCRCache.__init__, "__defaults__", (str(tmp_path / "cache"), 1024))
+    path = make_pdf(str(tmp_path / "mixed.pdf"), [" ".join(f"word{i}" for i in range(40)), None])
+    monkeypatch.setattr(TesseractExtractor, "iter_images", lambda self, file, **kwargs: iter([np.zeros((8, 8, 3))]))
+
+    def fail(self, img):
+        raise RuntimeError("tesseract is not installed")
+
+    monkeypatch.setattr(TesseractExtractor, "get_ocr_dataframe", fail)
+    OCRDocument(path)
+    assert os.listdir(tmp_path / "cache") == []
+
+    monkeypatch.setattr(TesseractExtractor, "get_ocr_dataframe", lambda self, img: ocr_frame(["scanned", "words"]))
+    document = OCRDocument(path)
+    assert len(os.listdir(tmp_path / "cache")) == 1
+    assert "scanned words" in document[1].text
+
+
+def test_failed_ocr_pass_is_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(OCRCache.__init__, "__defaults__", (str(tmp_path / "cache"), 1024))
+    path = make_pdf(str(tmp_path / "mixed.pdf"), [" ".join(f"word{i}" for i in range(40)), None])
+
+    def fail(self, file, **kwargs):
+        raise RuntimeError("poppler is not installed")
+
+    monkeypatch.setattr(TesseractExtractor, "iter_images", fail)
+    OCRDocument(path)
+    assert os.listdir(tmp_path / "cache") == []
@@ -0,0 +1,69 @@
+import fitz
+import pandas as pd
+import pytest
+
+from app.services.ocr.ocr import NonDigitalOCRParser, OCRParser
+
+BODY = " ".join(f"body{i}" for i in range(300))
+HEADER = "ACME Corporation quarterly report page two of twelve confidential draft copy"
+
+
+def add_scan(page: fitz.Page):
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 60, 80), False)
+    pixmap.clear_with(230)
+    page.insert_image(page.rect, pixmap=pixmap)
+
+
+def make_pdf(path: str) -> str:
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_textbox(fitz.Rect(50, 50, 550, 750), BODY, fontsize=11)
+    doc.new_page().insert_text((500, 780), "Page 2", fontsize=9)
+    page = doc.new_page()
+    add_scan(page)
+    page.insert_text((50, 40), HEADER, fontsize=9)
+    page = doc.new_page()
+    add_scan(page)
+    page.insert_textbox(fitz.Rect(50, 50, 550, 750), BODY, fontsize=11)
+    doc.new_page()
+    doc.save(path)
+    doc.close()
+    return path
+
+
+@pytest.fixture
+def routed(tmp_path, monkeypatch):
+    calls = []
+
+    def parse(self, files, pages=None, on_page=None, **kwargs):
+        calls.append(pages)
+        return [pd.DataFrame({"Text": [f"ocr{page}"], "x0": 0.0, "y0": 0.0, "x2": 1.0, "y2": 1.0}) for page in pages]
+
+    monkeypatch.setattr(NonDigitalOCRParser, "parse", parse)
+    return OCRParser().parse(make_pdf(str(tmp_path / "mixed.pdf"))), calls
+
+
+def test_sparse_or_stamped_pages_are_ocred(routed):
+    df_lst, calls = routed
+    # Page 2 only has a page number, page 3 is a scan with a stamped header line, page 5 is blank.
+    assert calls == [[1, 2, 4]]
+    assert len(df_lst) == 5
+    assert [list(df_lst[pageno]["Text"]) for pageno in (1, 2, 4)] == [["ocr1"], ["ocr2"], ["ocr4"]]
+
+
+def test_pages_with_a_full_text_layer_are_read_digitally(routed):
+    df_lst, _ = routed
+    assert list(df_lst[0]["Text"]) == BODY.split()
+    # A scan with a full text layer under it, as written by OCRing scanners.
+    assert list(df_lst[3]["Text"]) == BODY.split()
+
+
+def test_is_digital_needs_the_minimum_words(tmp_path):
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((50, 50), "one two three four five six seven eight nine", fontsize=11)
+    words = pd.DataFrame(page.get_text("words"), columns=["x0", "y0", "x2", "y2", "Text", "block", "line", "word"])
+    assert not OCRParser.is_digital(page, words)
+    page.insert_text((50, 70), "ten", fontsize=11)
+    words = pd.DataFrame(page.get_text("words"), columns=["x0", "y0", "x2", "y2", "Text", "block", "line", "word"])
+    assert OCRParser.is_digital(page, words)
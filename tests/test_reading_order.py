@@ -0,0 +1,66 @@
+import fitz
+import pytest
+
+from app.services.ocr.ocr import DigitalOCRParser
+from app.services.utils.ocr_utils import DFMixins
+
+TITLE = "Quarterly report of the finance department for the year"
+LEFT = " ".join(f"left{i}" for i in range(60))
+RIGHT = " ".join(f"right{i}" for i in range(60))
+FIRST = " ".join(f"first{i}" for i in range(40))
+SECOND = " ".join(f"second{i}" for i in range(40))
+
+
+def page_words(build, hints: bool = True):
+    doc = fitz.open()
+    page = doc.new_page()
+    build(page)
+    df = DigitalOCRParser().parse_page(page, 0)
+    doc.close()
+    # Shuffled, so that the order comes from the layout and not from the text layer.
+    df = df.sample(frac=1, random_state=0)
+    return df if hints else df.drop(columns=["block", "line"])
+
+
+def two_columns(page: fitz.Page):
+    page.insert_text((50, 60), TITLE, fontsize=16)
+    page.insert_textbox(fitz.Rect(50, 100, 280, 700), LEFT, fontsize=11)
+    page.insert_textbox(fitz.Rect(320, 100, 550, 700), RIGHT, fontsize=11)
+
+
+def one_column(page: fitz.Page):
+    page.insert_textbox(fitz.Rect(50, 50, 550, 200), FIRST, fontsize=11)
+    page.insert_textbox(fitz.Rect(50, 250, 550, 400), SECOND, fontsize=11)
+
+
+@pytest.mark.parametrize("hints", [True, False])
+def test_two_columns_read_left_then_right(hints):
+    combined = DFMixins.combine(page_words(two_columns, hints))
+    assert list(combined["Text"]) == TITLE.split() + LEFT.split() + RIGHT.split()
+
+    body = combined.iloc[len(TITLE.split()) :]
+    assert set(body.loc[body["Text"].str.startswith("left"), "column"]) == {0}
+    assert set(body.loc[body["Text"].str.startswith("right"), "column"]) == {1}
+
+    lines = DFMixins.get_lines(combined)
+    assert list(lines["line_id"]) == sorted(lines["line_id"])
+
+    paragraphs = DFMixins.get_paragraphs(lines)
+    assert list(paragraphs["Text"]) == [TITLE, LEFT, RIGHT]
+
+
+@pytest.mark.parametrize("hints", [True, False])
+def test_single_column_reads_top_to_bottom(hints):
+    combined = DFMixins.combine(page_words(one_column, hints))
+    assert list(combined["Text"]) == FIRST.split() + SECOND.split()
+    assert combined["column"].nunique() == 1
+
+    paragraphs = DFMixins.get_paragraphs(DFMixins.get_lines(combined))
+    assert list(paragraphs["Text"]) == [FIRST, SECOND]
+    assert list(paragraphs["y0"]) == sorted(paragraphs["y0"])
+
+
+def test_empty_page():
+    df = page_words(lambda page: None)
+    assert DFMixins.combine(df).empty
+    assert DFMixins.get_paragraphs(DFMixins.get_lines(DFMixins.combine(df))).empty
@@ -0,0 +1,49 @@
+from collections import Counter
+
+from langchain_core.embeddings import Embeddings
+
+from app.services.response.cache import ResponseCache
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = Counter()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        self.calls[text] += 1
+        return [1.0, float("price" in text.lower()), 0.0]
+
+
+def test_miss_embeds_the_query_once():
+    embeddings = CountingEmbeddings()
+    cache = ResponseCache(embeddings)
+    cache.put("What is the total?", 1, {"answer": "42"})
+
+    response, vector = cache.get("What is the price?", 1)
+    assert response is None and vector is not None
+    cache.put("What is the price?", 1, {"answer": "10"}, vector)
+    assert embeddings.calls["What is the price?"] == 1
+
+
+def test_exact_and_semantic_hits_respect_the_version():
+    cache = ResponseCache(CountingEmbeddings())
+    cache.put("What is the price?", 1, {"answer": "10"})
+    assert cache.get("what is the price", 1)[0] == {"answer": "10"}
+    assert cache.get("Tell me the price", 1)[0] == {"answer": "10"}
+    assert cache.get("What is the price?", 2)[0] is None
+    assert cache.stats["exact_hits"] == 1 and cache.stats["semantic_hits"] == 1
+
+
+def test_exact_lookup_never_embeds():
+    embeddings = CountingEmbeddings()
+    cache = ResponseCache(embeddings)
+    cache.put("What is the total?", 1, {"answer": "42"})
+    embeddings.calls.clear()
+
+    assert cache.get_exact("  what is the TOTAL? ", 1) == {"answer": "42"}
+    assert cache.get_exact("And its price?", 1) is None
+    assert cache.get_exact("What is the total?", 2) is None
+    assert not embeddings.calls
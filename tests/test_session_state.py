@@ -0,0 +1,67 @@
+import warnings
+
+import pytest
+
+pytest.importorskip("streamlit")
+
+from app.utils.streamlit_utils import SessionState  # noqa: E402
+
+
+class RecordingSession(dict):
+    def __init__(self):
+        super().__init__()
+        self.written = []
+
+    def __setitem__(self, key, value):
+        self.written.append(key)
+        super().__setitem__(key, value)
+
+
+def test_first_sync_writes_every_field():
+    session = RecordingSession()
+    state = SessionState(session=session)
+    state.sync_to_session()
+    assert sorted(session.written) == sorted(SessionState.fields())
+
+
+def test_sync_writes_only_dirty_fields_by_reference():
+    session = RecordingSession()
+    state = SessionState(session=session)
+    state.sync_to_session()
+    session.written.clear()
+    state.sync_from_session()
+
+    pages = {"page": object()}
+    state.theme = "dark"
+    state.pages = pages
+    state.sync_to_session()
+    assert sorted(session.written) == ["pages", "theme"]
+    assert session["pages"] is pages
+    assert state.sync_stats["pushed"] == 2
+
+    session.written.clear()
+    state.sync_to_session()
+    assert session.written == []
+
+    state.pages["other"] = 1
+    state.mark_dirty("pages")
+    state.sync_to_session()
+    assert session.written == ["pages"]
+
+
+def test_sync_from_session_picks_up_replaced_fields():
+    session = RecordingSession()
+    state = SessionState(session=session)
+    state.sync_to_session()
+    session["user"] = "Someone"
+    state.sync_from_session()
+    assert state.user == "Someone"
+    assert state.sync_stats["pulled"] == 1
+
+
+def test_attribute_writes_emit_no_warnings():
+    state = SessionState(session=RecordingSession())
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        state.theme = "dark"
+        state.conversation_id = "abc"
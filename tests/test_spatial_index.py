@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.structures.ocr import OCRDATA
+from app.services.utils.spatial_index import GridIndex
+
+
+def random_boxes(n: int, seed: int = 0, max_size: float = 40.0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    origins = rng.uniform(0, 600, size=(n, 2))
+    sizes = rng.uniform(1, max_size, size=(n, 2))
+    return np.column_stack((origins, origins + sizes))
+
+
+def brute_intersecting(boxes: np.ndarray, bbox) -> np.ndarray:
+    x0, y0, x2, y2 = bbox
+    hits = [i for i, (bx0, by0, bx2, by2) in enumerate(boxes) if bx0 < x2 and bx2 > x0 and by0 < y2 and by2 > y0]
+    return np.array(hits, dtype=int)
+
+
+def brute_contained(boxes: np.ndarray, bbox) -> np.ndarray:
+    x0, y0, x2, y2 = bbox
+    hits = [i for i, (bx0, by0, bx2, by2) in enumerate(boxes) if bx0 >= x0 and by0 >= y0 and bx2 <= x2 and by2 <= y2]
+    return np.array(hits, dtype=int)
+
+
+def brute_nearest(boxes: np.ndarray, point, k: int) -> np.ndarray:
+    centers = np.column_stack(((boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2))
+    return np.argsort(np.linalg.norm(centers - np.asarray(point), axis=1), kind="stable")[:k]
+
+
+QUERIES = [(100, 100, 180, 140), (0, 0, 700, 700), (590, 590, 800, 800), (-50, -50, -1, -1), (300, 0, 301, 650)]
+
+
+@pytest.mark.parametrize("cell_size", [None, 5.0, 50.0, 1000.0])
+@pytest.mark.parametrize("bbox", QUERIES)
+def test_query_matches_brute_force(cell_size, bbox):
+    # Boxes up to 150 units wide span many 5- and 50-unit cells.
+    boxes = np.vstack((random_boxes(300), random_boxes(20, seed=1, max_size=150)))
+    index = GridIndex(boxes, cell_size=cell_size)
+    np.testing.assert_array_equal(index.query(bbox), brute_intersecting(boxes, bbox))
+    np.testing.assert_array_equal(index.query(bbox, contained=True), brute_contained(boxes, bbox))
+
+
+def test_box_spanning_cells_is_found_from_a_far_cell():
+    # The long box's center is in the first cell; the query only touches the last one.
+    boxes = [(0, 0, 95, 10), (0, 20, 5, 25), (90, 20, 95, 25)]
+    index = GridIndex(boxes, cell_size=10)
+    np.testing.assert_array_equal(index.query((91, 1, 92, 2)), [0])
+    np.testing.assert_array_equal(index.query((89, 0, 100, 30)), [0, 2])
+
+
+@pytest.mark.parametrize("cell_size", [None, 5.0, 100.0])
+@pytest.mark.parametrize("point", [(0, 0), (300, 300), (650, 10), (-100, 900)])
+@pytest.mark.parametrize("k", [1, 5, 40])
+def test_nearest_matches_brute_force(cell_size, point, k):
+    boxes = random_boxes(200, seed=2)
+    index = GridIndex(boxes, cell_size=cell_size)
+    expected = brute_nearest(boxes, point, k)
+    actual = index.nearest(point, k=k)
+    centers = index.centers
+    np.testing.assert_allclose(
+        np.linalg.norm(centers[actual] - point, axis=1), np.linalg.norm(centers[expected] - point, axis=1)
+    )
+
+
+def test_nearest_across_empty_cells():
+    # Two clusters far apart, with many empty cells in between.
+    boxes = [(0, 0, 2, 2), (1, 1, 3, 3), (500, 500, 502, 502)]
+    index = GridIndex(boxes, cell_size=1)
+    np.testing.assert_array_equal(index.nearest((450, 450)), [2])
+    np.testing.assert_array_equal(index.nearest((200, 200), k=2), [1, 0])
+    np.testing.assert_array_equal(index.nearest((0, 0), k=10), [0, 1, 2])
+    assert len(index.query((100, 100, 400, 400))) == 0
+
+
+def test_empty_index():
+    index = GridIndex(np.empty((0, 4)))
+    assert len(index) == 0
+    assert len(index.query((0, 0, 10, 10))) == 0
+    assert len(index.nearest((0, 0), k=3)) == 0
+
+
+def test_ocrdata_words_in_and_nearest_words():
+    boxes = random_boxes(50, seed=3)
+    df = pd.DataFrame(boxes, columns=["x0", "y0", "x2", "y2"]).assign(Text=[f"w{i}" for i in range(50)])
+    ocrdata = OCRDATA(df)
+    bbox = (100, 100, 400, 300)
+    assert list(ocrdata.words_in(bbox)["Text"]) == [f"w{i}" for i in brute_intersecting(boxes, bbox)]
+    assert list(ocrdata.nearest_words(300, 300, k=3)["Text"]) == [f"w{i}" for i in brute_nearest(boxes, (300, 300), 3)]
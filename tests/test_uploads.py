@@ -0,0 +1,97 @@
+import io
+import json
+import os
+
+import pytest
+
+from app.services.ingress import uploads
+from app.services.ingress.uploads import MANIFEST_FILE, UploadManifest
+
+
+class Upload(io.BytesIO):
+    """
+    Shaped like Streamlit's UploadedFile: a BytesIO with a name and a per-upload id.
+    """
+
+    def __init__(self, content: bytes, name: str, file_id: str):
+        super().__init__(content)
+        self.name = name
+        self.file_id = file_id
+
+
+def stored_files(root: str):
+    return sorted(
+        os.path.relpath(os.path.join(directory, name), root)
+        for directory, _, names in os.walk(root)
+        for name in names
+        if name != MANIFEST_FILE
+    )
+
+
+def test_identical_bytes_under_different_names_are_stored_once(tmp_path):
+    manifest = UploadManifest(str(tmp_path))
+    first = manifest.store(Upload(b"same content", "a.pdf", "1"))
+    second = manifest.store(Upload(b"same content", "b.PDF", "2"))
+    other = manifest.store(Upload(b"other content", "a.pdf", "3"))
+
+    assert first == second != other
+    assert os.path.basename(first).endswith(".pdf")
+    assert len(manifest) == 2
+    assert stored_files(str(tmp_path)) == sorted([os.path.relpath(first, tmp_path), os.path.relpath(other, tmp_path)])
+    with open(first, "rb") as f:
+        assert f.read() == b"same content"
+
+
+def test_repeated_upload_id_is_skipped_without_reading(tmp_path, monkeypatch):
+    manifest = UploadManifest(str(tmp_path))
+    upload = Upload(b"content", "a.pdf", "1")
+    assert manifest.store(upload) is not None
+
+    def fail(file):
+        raise AssertionError("an upload already handled is hashed again")
+
+    monkeypatch.setattr(manifest, "hash_file", fail)
+    assert manifest.store(upload) is None
+
+
+def test_seen_uploads_are_bounded(tmp_path):
+    manifest = UploadManifest(str(tmp_path), seen_size=2)
+    for i in range(3):
+        manifest.store(Upload(b"content", "a.pdf", str(i)))
+    assert list(manifest._seen) == ["1", "2"]
+    assert manifest.store(Upload(b"content", "a.pdf", "0")) is not None
+
+
+def test_manifest_round_trip(tmp_path):
+    manifest = UploadManifest(str(tmp_path))
+    path = manifest.store(Upload(b"content", "report.pdf", "1"))
+
+    reopened = UploadManifest(str(tmp_path))
+    assert len(reopened) == 1
+    assert reopened.name(path) == "report.pdf"
+    assert reopened.store(Upload(b"content", "copy.pdf", "2")) == path
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_failed_manifest_write_keeps_the_old_manifest(tmp_path, monkeypatch):
+    manifest = UploadManifest(str(tmp_path))
+    manifest.store(Upload(b"first", "first.pdf", "1"))
+
+    def crash(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(uploads.json, "dump", crash)
+    with pytest.raises(OSError):
+        manifest.store(Upload(b"second", "second.pdf", "2"))
+
+    with open(tmp_path / MANIFEST_FILE) as f:
+        assert [entry["name"] for entry in json.load(f).values()] == ["first.pdf"]
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_corrupt_manifest_starts_over(tmp_path):
+    (tmp_path / MANIFEST_FILE).write_text('{"truncated": ')
+    manifest = UploadManifest(str(tmp_path))
+    assert len(manifest) == 0
+    path = manifest.store(Upload(b"content", "a.pdf", "1"))
+    assert UploadManifest(str(tmp_path)).name(path) == "a.pdf"
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.structures.ocr import OCRDATA, WORD_DTYPE, BBox, Word, WordList
+
+
+def make_df(n: int = 4) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "x0": [10.0 * i for i in range(n)],
+            "y0": [5.0 + i for i in range(n)],
+            "x2": [10.0 * i + 8 for i in range(n)],
+            "y2": [15.0 + i for i in range(n)],
+            "Text": [f"word{i}" for i in range(n)],
+            "block": [0] * n,
+            "page": [1] * n,
+            "line": list(range(n)),
+        }
+    )
+
+
+def test_round_trip_fills_missing_columns():
+    words = WordList.from_df(make_df())
+    assert words.data.dtype == WORD_DTYPE
+    df = words.to_df()
+    assert list(df.columns) == list(WORD_DTYPE.names)
+    pd.testing.assert_frame_equal(df[make_df().columns], make_df(), check_dtype=False)
+    assert set(df["index_sort"]) == {-1} and set(df["confidence"]) == {-1}
+    assert WordList.from_dict(words.to_dict()).to_df().equals(df)
+
+
+def test_indexing_returns_views():
+    words = WordList.from_df(make_df())
+    assert len(words) == 4
+    assert words[0].Text == "word0" and words[-1].Text == "word3"
+    assert words[2].bbox == (20.0, 7.0, 28.0, 17.0)
+    assert words[1].to_dict()["line"] == 1
+    assert [word.text for word in words] == ["word0", "word1", "word2", "word3"]
+    assert words.text == "word0 word1 word2 word3"
+    assert words[1]._data is words.data
+    for index in (4, -5):
+        with pytest.raises(IndexError):
+            words[index]
+    with pytest.raises(AttributeError):
+        words[0].x0 = 1.0
+
+
+def test_slicing_returns_views():
+    words = WordList.from_df(make_df())
+    tail = words[1:]
+    assert isinstance(tail, WordList) and len(tail) == 3
+    assert np.shares_memory(tail.data, words.data)
+    assert [word.Text for word in words[::2]] == ["word0", "word2"]
+    assert tail[0].Text == "word1" and tail[-1].Text == "word3"
+    assert len(words[10:]) == 0
+
+
+def test_bbox():
+    words = WordList.from_df(make_df())
+    assert words.bbox == BBox(0.0, 5.0, 38.0, 18.0)
+    assert words[1:3].bbox == BBox(10.0, 6.0, 28.0, 17.0)
+    assert words[:0].bbox == BBox.create_empty_bbox()
+    assert OCRDATA(make_df()).bbox == words.bbox
+    assert words.bbox is words.bbox
+
+
+def test_bbox_follows_writes():
+    words = WordList.from_df(make_df())
+    head = words[:2]
+    assert words.bbox == BBox(0.0, 5.0, 38.0, 18.0) and head.bbox == BBox(0.0, 5.0, 18.0, 16.0)
+
+    head[0] = {"x0": -20.0, "y0": 0.0, "x2": 5.0, "y2": 6.0, "Text": "moved"}
+    assert words[0].Text == "moved"
+    assert head.bbox == BBox(-20.0, 0.0, 18.0, 16.0)
+    assert words.bbox == BBox(-20.0, 0.0, 38.0, 18.0)
+
+    words[3] = Word.from_dict({"x0": 0.0, "y0": 0.0, "x2": 100.0, "y2": 1.0})
+    assert words.bbox == BBox(-20.0, 0.0, 100.0, 17.0)
+    assert words[3].Text == ""
+
+    words[1:3] = WordList.from_df(make_df(2))
+    assert [word.Text for word in words] == ["moved", "word0", "word1", ""]
+
+    words.data["y2"][0] = 99.0
+    words.invalidate()
+    assert words.bbox.y2 == 99.0 and head.bbox.y2 == 99.0
+
+    words.data = WordList.from_df(make_df(1)).data
+    assert words.bbox == BBox(0.0, 5.0, 8.0, 15.0)
+    assert head.bbox.y2 == 99.0